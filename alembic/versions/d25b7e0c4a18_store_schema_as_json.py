@@ -0,0 +1,94 @@
+"""store database schema as versioned json
+
+Revision ID: d25b7e0c4a18
+Revises: 8c4e2f6a1d93
+Create Date: 2026-10-17 15:02:44.587120
+
+"""
+import ast
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd25b7e0c4a18'
+down_revision: Union[str, None] = '8c4e2f6a1d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+databases = sa.table(
+    'databases',
+    sa.column('id', sa.Integer),
+    sa.column('schema', sa.String),
+    sa.column('schema_index', sa.String),
+)
+
+# the schema format as of this revision, frozen here so later changes to the app's don't change the migration
+SCHEMA_FORMAT_VERSION = 1
+
+
+def _compact_column(column: dict) -> dict:
+    compact = {
+        'name': column['name'],
+        'type': str(column['type']),
+        'nullable': bool(column.get('nullable', True)),
+    }
+    if column.get('primary_key'):
+        compact['primary_key'] = True
+    if column.get('foreign_keys'):
+        compact['foreign_keys'] = [
+            {'referred_table': fk['referred_table'], 'referred_column': fk['referred_column']}
+            for fk in column['foreign_keys']
+        ]
+    return compact
+
+
+def _decode_schema(schema: str) -> dict:
+    # versioned json is kept as is, str() of the introspected dict is compacted
+    try:
+        decoded = json.loads(schema)
+    except (TypeError, ValueError):
+        decoded = None
+    if isinstance(decoded, dict) and 'version' in decoded:
+        if decoded['version'] != SCHEMA_FORMAT_VERSION:
+            raise ValueError(f"Unsupported schema format version {decoded['version']}")
+        return decoded
+
+    legacy = ast.literal_eval(schema)
+    if not isinstance(legacy, dict):
+        raise ValueError("Schema is neither versioned JSON nor a legacy schema dict")
+    return {
+        'version': SCHEMA_FORMAT_VERSION,
+        'tables': {
+            table_name: [_compact_column(column) for column in columns]
+            for table_name, columns in legacy.items()
+        },
+    }
+
+
+def upgrade() -> None:
+    # str(dict) schemas -> versioned json, indexes are rebuilt from the new format
+    connection = op.get_bind()
+    for id, schema in connection.execute(sa.select(databases.c.id, databases.c.schema)).all():
+        try:
+            encoded = json.dumps(_decode_schema(schema), separators=(',', ':'))
+        except (ValueError, SyntaxError):
+            continue
+        connection.execute(
+            databases.update().where(databases.c.id == id).values(schema=encoded, schema_index=None)
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    for id, schema in connection.execute(sa.select(databases.c.id, databases.c.schema)).all():
+        try:
+            tables = json.loads(schema)['tables']
+        except (ValueError, TypeError, KeyError):
+            continue
+        connection.execute(
+            databases.update().where(databases.c.id == id).values(schema=str(tables), schema_index=None)
+        )
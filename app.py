@@ -5,21 +5,50 @@ from routes.users import UserRouter
 from routes.databases import DbRoute
 from routes.queries import QueryRoute
 from routes.dashboards import DashboardRoute
+from routes.metrics import MetricsRoute
+from routes.jobs import JobRoute
 from config.app_config import settings
-
-app = FastAPI(
-    title=settings.APP_NAME,
-    version=settings.APP_VERSION,
-    description=settings.APP_DESCRIPTION,
-)
+from utils.engine_registry import engine_registry
+from utils.prompt_registry import prompt_registry
+from utils.result_cache import result_cache
+from utils.llm_runtime import llm_runtime
+from config.llm_config import settings as llm_settings
+from config.job_config import settings as job_settings
+from utils.jobs import job_queue
+import asyncio
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await engine.connect()
+    # fail fast on a missing or incomplete prompts file
+    prompt_registry.load()
+    result_cache.warn_if_unshared()
+    if llm_settings.warm_up:
+        await llm_runtime.warm_up()
+    # the in-memory queue only exists in this process, so it is worked here instead of in worker.py.
+    # the refresh scheduler isn't, every api worker would run its own, see worker.py
+    worker = None
+    if job_settings.JOBS_BACKEND == "memory":
+        worker = asyncio.ensure_future(job_queue.work(job_settings.JOB_WORKER_CONCURRENCY))
     yield
+    if worker:
+        job_queue.stop()
+        await worker
+    await job_queue.backend.close()
+    await llm_runtime.aclose()
+    await engine_registry.dispose_all()
     await engine.dispose()
 
+app = FastAPI(
+    title=settings.APP_NAME,
+    version=settings.APP_VERSION,
+    description=settings.APP_DESCRIPTION,
+    lifespan=lifespan,
+)
+
 app.include_router(UserRouter, tags=["user"], prefix="/user")
 app.include_router(DbRoute, tags=["database"], prefix="/database")
 app.include_router(QueryRoute, tags=["query"], prefix="/query")
-app.include_router(DashboardRoute, tags=["dashboard"], prefix="/dashboard")
\ No newline at end of file
+app.include_router(DashboardRoute, tags=["dashboard"], prefix="/dashboard")
+app.include_router(MetricsRoute, tags=["metrics"], prefix="/metrics")
+app.include_router(JobRoute, tags=["jobs"], prefix="/jobs")
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Schema introspection cost: per-column inspector calls vs. bulk introspection.
+
+Generates a SQLite database with a few hundred tables and reflects it both ways.
+Run from the repository root:
+    python -m benchmarks.introspection_benchmark
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, inspect
+
+from utils.schema_introspection import introspect_schema
+
+TABLES = 300
+COLUMNS = 20
+
+
+def legacy_introspect_schema(engine):
+    # the previous connect_to_db_and_get_scheme loop
+    inspector = inspect(engine)
+    scheme = {}
+    for table_name in inspector.get_table_names():
+        columns = inspector.get_columns(table_name)
+        for column in columns:
+            column['type'] = str(column['type'])
+            fk_info = []
+            for fk in inspector.get_foreign_keys(table_name):
+                if column['name'] in fk['constrained_columns']:
+                    fk_info.append({
+                        'referred_table': fk['referred_table'],
+                        'referred_column': fk['referred_columns'][0]
+                    })
+            if fk_info:
+                column['foreign_keys'] = fk_info
+            pk_constraint = inspector.get_pk_constraint(table_name)
+            column['primary_key'] = column['name'] in pk_constraint.get('constrained_columns', [])
+            column.pop('dialect_options', None)
+        scheme[table_name] = columns
+    return scheme
+
+
+def make_database(path):
+    connection = sqlite3.connect(path)
+    for table in range(TABLES):
+        columns = ["id INTEGER PRIMARY KEY"]
+        columns += [f"col_{column} VARCHAR(50)" for column in range(COLUMNS - 2)]
+        if table:
+            columns.append(f"parent_id INTEGER REFERENCES table_{table - 1}(id)")
+        else:
+            columns.append("parent_id INTEGER")
+        connection.execute(f"CREATE TABLE table_{table} ({', '.join(columns)})")
+    connection.commit()
+    connection.close()
+
+
+def bench(name, fn, connection_string):
+    engine = create_engine(connection_string)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(1))
+    started = time.perf_counter()
+    scheme = fn(engine)
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    print(f"{name:<18} {elapsed * 1000:>9.1f} ms  {len(statements):>6} catalog queries")
+    return scheme
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "schema.db")
+        make_database(path)
+        print(f"{TABLES} tables x {COLUMNS} columns")
+        legacy = bench("per column", legacy_introspect_schema, f"sqlite:///{path}")
+        bulk = bench("bulk", introspect_schema, f"sqlite:///{path}")
+        assert legacy == bulk, "introspection results differ"
@@ -0,0 +1,98 @@
+"""
+Dashboard refresh concurrency: blocking guardrail + LLM invoke vs. the ainvoke pipeline.
+
+Runs generate_sql_query for N tiles under asyncio.gather, with a guardrail and
+chat model that only wait a fixed latency, so the wall time shows whether the
+tiles overlap (about one call) or run one after the other (about N calls).
+Run from the repository root:
+    python -m benchmarks.llm_concurrency_benchmark
+"""
+import asyncio
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.output_parsers.string import StrOutputParser
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from utils.schema_format import encode_schema
+from utils.user_queries import choose_prompt, generate_sql_query
+
+TILES = 8
+GUARDRAIL_LATENCY = 0.2
+LLM_LATENCY = 0.3
+
+SCHEMA = encode_schema({
+    "orders": [
+        {"name": "id", "type": "INTEGER", "nullable": False, "primary_key": True},
+        {"name": "total", "type": "NUMERIC(10, 2)", "nullable": True, "primary_key": False},
+    ],
+})
+
+
+class LatencyChatModel(BaseChatModel):
+    latency: float
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="SELECT count(*) FROM orders"))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+def _check(value):
+    time.sleep(GUARDRAIL_LATENCY)
+    return value
+
+
+async def _acheck(value):
+    await asyncio.sleep(GUARDRAIL_LATENCY)
+    return value
+
+
+guard_rail = RunnableLambda(_check, afunc=_acheck)
+llm = LatencyChatModel(latency=LLM_LATENCY)
+
+
+async def blocking_tile(index):
+    # the previous generate_sql_query: a synchronous invoke from async code
+    prompt = choose_prompt("tabular", SCHEMA, "postgres")
+    chat_template = ChatPromptTemplate.from_messages(
+        [SystemMessage(content=prompt), HumanMessagePromptTemplate.from_template("User question: \n{input}")]
+    )
+    chain = guard_rail | (chat_template | llm | StrOutputParser())
+    return chain.invoke({"input": f"blocking tile {index}"})
+
+
+async def async_tile(index):
+    sql_query, _ = await generate_sql_query(llm, guard_rail, f"async tile {index}", "tabular", SCHEMA, "postgres")
+    return sql_query
+
+
+async def bench(name, tile):
+    started = time.perf_counter()
+    await asyncio.gather(*(tile(index) for index in range(TILES)))
+    elapsed = time.perf_counter() - started
+    one_call = GUARDRAIL_LATENCY + LLM_LATENCY
+    print(f"{name:<10} {elapsed:>6.2f} s  ({elapsed / one_call:.1f}x one guardrail + llm call)")
+
+
+async def main():
+    print(f"{TILES} tiles, guardrail {GUARDRAIL_LATENCY}s + llm {LLM_LATENCY}s per tile")
+    await bench("invoke", blocking_tile)
+    await bench("ainvoke", async_tile)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+Prompt size of the stored schema: str(dict) vs. versioned JSON vs. compact DDL rendering.
+
+Introspects a small sample store database and counts the tokens each encoding
+costs when embedded in a prompt. Uses tiktoken when its encoding can be loaded,
+otherwise the chars / 4 estimate used for the prompt budget.
+Run from the repository root:
+    python -m benchmarks.schema_format_benchmark
+"""
+import os
+import sqlite3
+import tempfile
+
+from sqlalchemy import create_engine
+
+from utils.schema_format import decode_schema, encode_schema, render_schema
+from utils.schema_index import estimate_tokens
+from utils.schema_introspection import introspect_schema
+
+SAMPLE_SCHEMA = """
+CREATE TABLE customers (id INTEGER PRIMARY KEY, first_name VARCHAR(50) NOT NULL, last_name VARCHAR(50) NOT NULL,
+    email VARCHAR(120), country VARCHAR(50), created_at DATETIME);
+CREATE TABLE categories (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL, description TEXT);
+CREATE TABLE suppliers (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, country VARCHAR(50), phone VARCHAR(30));
+CREATE TABLE products (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, price NUMERIC(10, 2) NOT NULL,
+    stock INTEGER DEFAULT 0, category_id INTEGER REFERENCES categories(id), supplier_id INTEGER REFERENCES suppliers(id));
+CREATE TABLE employees (id INTEGER PRIMARY KEY, first_name VARCHAR(50), last_name VARCHAR(50), title VARCHAR(50),
+    hired_at DATE, manager_id INTEGER REFERENCES employees(id));
+CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL REFERENCES customers(id),
+    employee_id INTEGER REFERENCES employees(id), ordered_at DATETIME NOT NULL, status VARCHAR(20) DEFAULT 'new');
+CREATE TABLE order_items (order_id INTEGER REFERENCES orders(id), product_id INTEGER REFERENCES products(id),
+    quantity INTEGER NOT NULL, unit_price NUMERIC(10, 2) NOT NULL, PRIMARY KEY (order_id, product_id));
+CREATE TABLE payments (id INTEGER PRIMARY KEY, order_id INTEGER REFERENCES orders(id), amount NUMERIC(10, 2),
+    method VARCHAR(20), paid_at DATETIME);
+CREATE TABLE shipments (id INTEGER PRIMARY KEY, order_id INTEGER REFERENCES orders(id), carrier VARCHAR(50),
+    shipped_at DATETIME, delivered_at DATETIME);
+"""
+
+
+def token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return "tiktoken o200k_base", lambda text: len(encoding.encode(text))
+    except Exception:
+        return "chars / 4 estimate", estimate_tokens
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "store.db")
+        connection = sqlite3.connect(path)
+        connection.executescript(SAMPLE_SCHEMA)
+        connection.close()
+
+        engine = create_engine(f"sqlite:///{path}")
+        scheme = introspect_schema(engine)
+        engine.dispose()
+
+    name, count = token_counter()
+    legacy = count(str(scheme))
+    encoded = encode_schema(scheme)
+    encodings = {
+        "str(dict)": legacy,
+        "versioned json": count(encoded),
+        "compact ddl": count(render_schema(decode_schema(encoded))),
+    }
+    print(f"{len(scheme)} tables, tokens counted with {name}")
+    for encoding, tokens in encodings.items():
+        print(f"{encoding:<16} {tokens:>6} tokens  {100 * (1 - tokens / legacy):>5.1f}% smaller")
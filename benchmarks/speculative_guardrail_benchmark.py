@@ -0,0 +1,58 @@
+"""
+SQL generation latency: guardrail check then generation vs. both started speculatively.
+
+Uses a guardrail and chat model that only wait a fixed latency and reports the
+sql_generation.* timers recorded by generate_sql_query.
+Run from the repository root:
+    python -m benchmarks.speculative_guardrail_benchmark
+"""
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.runnables import RunnableLambda
+
+from benchmarks.llm_concurrency_benchmark import SCHEMA, LatencyChatModel
+from config.guard_config import settings as guard_settings
+from utils.metrics import metrics
+from utils.user_queries import generate_sql_query
+
+REQUESTS = 20
+GUARDRAIL_LATENCY = 0.2
+LLM_LATENCY = 0.3
+
+
+async def _check(value):
+    await asyncio.sleep(GUARDRAIL_LATENCY)
+    return value
+
+
+class LatencyRails:
+    # stands in for LLMRails: input rails that allow everything after GUARDRAIL_LATENCY
+    async def generate_async(self, messages, options=None):
+        await asyncio.sleep(GUARDRAIL_LATENCY)
+        return SimpleNamespace(log=SimpleNamespace(activated_rails=[SimpleNamespace(stop=False)]))
+
+
+guard_rail = RunnableLambda(_check)
+guard_rail.rails = LatencyRails()
+llm = LatencyChatModel(latency=LLM_LATENCY)
+
+
+async def bench(name, speculative):
+    guard_settings.GUARDRAIL_SPECULATIVE = speculative
+    metrics.__init__()
+    for index in range(REQUESTS):
+        # "tile" questions aren't cleared by the local pre-check, so the guardrail always runs
+        await generate_sql_query(llm, guard_rail, f"{name} tile {index}", "tabular", SCHEMA, "postgres")
+    timer = metrics.snapshot()["timers"]["sql_generation.total"]
+    print(f"{name:<12} p50 {timer['p50_ms']:>7.1f} ms  p95 {timer['p95_ms']:>7.1f} ms")
+
+
+async def main():
+    print(f"{REQUESTS} requests, guardrail {GUARDRAIL_LATENCY}s + llm {LLM_LATENCY}s")
+    await bench("sequential", False)
+    await bench("speculative", True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
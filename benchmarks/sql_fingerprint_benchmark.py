@@ -0,0 +1,64 @@
+"""
+Cost of fingerprinting a generated statement, per statement and provider.
+
+Times tokenizing, canonicalizing, templating and extracting the tables and
+columns of typical generated SQL (uncached), the lru_cached analyze() call
+that repeated refreshes hit, and a plain sha256 of the raw text for scale.
+Run from the repository root:
+    python -m benchmarks.sql_fingerprint_benchmark
+"""
+import hashlib
+import time
+
+from utils.sql_fingerprint import analyze, canonicalize, references, template
+
+ROUNDS = 2000
+
+STATEMENTS = {
+    "postgres": """
+        SELECT c.country, date_trunc('month', o.ordered_at) AS month, SUM(oi.quantity * oi.unit_price) AS revenue
+        FROM orders o
+        JOIN customers c ON c.id = o.customer_id
+        JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.status IN ('paid', 'shipped', 'delivered') AND o.ordered_at >= '2024-01-01'
+        GROUP BY c.country, month
+        ORDER BY revenue DESC
+        LIMIT 20;
+    """,
+    "mysql": """
+        SELECT `p`.`name`, COUNT(*) AS orders, AVG(oi.unit_price) avg_price
+        FROM products p JOIN order_items oi ON oi.product_id = p.id
+        WHERE p.price BETWEEN 10 AND 200 AND p.name LIKE "%lamp%"
+        GROUP BY p.name HAVING COUNT(*) > 5
+    """,
+    "sqlserver": """
+        WITH monthly AS (
+            SELECT YEAR(paid_at) AS y, MONTH(paid_at) AS m, SUM(amount) AS total FROM [dbo].[payments] GROUP BY YEAR(paid_at), MONTH(paid_at)
+        )
+        SELECT TOP 12 y, m, total FROM monthly ORDER BY y DESC, m DESC
+    """,
+    "sqlite": "select count(*) from shipments s where s.delivered_at is null and s.carrier = 'UPS'",
+}
+
+
+def per_statement(function, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        function(*args)
+    return (time.perf_counter() - started) / ROUNDS * 1_000_000
+
+
+if __name__ == "__main__":
+    print(f"microseconds per statement, {ROUNDS} rounds")
+    print(f"{'provider':<10} {'sha256':>8} {'canonical':>10} {'template':>9} {'refs':>8} {'analyze':>8} {'cached':>8}")
+    for provider, sql_query in STATEMENTS.items():
+        analyze.cache_clear()
+        timings = [
+            per_statement(lambda: hashlib.sha256(sql_query.encode()).hexdigest()),
+            per_statement(canonicalize, sql_query, provider),
+            per_statement(template, sql_query, provider),
+            per_statement(references, sql_query, provider),
+            per_statement(lambda: (analyze.cache_clear(), analyze(sql_query, provider))),
+            per_statement(analyze, sql_query, provider),
+        ]
+        print(f"{provider:<10} " + " ".join(f"{timing:>{width}.1f}" for timing, width in zip(timings, (8, 10, 9, 8, 8, 8))))
@@ -0,0 +1,44 @@
+import os
+import dotenv
+
+dotenv.load_dotenv()
+
+
+class Settings:
+
+    REDIS_HOST: str = os.environ.get("REDIS_HOST")
+    REDIS_PORT: int = int(os.environ.get("REDIS_PORT", 6379))
+
+    # natural language -> sql cache
+    SQL_CACHE_ENABLED: bool = os.environ.get("SQL_CACHE_ENABLED", "True") == "True"
+    SQL_CACHE_USE_REDIS: bool = os.environ.get("SQL_CACHE_USE_REDIS", "False") == "True"
+    SQL_CACHE_TTL: int = int(os.environ.get("SQL_CACHE_TTL", 24 * 60 * 60))
+    SQL_CACHE_MAX_ENTRIES: int = int(os.environ.get("SQL_CACHE_MAX_ENTRIES", 1024))
+
+    # guardrail input verdicts
+    GUARDRAIL_CACHE_ENABLED: bool = os.environ.get("GUARDRAIL_CACHE_ENABLED", "True") == "True"
+    GUARDRAIL_CACHE_USE_REDIS: bool = os.environ.get("GUARDRAIL_CACHE_USE_REDIS", "False") == "True"
+    GUARDRAIL_CACHE_TTL: int = int(os.environ.get("GUARDRAIL_CACHE_TTL", 7 * 24 * 60 * 60))
+    GUARDRAIL_CACHE_MAX_ENTRIES: int = int(os.environ.get("GUARDRAIL_CACHE_MAX_ENTRIES", 4096))
+
+    # coalescing of concurrent identical refreshes, query runs and sql executions
+    SINGLEFLIGHT_ENABLED: bool = os.environ.get("SINGLEFLIGHT_ENABLED", "True") == "True"
+    SINGLEFLIGHT_USE_REDIS: bool = os.environ.get("SINGLEFLIGHT_USE_REDIS", "False") == "True"
+    # longest a leader holds the cross-process lock, and followers wait for it
+    SINGLEFLIGHT_LOCK_TTL: int = int(os.environ.get("SINGLEFLIGHT_LOCK_TTL", 600))
+    SINGLEFLIGHT_WAIT_TIMEOUT: float = float(os.environ.get("SINGLEFLIGHT_WAIT_TIMEOUT", 600))
+    SINGLEFLIGHT_POLL_INTERVAL: float = float(os.environ.get("SINGLEFLIGHT_POLL_INTERVAL", 0.2))
+    # how long a published result stays readable for followers in other processes
+    SINGLEFLIGHT_RESULT_TTL: int = int(os.environ.get("SINGLEFLIGHT_RESULT_TTL", 60))
+
+    # results of executed sql, per customer database
+    RESULT_CACHE_ENABLED: bool = os.environ.get("RESULT_CACHE_ENABLED", "True") == "True"
+    RESULT_CACHE_USE_REDIS: bool = os.environ.get("RESULT_CACHE_USE_REDIS", "False") == "True"
+    # default ttl, a database's own result_cache_ttl wins over it
+    RESULT_CACHE_TTL: int = int(os.environ.get("RESULT_CACHE_TTL", 5 * 60))
+    # compressed bytes kept in process memory, larger results are never cached
+    RESULT_CACHE_MAX_BYTES: int = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    RESULT_CACHE_MAX_ENTRY_BYTES: int = int(os.environ.get("RESULT_CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024))
+
+
+settings = Settings()
@@ -0,0 +1,24 @@
+import os
+import dotenv
+
+dotenv.load_dotenv()
+
+
+class Settings:
+
+    # tiles refreshed at the same time per dashboard, each one an llm + warehouse round trip
+    REFRESH_CONCURRENCY: int = int(os.environ.get("DASHBOARD_REFRESH_CONCURRENCY", 5))
+    REFRESH_TILE_TIMEOUT: float = float(os.environ.get("DASHBOARD_REFRESH_TILE_TIMEOUT", 120))
+
+    # scheduled refresh of dashboards with a refresh interval, run by the job worker
+    SCHEDULER_ENABLED: bool = os.environ.get("DASHBOARD_SCHEDULER_ENABLED", "true").lower() == "true"
+    SCHEDULER_TICK: float = float(os.environ.get("DASHBOARD_SCHEDULER_TICK", 60))
+    # tiles refreshed at the same time across all scheduled dashboards
+    SCHEDULER_CONCURRENCY: int = int(os.environ.get("DASHBOARD_SCHEDULER_CONCURRENCY", 4))
+    # most tiles refreshed per tick, the rest wait for the next one in priority order
+    SCHEDULER_MAX_TILES: int = int(os.environ.get("DASHBOARD_SCHEDULER_MAX_TILES", 50))
+    # a dashboard viewed this long ago gets half the priority of one viewed just now
+    SCHEDULER_VIEW_HALF_LIFE: float = float(os.environ.get("DASHBOARD_SCHEDULER_VIEW_HALF_LIFE", 3600))
+
+
+settings = Settings()
@@ -0,0 +1,36 @@
+import os
+import dotenv
+
+dotenv.load_dotenv()
+
+
+class Settings:
+
+    # connection pool settings for customer databases
+    POOL_SIZE: int = int(os.environ.get("CUSTOMER_DB_POOL_SIZE", 5))
+    MAX_OVERFLOW: int = int(os.environ.get("CUSTOMER_DB_MAX_OVERFLOW", 5))
+    POOL_TIMEOUT: int = int(os.environ.get("CUSTOMER_DB_POOL_TIMEOUT", 30))
+    POOL_RECYCLE: int = int(os.environ.get("CUSTOMER_DB_POOL_RECYCLE", 1800))
+
+    # engine registry limits
+    MAX_ENGINES: int = int(os.environ.get("CUSTOMER_DB_MAX_ENGINES", 50))
+    IDLE_TIMEOUT: int = int(os.environ.get("CUSTOMER_DB_IDLE_TIMEOUT", 600))
+
+    # query execution: native async drivers where available, else a bounded thread pool
+    USE_ASYNC_DRIVERS: bool = os.environ.get("CUSTOMER_DB_USE_ASYNC_DRIVERS", "True") == "True"
+    EXECUTOR_MAX_WORKERS: int = int(os.environ.get("CUSTOMER_DB_EXECUTOR_MAX_WORKERS", 8))
+    STREAM_CHUNK_SIZE: int = int(os.environ.get("CUSTOMER_DB_STREAM_CHUNK_SIZE", 500))
+    # executions slower than this are logged with their fingerprint
+    SLOW_QUERY_SECONDS: float = float(os.environ.get("CUSTOMER_DB_SLOW_QUERY_SECONDS", 5))
+    # seconds a statement may run on a customer database, 0 for no limit. A database's own
+    # statement_timeout wins over it, requests can only shorten it
+    STATEMENT_TIMEOUT: float = float(os.environ.get("CUSTOMER_DB_STATEMENT_TIMEOUT", 120))
+    # longest wait for the database to acknowledge a cancelled statement
+    CANCEL_TIMEOUT: float = float(os.environ.get("CUSTOMER_DB_CANCEL_TIMEOUT", 5))
+    # most rows a query returns at once, larger tabular results are paged through with page_token
+    ROW_LIMIT: int = int(os.environ.get("CUSTOMER_DB_ROW_LIMIT", 100))
+    # most rows a chart or description is built from, those aren't paged
+    CHART_ROW_LIMIT: int = int(os.environ.get("CUSTOMER_DB_CHART_ROW_LIMIT", 5000))
+
+
+settings = Settings()
@@ -0,0 +1,29 @@
+import os
+import dotenv
+
+dotenv.load_dotenv()
+
+
+class Settings:
+
+    # skip the guardrail llm call for questions the local pre-check finds obviously safe
+    GUARDRAIL_LOCAL_PRECHECK: bool = os.environ.get("GUARDRAIL_LOCAL_PRECHECK", "True") == "True"
+    # run the guardrail input check and sql generation concurrently instead of one after the other
+    GUARDRAIL_SPECULATIVE: bool = os.environ.get("GUARDRAIL_SPECULATIVE", "True") == "True"
+
+    # EXPLAIN generated sql before it runs and hold back statements the database expects to be expensive
+    COST_GUARD_ENABLED: bool = os.environ.get("COST_GUARD_ENABLED", "True") == "True"
+    # estimated rows and plan cost above which a statement is held back, 0 for no limit.
+    # A database's own thresholds win over them
+    COST_GUARD_MAX_ROWS: int = int(os.environ.get("COST_GUARD_MAX_ROWS", 50_000_000))
+    COST_GUARD_MAX_COST: float = float(os.environ.get("COST_GUARD_MAX_COST", 0))
+    # "sample" runs held back statements on the first rows of every table they read, "reject" refuses them
+    COST_GUARD_ACTION: str = os.environ.get("COST_GUARD_ACTION", "sample")
+    COST_GUARD_SAMPLE_ROWS: int = int(os.environ.get("COST_GUARD_SAMPLE_ROWS", 1000))
+    COST_GUARD_EXPLAIN_TIMEOUT: float = float(os.environ.get("COST_GUARD_EXPLAIN_TIMEOUT", 10))
+    # seconds the plan of a statement is reused before it is explained again
+    COST_GUARD_PLAN_TTL: int = int(os.environ.get("COST_GUARD_PLAN_TTL", 300))
+    COST_GUARD_PLAN_MAX_ENTRIES: int = int(os.environ.get("COST_GUARD_PLAN_MAX_ENTRIES", 1024))
+
+
+settings = Settings()
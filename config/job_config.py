@@ -0,0 +1,19 @@
+import os
+import dotenv
+
+dotenv.load_dotenv()
+
+
+class Settings:
+
+    # "redis" for separate worker processes, "memory" runs the jobs inside the api process
+    JOBS_BACKEND: str = os.environ.get("JOBS_BACKEND", "redis")
+    JOB_WORKER_CONCURRENCY: int = int(os.environ.get("JOB_WORKER_CONCURRENCY", 4))
+    JOB_MAX_ATTEMPTS: int = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETRY_BACKOFF: float = float(os.environ.get("JOB_RETRY_BACKOFF", 5))
+    JOB_RETRY_BACKOFF_MAX: float = float(os.environ.get("JOB_RETRY_BACKOFF_MAX", 300))
+    JOB_TIMEOUT: float = float(os.environ.get("JOB_TIMEOUT", 600))
+    JOB_RESULT_TTL: int = int(os.environ.get("JOB_RESULT_TTL", 24 * 60 * 60))
+
+
+settings = Settings()
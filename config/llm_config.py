@@ -8,6 +8,13 @@ dotenv.load_dotenv()
 class Settings:
     api_key = os.environ.get("API_KEY")
     model = os.environ.get("MODEL")
+    guardrails_path = os.environ.get("GUARDRAILS_PATH", "guardrails")
+    # one keep-alive connection pool shared by every llm call
+    http_max_connections = int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", 100))
+    http_max_keepalive_connections = int(os.environ.get("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    http_keepalive_expiry = float(os.environ.get("LLM_HTTP_KEEPALIVE_EXPIRY", 30))
+    # build the llm clients and guardrails at startup instead of on the first request
+    warm_up = os.environ.get("LLM_WARM_UP", "True") == "True"
 
 
 settings = Settings()
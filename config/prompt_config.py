@@ -6,7 +6,8 @@ dotenv.load_dotenv()
 
 class Settings:
 
-    prompt_path: str = os.environ.get("PROMPT_PATH")
+    prompt_path: str = os.environ.get("PROMPT_PATH", "prompts/prompts.yaml")
+    rendered_prompt_cache_size: int = int(os.environ.get("RENDERED_PROMPT_CACHE_SIZE", 1024))
 
 
 settings = Settings()
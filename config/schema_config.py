@@ -0,0 +1,15 @@
+import os
+import dotenv
+
+dotenv.load_dotenv()
+
+
+class Settings:
+
+    # only the tables relevant to the question go into the prompt
+    SCHEMA_PRUNING_ENABLED: bool = os.environ.get("SCHEMA_PRUNING_ENABLED", "True") == "True"
+    SCHEMA_TOP_K_TABLES: int = int(os.environ.get("SCHEMA_TOP_K_TABLES", 8))
+    SCHEMA_TOKEN_BUDGET: int = int(os.environ.get("SCHEMA_TOKEN_BUDGET", 4000))
+
+
+settings = Settings()
@@ -28,9 +28,9 @@ class DashboardController:
           dashboard_service = DashboardService(db)
           return await dashboard_service.delete_dashboard(user, dashboard_id)
     
-    async def execute_dashboard_queries(dashboard_id:int, db:AsyncSession, user:User):
+    async def execute_dashboard_queries(dashboard_id:int, db:AsyncSession, user:User, reuse_sql:bool=True):
           dashboard_service = DashboardService(db)
-          return await dashboard_service.execute_dashboard_queries(dashboard_id,user)
+          return await dashboard_service.execute_dashboard_queries(dashboard_id,user,reuse_sql)
 
     async def fetch_dashboard_data(dashboard_id:int, db:AsyncSession, user:User):
           dashboard_service = DashboardService(db)
@@ -30,4 +30,6 @@ class DatabaseController:
         daoDbCredentials = DatabaseService(db=db)
         await daoDbCredentials.soft_delete_db(id, user)
 
-
+    async def invalidate_result_cache(id: int, user: User, db: AsyncSession, tables: list[str] | None):
+        daoDbCredentials = DatabaseService(db=db)
+        await daoDbCredentials.invalidate_result_cache(id, user, tables)
@@ -0,0 +1,13 @@
+from models.users import User
+from services.jobs import JobService
+
+
+class JobController:
+
+    async def submit(name: str, user: User, **payload) -> dict:
+        job_service = JobService()
+        return await job_service.submit(name, user, **payload)
+
+    async def get_job(job_id: str, user: User) -> dict:
+        job_service = JobService()
+        return await job_service.get_job(job_id, user)
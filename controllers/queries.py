@@ -10,9 +10,9 @@ class QueryController:
         query_service = QueryService(db=db)
         return await query_service.save_queries(post_queries=post_queries, user=user)
 
-    async def execute_query(query_id, db: AsyncSession, user: User):
+    async def execute_query(query_id, db: AsyncSession, user: User, stream: bool = False, stream_format: str = "ndjson", result_format: str = "records", page_token: str | None = None, timeout: float | None = None):
         query_service = QueryService(db=db)
-        return await query_service.execute_query(query_id, user)
+        return await query_service.execute_query(query_id, user, stream, stream_format, result_format, page_token, timeout)
 
     async def get_insights(query_id: int, use_web:bool, custom_instructions:QueryInsightsRequest, db: AsyncSession, user: User) -> str:
         query_service = QueryService(db=db)
@@ -43,9 +43,9 @@ class QueryController:
         query_service = QueryService(db=db)
         return await query_service.update_query(post_queries, user)
 
-    async def run_query(post_queries: UserQueryRequest, user:User, db: AsyncSession):
+    async def run_query(post_queries: UserQueryRequest, user:User, db: AsyncSession, stream: bool = False, stream_format: str = "ndjson", result_format: str = "records", page_token: str | None = None, timeout: float | None = None):
         query_service = QueryService(db=db)
-        return await query_service.run_query(post_queries, user)
+        return await query_service.run_query(post_queries, user, stream, stream_format, result_format, page_token, timeout)
     
     async def suggest_queries(db_id:int, user: User, db: AsyncSession):
         query_service = QueryService(db=db)
@@ -23,6 +23,7 @@ dashboard_queries = Table(
     Column('y', Integer, nullable=True, default=0),  # vertical position
     Column('w', Integer, nullable=True, default=6),  # width
     Column('h', Integer, nullable=True, default=4),  # height
+    Column('refresh_interval', Integer, nullable=True),  # seconds, overrides the dashboard's interval for this tile
 )
 
 # Many-to-Many Join Table: dashboard_tags
@@ -42,6 +43,8 @@ class Dashboard(Base):
     description = Column(Text, nullable=False)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     db_id = Column(Integer, ForeignKey('databases.id'), nullable=True)
+    refresh_interval = Column(Integer, nullable=True)  # seconds between scheduled refreshes, none when not scheduled
+    last_viewed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
     is_deleted = Column(Boolean, default=False)
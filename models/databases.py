@@ -1,6 +1,8 @@
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
+    Float,
     String,
     DateTime,
     Boolean,
@@ -21,6 +23,12 @@ class Database(Base):
     host = Column(String, nullable=False)
     port = Column(String, nullable=False)
     schema = Column(String, nullable=False)
+    schema_index = Column(String, nullable=True)
+    result_cache_ttl = Column(Integer, nullable=True)  # seconds, none for the default and 0 to never cache results
+    statement_timeout = Column(Integer, nullable=True)  # seconds, none for the default and 0 for no limit
+    cost_guard_max_rows = Column(BigInteger, nullable=True)  # estimated rows a query may read, none for the default and 0 for no limit
+    cost_guard_max_cost = Column(Float, nullable=True)  # estimated plan cost, none for the default and 0 for no limit
+    cost_guard_action = Column(String, nullable=True)  # "sample" or "reject" for queries above the thresholds, none for the default
     db_connection_string = Column(String, nullable=False)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
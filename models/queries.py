@@ -23,7 +23,12 @@ class Query(Base):
     query_text = Column(Text, nullable=True)
     output_type = Column(String, nullable=True)
     generated_sql_query = Column(String, nullable=True)
+    generation_fingerprint = Column(String(64), nullable=True)  # hash of the inputs generated_sql_query was produced from
+    guardrail_verdict_key = Column(String(81), nullable=True)  # guardrail config + question hash the query_text passed under
     data = Column(String, nullable=True)
+    result_cached = Column(Boolean, nullable=True)  # data was built from a cached sql result
+    result_computed_at = Column(DateTime, nullable=True)  # when the sql result behind data was fetched from the database
+    plan_summary = Column(Text, nullable=True)  # json of the EXPLAIN estimates generated_sql_query was let through, sampled or rejected on
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=True, default=func.now(), onupdate=func.now())
     is_deleted = Column(Boolean, default=False)
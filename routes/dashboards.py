@@ -5,6 +5,8 @@ from models.users import User
 from controllers.dashboards import DashboardController
 from schemas.dashboards import DashboardCreate,  DashboardUpdate, UpdateQueriesRequest
 from schemas.generic_response_models import  ApiResponse
+from controllers.jobs import JobController
+from services.jobs import DASHBOARD_REFRESH
 from typing import List
 
 DashboardRoute = APIRouter()
@@ -194,16 +196,32 @@ async def update_dashboard(updated_dashboard:DashboardUpdate, user:User=Depends(
 @DashboardRoute.get("/refresh/{id}", response_model=ApiResponse, summary="Re-execute all queries in a dashboard parallely")
 async def execute_dashboard_queries(
     id:int,
+    reuse_sql:bool=True,
+    background:bool=False,
     db:AsyncSession=Depends(get_db),
     user:User=Depends(get_current_user)
 ):
     try:
-        data = await DashboardController.execute_dashboard_queries(id, db, user)
-        if data:
+        if background:
+            # tiles are refreshed by a job worker, poll /jobs/{job_id} for the per-tile report
+            job = await JobController.submit(DASHBOARD_REFRESH, user, dashboard_id=id, reuse_sql=reuse_sql)
+            return ApiResponse(success=True, message="Dashboard refresh queued", data=job)
+
+        data = await DashboardController.execute_dashboard_queries(id, db, user, reuse_sql)
+        if not data:
             return ApiResponse(
-                success=True,
-                message="Queries executed successfully"
+                success=False,
+                message=f"No queries found for dashboard {id}"
             )
+        # tiles are stored independently, report which ones made it
+        return ApiResponse(
+            success=data["failed"] == 0,
+            message=(
+                "Queries executed successfully" if data["failed"] == 0
+                else f"{data['failed']} of {len(data['tiles'])} queries failed"
+            ),
+            data=data,
+        )
     except Exception as exc:
         return ApiResponse(
             success=False,
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
 from auth.deps import get_current_user, get_db
 from models.users import User
@@ -90,3 +91,17 @@ async def delete_database_credentials(
         message=f"Deleted database credentials with {id=}.",
         data=None,
     )
+
+@DbRoute.post("/{id}/invalidate-cache", response_model=ApiResponse, summary="Drop cached query results of a database")
+async def invalidate_result_cache(
+    id: int,
+    tables: List[str] = Query(default=None, description="Only results reading these tables, all when empty"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await DatabaseController.invalidate_result_cache(id, user, db, tables)
+    return ApiResponse(
+        success=True,
+        message=f"Invalidated cached results of database with {id=}.",
+        data={"tables": tables or "all"},
+    )
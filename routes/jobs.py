@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from auth.deps import get_current_user
+from models.users import User
+from controllers.jobs import JobController
+from schemas.generic_response_models import ApiResponse
+
+JobRoute = APIRouter()
+
+
+@JobRoute.get("/{job_id}", response_model=ApiResponse, summary="Poll the status and result of a background job")
+async def get_job(job_id: str, user: User = Depends(get_current_user)):
+    job = await JobController.get_job(job_id, user)
+    return ApiResponse(
+        success=job["status"] != "failed",
+        message=f"Job {job['status']}",
+        data=job,
+        error=job["error"],
+    )
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from auth.deps import get_current_user
+from models.users import User
+from schemas.generic_response_models import ApiResponse
+from utils.metrics import metrics
+
+MetricsRoute = APIRouter()
+
+@MetricsRoute.get("/", response_model=ApiResponse, summary="Get in-process execution metrics")
+async def get_metrics(user: User = Depends(get_current_user)):
+    return ApiResponse(
+        success=True,
+        message="Metrics retrieved successfully.",
+        data=metrics.snapshot()
+    )
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from auth.deps import get_current_user, get_db
 from models.users import User
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -6,6 +7,9 @@ from schemas.queries import UserQueryRequest, QueryInsightsRequest, SaveQueryReq
 from schemas.generic_response_models import ApiResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from controllers.queries import QueryController
+from controllers.jobs import JobController
+from services.jobs import QUERY_EXECUTE, QUERY_INSIGHTS, QUERY_SUGGEST
+from utils.disconnect import cancel_on_disconnect
 
 QueryRoute = APIRouter()
 
@@ -38,17 +42,37 @@ async def save_queries(
 
 @QueryRoute.post("/execute", summary="Run a query and save output in database")
 async def execute_query(
+    request: Request,
     query_id: int,
+    stream: bool = False,
+    stream_format: str = "ndjson",
+    result_format: str = "records",
+    background: bool = False,
+    page_token: str | None = None,
+    statement_timeout: float | None = Query(default=None, gt=0, description="Seconds the sql may run, at most the database's own timeout"),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
 
     try:
-        data = await QueryController.execute_query(query_id, db, user)
+        if background:
+            # return right away, the output is stored by a job worker and polled at /jobs/{job_id}
+            job = await JobController.submit(QUERY_EXECUTE, user, query_id=query_id, result_format=result_format)
+            return ApiResponse(success=True, message="Query execution queued", data=job)
+
+        # page_token comes from next_page_token of the previous page, the stored output stays the first page
+        # a client that goes away cancels the run, and the sql it is waiting for
+        data = await cancel_on_disconnect(
+            request,
+            QueryController.execute_query(query_id, db, user, stream, stream_format, result_format, page_token, statement_timeout),
+        )
         return data
         
     
     except Exception as e:
+        # bad page tokens, missing queries and timed out statements keep their own status
+        if isinstance(e, HTTPException) and e.status_code != status.HTTP_500_INTERNAL_SERVER_ERROR:
+            raise
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error occured while executing query"
@@ -58,12 +82,20 @@ async def execute_query(
 async def get_insights(
     id: int,
     use_web:bool=False,
+    background: bool = False,
     request: QueryInsightsRequest = Depends(),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
 
     try:
+        if background:
+            job = await JobController.submit(
+                QUERY_INSIGHTS, current_user,
+                query_id=id, use_web=use_web, custom_instructions=request.custom_instructions,
+            )
+            return ApiResponse(success=True, message="Insights generation queued", data=job)
+
         insights = await QueryController.get_insights(
             query_id=id,
             use_web=use_web,
@@ -237,12 +269,24 @@ async def update_query(
 
 @QueryRoute.post("/run", response_model=ApiResponse, summary="Execute a query and show output without saving it to the database")
 async def run_query(
+    request: Request,
     post_queries: UserQueryRequest, 
+    stream: bool = False,
+    stream_format: str = "ndjson",
+    result_format: str = "records",
+    page_token: str | None = None,
+    statement_timeout: float | None = Query(default=None, gt=0, description="Seconds the sql may run, at most the database's own timeout"),
     user:User=Depends(get_current_user), 
     db:AsyncSession=Depends(get_db)
     ):
     try:
-        data = await QueryController.run_query(post_queries, user, db)
+        data = await cancel_on_disconnect(
+            request,
+            QueryController.run_query(post_queries, user, db, stream, stream_format, result_format, page_token, statement_timeout),
+        )
+        # tabular results can be streamed as ndjson / chunked json
+        if isinstance(data, StreamingResponse):
+            return data
         return ApiResponse(
             success=True,
             message="Query executed successfully.",
@@ -261,8 +305,12 @@ async def run_query(
     
 
 @QueryRoute.get("/suggest" ,summary="Suggest queries using LLM based on database schema")
-async def suggest_queries(db_id: int, user:User=Depends(get_current_user), db:AsyncSession=Depends(get_db)):
+async def suggest_queries(db_id: int, background: bool = False, user:User=Depends(get_current_user), db:AsyncSession=Depends(get_db)):
     try:
+        if background:
+            job = await JobController.submit(QUERY_SUGGEST, user, db_id=db_id)
+            return ApiResponse(success=True, message="Query suggestions queued", data=job)
+
         queries = await QueryController.suggest_queries(db_id, user, db)
         return queries
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
 
@@ -7,12 +7,14 @@ class DashboardCreate(BaseModel):
     description: Optional[str] = None
     db_id: int
     tags: Optional[List[str]] = None
+    refresh_interval: Optional[int] = Field(default=None, gt=0)
 
 
 class DashboardUpdate(BaseModel):
     name:str
     description: Optional[str] = None
     dashboard_id:int
+    refresh_interval: Optional[int] = Field(default=None, gt=0)
 
 
 class UpdateQuery(BaseModel):
@@ -33,6 +35,7 @@ class QueryLayout(BaseModel):
     y: int
     w: int
     h: int
+    refresh_interval: Optional[int] = Field(default=None, gt=0)
 
 
 class UpdateQueriesRequest(BaseModel):
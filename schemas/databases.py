@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -8,6 +10,11 @@ class DbCredentials(BaseModel):
     db_password: str = Field(examples=["secret"])
     db_host: str = Field(examples=["localhost", "0.0.0.0"])
     db_port: str = Field(examples=["5432"])
+    result_cache_ttl: Optional[int] = Field(default=None, ge=0, examples=[300])
+    statement_timeout: Optional[int] = Field(default=None, ge=0, examples=[60])
+    cost_guard_max_rows: Optional[int] = Field(default=None, ge=0, examples=[10000000])
+    cost_guard_max_cost: Optional[float] = Field(default=None, ge=0, examples=[1000000])
+    cost_guard_action: Optional[Literal["sample", "reject"]] = Field(default=None, examples=["sample"])
 
 
 class UpdatedCredentials(BaseModel):
@@ -17,4 +24,9 @@ class UpdatedCredentials(BaseModel):
     db_password: str = Field(examples=["secret"])
     db_host: str = Field(examples=["localhost", "0.0.0.0"])
     db_port: str = Field(examples=["5432"])
+    result_cache_ttl: Optional[int] = Field(default=None, ge=0, examples=[300])
+    statement_timeout: Optional[int] = Field(default=None, ge=0, examples=[60])
+    cost_guard_max_rows: Optional[int] = Field(default=None, ge=0, examples=[10000000])
+    cost_guard_max_cost: Optional[float] = Field(default=None, ge=0, examples=[1000000])
+    cost_guard_action: Optional[Literal["sample", "reject"]] = Field(default=None, examples=["sample"])
     db_id: int = Field(examples=[5])
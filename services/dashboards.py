@@ -1,19 +1,12 @@
 import os
 import json
-import asyncio
+import time
+from functools import partial
 
 from typing import List
 from fastapi import HTTPException, status
-from sqlalchemy import select, update, create_engine, text, func
+from sqlalchemy import select, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import sessionmaker
-import nest_asyncio
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers.string import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
-from langchain_core.messages import SystemMessage
-from nemoguardrails.integrations.langchain.runnable_rails import RunnableRails
-from nemoguardrails import RailsConfig
 
 from models.databases import Database
 from models.queries import Query
@@ -22,15 +15,21 @@ from models.tags import Tag
 from models.dashboards import Dashboard, dashboard_queries, dashboard_tags
 from schemas.dashboards import DashboardCreate, DashboardUpdate, UpdateQueriesRequest
 from utils.logger import logger
-from utils.user_queries import result_to_json, load_prompts, choose_prompt
-from config.llm_config import settings as llm_settings
-from config import llm_config
+from utils.user_queries import generate_sql_query, format_query_output, output_row_limit
+from utils.sql_executor import execute_sql_page
+from utils.statement_timeout import statement_timeout
+from utils.cost_guard import CostGuardRejected, cost_guard
+from utils.result_cache import computed_at
+from utils.sql_cache import sql_generation_fingerprint
+from utils.sql_guard import read_only_violation
+from utils.guardrail_cache import guardrail_cache
+from utils.llm_runtime import llm_runtime
+from utils.refresh_engine import run_tiles
+from utils.refresh_scheduler import refresh_priority
+from utils.singleflight import singleflight
+from database.database import AsyncSessionLocal
+from config.dashboard_config import settings as dashboard_settings
 
-os.environ["OPENAI_API_KEY"] = llm_settings.api_key
-nest_asyncio.apply()
-model = llm_config.settings.model
-config = RailsConfig.from_path("guardrails")
-guard_rail = RunnableRails(config=config)
 
 class DashboardService:
     def __init__(self, db: AsyncSession):
@@ -62,7 +61,8 @@ class DashboardService:
             name=dashboard_data.name,
             description=dashboard_data.description,
             user_id=user.id,
-            db_id=dashboard_data.db_id
+            db_id=dashboard_data.db_id,
+            refresh_interval=dashboard_data.refresh_interval,
         )
 
         try:
@@ -183,6 +183,9 @@ class DashboardService:
         if existing_dashboard:
             existing_dashboard.name = updated_dashboard.name
             existing_dashboard.description = updated_dashboard.description
+            # only changed when sent, a rename keeps the schedule
+            if "refresh_interval" in updated_dashboard.model_fields_set:
+                existing_dashboard.refresh_interval = updated_dashboard.refresh_interval
 
             await self.db.commit()
             await self.db.refresh(existing_dashboard)
@@ -224,12 +227,18 @@ class DashboardService:
             return False
         
 
-    async def execute_dashboard_queries(self, dashboard_id: int, user: User):
-    # execute dashobard queries
+    async def _dashboard_tiles(
+        self, dashboard_id: int, user_id: int, reuse_sql: bool = True, query_ids: list[int] | None = None,
+    ) -> dict | None:
+        # refresh tiles of the dashboard's queries, all of them or only query_ids
 
         # Get all queries of that dashboard
-        queries_result = await self.db.execute(
-        select(Query).join(dashboard_queries).where(dashboard_queries.c.dashboard_id == dashboard_id,Query.is_deleted == False, Query.user_id == user.id))
+        statement = select(Query).join(dashboard_queries).where(
+            dashboard_queries.c.dashboard_id == dashboard_id, Query.is_deleted == False, Query.user_id == user_id
+        )
+        if query_ids is not None:
+            statement = statement.where(Query.id.in_(query_ids))
+        queries_result = await self.db.execute(statement)
         queries = queries_result.scalars().all()
 
         if not queries:
@@ -238,7 +247,11 @@ class DashboardService:
 
         # Fetch db schema, connection string, and database provider
         db_info_result = await self.db.execute(
-            select(Database.schema, Database.db_connection_string, Database.db_provider)
+            select(
+                Database.id, Database.schema, Database.db_connection_string, Database.db_provider, Database.schema_index,
+                Database.result_cache_ttl, Database.statement_timeout,
+                Database.cost_guard_max_rows, Database.cost_guard_max_cost, Database.cost_guard_action,
+            )
             .join(Dashboard, Dashboard.db_id == Database.id)
             .where(Dashboard.id == dashboard_id, Database.is_deleted == False)
         )
@@ -248,113 +261,205 @@ class DashboardService:
             logger.warning(f"Database information not found for dashboard ID {dashboard_id}")
             return None
 
-        schema, connection_string, database_provider = db_info
-
-        # Load prompts
-        prompts = load_prompts()
-    
-        # Create LLM instance
-        llm = ChatOpenAI(model=model, temperature=0)
-
-        async def process_single_query(query: Query) -> None:
-            try:
-                query_text = query.query_text
-                output_type = query.output_type
-                query_id = query.id
-
-                # Step 1: Get SQL query based on type
-                prompt = choose_prompt(output_type, schema, database_provider)
-                chat_template = ChatPromptTemplate.from_messages(
-                    [
-                        SystemMessage(content=prompt),
-                        HumanMessagePromptTemplate.from_template("User question: \n{input}"),
-                    ]
+        database_id, schema, connection_string, database_provider, schema_index, result_cache_ttl, database_timeout, *cost_limits = db_info
+        timeout = statement_timeout(database_timeout)
+
+        llm, guard_rail = llm_runtime.llm, llm_runtime.guard_rail
+
+        async def process_single_query(
+            query_id, query_text, output_type, generated_sql_query, generation_fingerprint, verdict_key,
+        ) -> str:
+            # Step 1: Get SQL query based on type
+            # reuse the stored sql when it was generated from the same text, output type and schema
+            fingerprint = sql_generation_fingerprint(query_text, output_type, schema, database_provider)
+            if (
+                reuse_sql and generated_sql_query and generation_fingerprint == fingerprint
+                and read_only_violation(generated_sql_query, database_provider) is None
+            ):
+                sql_query, final_data = generated_sql_query, None
+                logger.info(f'Reusing stored SQL for query with id {query_id}')
+            else:
+                sql_query, final_data = await generate_sql_query(
+                    llm, guard_rail, query_text, output_type, schema, database_provider, schema_index, database_id,
+                    verdict_key,
                 )
-                output_parser = StrOutputParser()
-                llm_chain = chat_template | llm | output_parser
-                guard_rail_chain = guard_rail | llm_chain
 
-                sql_query = guard_rail_chain.invoke({"input": query_text})
-
-                # Check for guardrail block
-                if isinstance(sql_query, dict) and sql_query.get("output") == "I'm sorry, I can't respond to that.":
-                    sql_query = "Query blocked by guardrails"
-                    final_data = "Query blocked by guardrails"
-                    logger.warning(f'Query with id {query_id} blocked by Guardrails')
-                else:
-                    # Step 2: Execute SQL query
-                    engine = create_engine(connection_string)
-                    Session = sessionmaker(bind=engine)
-                    session = Session()
-
-                    if sql_query.strip().lower().startswith("select") and "LIMIT" not in sql_query:
-                        sql_query = f'{sql_query.strip().rstrip(";")} LIMIT 100;'   
-                    query = text(sql_query)
-                    result = session.execute(query)
-                    query_result = result_to_json(result)
-
-                    # Step 3: Process result based on type
-                    if output_type == "tabular":
-                        final_data = query_result
-                    elif output_type == "descriptive":
-                        insights_prompt = (
-                            prompts["system_prompts"]["descriptive_prompt"] +
-                            f'User Query: {query_text}\n' +
-                            f'Generated SQL Query: {sql_query}\n' +
-                            f'Query Output from database: {query_result}'
-                        )
-                        insights_response = await llm.agenerate([insights_prompt])
-                        final_data = insights_response.generations[0][0].text.strip()
-                    else:
-                        chart_prompt = (
-                            prompts["system_prompts"]["chartjs_formatter"] +
-                            f'User Query: {query_text}\n' +
-                            f'Generated SQL Query: {sql_query}\n' +
-                            f'Query Output From Database: {query_result}\n' +
-                            f'Graphical Representation type: {output_type}'
+            # Check for guardrail block
+            blocked = final_data is not None
+            cache, plan_summary = None, None
+            if blocked:
+                logger.warning(f'Query with id {query_id} blocked by Guardrails')
+            else:
+                try:
+                    run_sql, plan_summary = await cost_guard.check(
+                        database_id, connection_string, sql_query, database_provider, timeout, *cost_limits,
+                        row_limit=output_row_limit(output_type),
+                    )
+                except CostGuardRejected as e:
+                    # the tile keeps its last output, the plan tells why it wasn't refreshed
+                    async with AsyncSessionLocal() as session:
+                        await session.execute(
+                            update(Query)
+                            .where(Query.id == query_id)
+                            .values(generated_sql_query=sql_query, plan_summary=json.dumps(e.plan))
                         )
-                        chart_response = await llm.agenerate([chart_prompt])
-                        final_data = json.loads(chart_response.generations[0][0].text.strip())
+                        await session.commit()
+                    logger.warning(f'Query with id {query_id} rejected by the cost guard')
+                    return "rejected"
+
+                # Step 2: Execute SQL query, table tiles show the first ROW_LIMIT rows, chart tiles CHART_ROW_LIMIT
+                query_result, cache, page = await execute_sql_page(
+                    database_id, connection_string, run_sql, ttl=result_cache_ttl, timeout=timeout,
+                    row_limit=output_row_limit(output_type),
+                )
+                if page["truncated"]:
+                    logger.warning(f'Query with id {query_id} returned more rows than its tile shows')
 
-                # Put final data and generated SQL query in table
-                serialized_data = json.dumps(final_data)
-                await self.db.execute(update(Query).where(Query.id == query_id).values(data=serialized_data))
-                await self.db.execute(update(Query).where(Query.id == query_id).values(generated_sql_query=sql_query))
+                # Step 3: Process result based on type
+                final_data = await format_query_output(llm, output_type, query_text, sql_query, query_result)
 
-                logger.info(f'Query with id: {query_id}: {output_type} Output Generated ')
+            # every tile stores its output in its own session as soon as it's done
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(Query)
+                    .where(Query.id == query_id)
+                    .values(
+                        data=json.dumps(final_data),
+                        generated_sql_query=sql_query,
+                        generation_fingerprint=None if blocked else fingerprint,
+                        guardrail_verdict_key=None if blocked else guardrail_cache.key(query_text),
+                        result_cached=cache["hit"] if cache else None,
+                        result_computed_at=computed_at(cache) if cache else None,
+                        plan_summary=json.dumps(plan_summary) if plan_summary else None,
+                    )
+                )
+                await session.commit()
 
-            except Exception as e:
-                logger.error(f'Error processing query {query_text}: {str(e)}')
-                raise
+            logger.info(f'Query with id: {query_id}: {output_type} Output Generated ')
+            return "blocked" if blocked else "ok"
 
-        try:
-            # execute all queries in ||
-            await asyncio.gather(
-                *(process_single_query(query) for query in queries)
+        # plain values only, the tiles must not touch the request session's objects
+        return {
+            query.id: partial(
+                process_single_query,
+                query.id, query.query_text, query.output_type,
+                query.generated_sql_query, query.generation_fingerprint, query.guardrail_verdict_key,
             )
-            await self.db.commit()
-            logger.info(f'Ouptuts stored in db')
-        
-        except Exception as e:
-            await self.db.rollback()
-            logger.error(f'Error in dashboard query exectution: {str(e)}')
-            raise
+            for query in queries
+        }
+
+    async def execute_dashboard_queries(self, dashboard_id: int, user: User, reuse_sql: bool = True):
+    # execute dashobard queries
+        # refreshes of a dashboard already being refreshed wait for that one instead of racing it
+        return await singleflight.do(
+            f"dashboard:{dashboard_id}:{user.id}:{reuse_sql}",
+            partial(self._execute_dashboard_queries, dashboard_id, user, reuse_sql),
+        )
+
+    async def _execute_dashboard_queries(self, dashboard_id: int, user: User, reuse_sql: bool):
+        tiles = await self._dashboard_tiles(dashboard_id, user.id, reuse_sql)
+        if not tiles:
+            return None
+
+        started_at = time.perf_counter()
+        results = await run_tiles(tiles, dashboard_settings.REFRESH_CONCURRENCY, dashboard_settings.REFRESH_TILE_TIMEOUT)
+        failed = sum(result["status"] not in ("ok", "blocked") for result in results)
+        logger.info(f'Refreshed dashboard {dashboard_id}: {len(results) - failed} of {len(results)} tiles stored')
+
+        return {
+            "dashboard_id": dashboard_id,
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+            "tiles": results,
+        }
+
+    async def refresh_scheduled_tiles(self):
+        # refresh the stale tiles of every scheduled dashboard, highest priority first
+
+        # a tile's own interval wins over its dashboard's, tiles without either aren't scheduled
+        interval = func.coalesce(dashboard_queries.c.refresh_interval, Dashboard.refresh_interval)
+        # ages are taken in the database, timestamps are stored naive in its session time zone
+        now = func.localtimestamp()
+        result = await self.db.execute(
+            select(
+                Dashboard.id, Dashboard.user_id, func.extract("epoch", now - Dashboard.last_viewed_at),
+                Query.id, func.extract("epoch", now - Query.updated_at), interval,
+            )
+            .join(dashboard_queries, dashboard_queries.c.dashboard_id == Dashboard.id)
+            .join(Query, Query.id == dashboard_queries.c.query_id)
+            .where(
+                Dashboard.is_deleted == False, Query.is_deleted == False,
+                Query.user_id == Dashboard.user_id, interval.is_not(None),
+            )
+        )
+
+        # Query.updated_at is the freshness watermark, compared to the database's own clock
+        ranked = []
+        for dashboard_id, user_id, viewed_age, query_id, age, refresh_interval in result.all():
+            priority = refresh_priority(
+                float(age) if age is not None else None,
+                refresh_interval,
+                float(viewed_age) if viewed_age is not None else None,
+            )
+            if priority > 0:
+                ranked.append((priority, dashboard_id, user_id, query_id))
+        ranked.sort(reverse=True)
+        ranked = ranked[:dashboard_settings.SCHEDULER_MAX_TILES]
+
+        query_ids_by_dashboard = {}
+        for _, dashboard_id, user_id, query_id in ranked:
+            query_ids_by_dashboard.setdefault((dashboard_id, user_id), []).append(query_id)
+        dashboard_tiles = {}
+        for (dashboard_id, user_id), query_ids in query_ids_by_dashboard.items():
+            dashboard_tiles[dashboard_id] = await self._dashboard_tiles(dashboard_id, user_id, query_ids=query_ids) or {}
+
+        # one run over all dashboards, started in priority order within the global budget.
+        # a query on two dashboards is refreshed once, for the dashboard that ranks it higher
+        tiles = {}
+        for _, dashboard_id, _, query_id in ranked:
+            if query_id in dashboard_tiles[dashboard_id]:
+                tiles.setdefault(query_id, dashboard_tiles[dashboard_id][query_id])
+
+        started_at = time.perf_counter()
+        results = await run_tiles(tiles, dashboard_settings.SCHEDULER_CONCURRENCY, dashboard_settings.REFRESH_TILE_TIMEOUT)
+        failed = sum(result["status"] not in ("ok", "blocked") for result in results)
+        if results:
+            logger.info(
+                f'Scheduled refresh of {len(query_ids_by_dashboard)} dashboards: '
+                f'{len(results) - failed} of {len(results)} tiles stored'
+            )
+
+        return {
+            "dashboards": len(query_ids_by_dashboard),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+            "tiles": results,
+        }
 
     async def fetch_dashboard_data(self, dashboard_id: int, user: User):
         # fetch dashboard data ie. its queries, output, and their layout etc
         try:
+            # a view raises the dashboard's priority for the refresh scheduler, it isn't an edit
             dashboard_result = await self.db.execute(
-                select(Dashboard).where(
+                update(Dashboard)
+                .where(
                     (Dashboard.id == dashboard_id) &
                     (Dashboard.user_id == user.id) &
                     (Dashboard.is_deleted == False)
                 )
+                .values(last_viewed_at=func.now(), updated_at=Dashboard.updated_at)
+                .returning(Dashboard.refresh_interval, Dashboard.last_viewed_at)
             )
-            dashboard = dashboard_result.scalar_one_or_none()
-            
+            dashboard = dashboard_result.one_or_none()
+            await self.db.commit()
+
             if not dashboard:
                 logger.warning(f"Dashboard with ID {dashboard_id} not found or not accessible by user {user.id}")
                 return None
+            # on the database's clock, like updated_at and result_computed_at
+            refresh_interval, viewed_at = dashboard
 
             # Explicitly select only the columns we need
             query_with_layout = await self.db.execute(
@@ -363,7 +468,8 @@ class DashboardService:
                     dashboard_queries.c.x,
                     dashboard_queries.c.y,
                     dashboard_queries.c.w,
-                    dashboard_queries.c.h
+                    dashboard_queries.c.h,
+                    dashboard_queries.c.refresh_interval,
                 )
                 .join(dashboard_queries, Query.id == dashboard_queries.c.query_id)
                 .where(
@@ -375,6 +481,7 @@ class DashboardService:
             results = query_with_layout.all()
             logger.info(f"Fetched all queries with layout for dashboard ID: {dashboard_id}")
 
+            # tiles are served as last stored, by a refresh or the scheduler, never computed here
             serialized_queries = [
                 {
                     "id": query.id,
@@ -384,6 +491,16 @@ class DashboardService:
                     "data": json.loads(query.data) if query.data else None,
                     "updated_at": query.updated_at,
                     "created_at": query.created_at,
+                    "refresh_interval": tile_interval or refresh_interval,
+                    "stale": bool(tile_interval or refresh_interval) and (
+                        query.updated_at is None
+                        or (viewed_at - query.updated_at).total_seconds() > (tile_interval or refresh_interval)
+                    ),
+                    # whether the tile's sql result came from the result cache, and how old that result is
+                    "cache": {
+                        "hit": bool(query.result_cached),
+                        "age_seconds": round(max((viewed_at - query.result_computed_at).total_seconds(), 0), 3),
+                    } if query.result_computed_at else None,
                     # Add layout information
                     "layout": {
                         "x": x,
@@ -392,10 +509,11 @@ class DashboardService:
                         "h": h,
                     }
                 }
-                for query, x, y, w, h in results
+                for query, x, y, w, h, tile_interval in results
             ]
 
             return {
+                "refresh_interval": refresh_interval,
                 "queries": serialized_queries,
             }
 
@@ -432,7 +550,8 @@ class DashboardService:
                         x=query_layout.x,
                         y=query_layout.y,
                         w=query_layout.w,
-                        h=query_layout.h
+                        h=query_layout.h,
+                        **query_layout.model_dump(include={"refresh_interval"}, exclude_unset=True),
                     )
                 )
             await self.db.commit()
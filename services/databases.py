@@ -1,6 +1,8 @@
+import asyncio
 import datetime
+import json
 from fastapi import HTTPException
-from sqlalchemy import create_engine, inspect, select, func, text
+from sqlalchemy import create_engine, select, func, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import status
 from models.databases import Database
@@ -9,6 +11,13 @@ from models.queries import Query
 from schemas.databases import DbCredentials, UpdatedCredentials
 from utils.logger import logger
 from utils.user_queries import get_connection_string
+from utils.engine_registry import engine_registry
+from utils.sql_cache import sql_cache
+from utils.sql_executor import executor
+from utils.schema_introspection import introspect_schema
+from utils.schema_index import build_schema_index
+from utils.schema_format import compact_schema, encode_schema
+from utils.result_cache import result_cache
 from passlib.context import CryptContext
 
 hash_helper = CryptContext(schemes="bcrypt")
@@ -23,43 +32,13 @@ class DatabaseService:
         try:
             # Create sync engine for schema inspection
             engine = create_engine(connection_string)
-            inspector = inspect(engine)
             
             try:
-                tables = inspector.get_table_names()
-                scheme = {}
-                
-                for table_name in tables:
-                    # Get basic column info
-                    columns = inspector.get_columns(table_name)
-                    
-                    # Enhance column information
-                    for column in columns:
-                        # Convert SQLAlchemy type to string representation
-                        column['type'] = str(column['type'])
-                        
-                        # Add foreign key information
-                        fk_info = []
-                        for fk in inspector.get_foreign_keys(table_name):
-                            if column['name'] in fk['constrained_columns']:
-                                fk_info.append({
-                                    'referred_table': fk['referred_table'],
-                                    'referred_column': fk['referred_columns'][0]
-                                })
-                        if fk_info:
-                            column['foreign_keys'] = fk_info
-                        
-                        # Add primary key information
-                        pk_constraint = inspector.get_pk_constraint(table_name)
-                        column['primary_key'] = column['name'] in pk_constraint.get('constrained_columns', [])
-                        
-                        # Clean up any database-specific attributes
-                        column.pop('dialect_options', None)
-                        
-                    scheme[table_name] = columns
+                # catalog queries are blocking, keep them off the event loop
+                loop = asyncio.get_running_loop()
+                scheme = await loop.run_in_executor(executor, introspect_schema, engine)
                 
                 logger.info(f'Connected to database and retrieved schema for user {user.id}')
-                engine.dispose()
                 return scheme
                 
             except Exception as schema_error:
@@ -132,12 +111,18 @@ class DatabaseService:
                 user_id=user.id,
                 db_connection_string=connection_string,
                 created_at=datetime.datetime.now(),
-                schema=str(schema),
+                schema=encode_schema(schema),
+                schema_index=json.dumps(build_schema_index(compact_schema(schema))),
+                result_cache_ttl=db_credentials.result_cache_ttl,
+                statement_timeout=db_credentials.statement_timeout,
+                cost_guard_max_rows=db_credentials.cost_guard_max_rows,
+                cost_guard_max_cost=db_credentials.cost_guard_max_cost,
+                cost_guard_action=db_credentials.cost_guard_action,
             )
             self.db.add(db_credentials_for_db)
             await self.db.commit()
             await self.db.refresh(user)
-            return str(schema)
+            return encode_schema(schema)
             
         logger.error(
             f"{user.id=} couldn't connect to database."
@@ -256,6 +241,8 @@ class DatabaseService:
             connection_string = get_connection_string(updated_credentials)
             schema = await self.connect_to_db_and_get_scheme(connection_string, user)
             if schema:
+                if existing_database.schema != encode_schema(schema):
+                    await sql_cache.invalidate_schema(existing_database.schema)
                 existing_database.db_name = updated_credentials.db_name
                 existing_database.db_provider = updated_credentials.db_provider
                 existing_database.host = updated_credentials.db_host
@@ -263,12 +250,23 @@ class DatabaseService:
                 existing_database.username = updated_credentials.db_username
                 existing_database.password = updated_credentials.db_password
                 existing_database.password = hash_helper.encrypt(updated_credentials.db_password)
-                existing_database.schema = str(schema)
+                existing_database.schema = encode_schema(schema)
+                existing_database.schema_index = json.dumps(build_schema_index(compact_schema(schema)))
                 existing_database.db_connection_string = connection_string
+                # only changed when sent, new credentials keep the database's limits
+                for field in (
+                    "result_cache_ttl", "statement_timeout",
+                    "cost_guard_max_rows", "cost_guard_max_cost", "cost_guard_action",
+                ):
+                    if field in updated_credentials.model_fields_set:
+                        setattr(existing_database, field, getattr(updated_credentials, field))
                 existing_database.created_at = datetime.datetime.now()
 
                 await self.db.commit()
                 await self.db.refresh(user)
+                engine_registry.invalidate(updated_credentials.db_id)
+                # new credentials or schema may read different data
+                await result_cache.invalidate(updated_credentials.db_id)
                 logger.info(
                     f"Db_credentials updated for {user.id=}"
                 )
@@ -331,7 +329,20 @@ class DatabaseService:
             query.is_deleted = True
         await self.db.commit()
         await self.db.refresh(user)
+        engine_registry.invalidate(id)
+        await result_cache.invalidate(id)
 
         logger.info(
             f"Soft deleted database with {id=} for {user.id=}."
         )
+
+    async def invalidate_result_cache(self, id: int, user: User, tables: list[str] | None = None):
+        result = await self.db.execute(
+            select(Database.id).where((Database.id == id) & (Database.user_id == user.id) & (Database.is_deleted == False))
+        )
+        if not result.scalar_one_or_none():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Database with ID {id} not found.",
+            )
+        await result_cache.invalidate(id, tables)
@@ -0,0 +1,97 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.database import AsyncSessionLocal
+from models.users import User
+from services.dashboards import DashboardService
+from services.queries import QueryService
+from utils.jobs import job_handler, job_queue
+from utils.refresh_scheduler import RefreshScheduler
+from utils.logger import logger
+
+# operations that can run in a job worker instead of the request
+DASHBOARD_REFRESH = "dashboard.refresh"
+QUERY_EXECUTE = "query.execute"
+QUERY_INSIGHTS = "query.insights"
+QUERY_SUGGEST = "query.suggest"
+
+
+async def _get_user(session: AsyncSession, user_id: int) -> User:
+    result = await session.execute(select(User).where((User.id == user_id) & (User.is_deleted == False)))
+    user = result.scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id {user_id} not found")
+    return user
+
+
+@job_handler(DASHBOARD_REFRESH)
+async def refresh_dashboard(payload: dict):
+    async with AsyncSessionLocal() as session:
+        user = await _get_user(session, payload["user_id"])
+        return await DashboardService(session).execute_dashboard_queries(
+            payload["dashboard_id"], user, payload.get("reuse_sql", True)
+        )
+
+
+@job_handler(QUERY_EXECUTE)
+async def execute_query(payload: dict):
+    async with AsyncSessionLocal() as session:
+        user = await _get_user(session, payload["user_id"])
+        return await QueryService(session).execute_query(
+            payload["query_id"], user, result_format=payload.get("result_format", "records")
+        )
+
+
+@job_handler(QUERY_INSIGHTS)
+async def get_insights(payload: dict):
+    async with AsyncSessionLocal() as session:
+        user = await _get_user(session, payload["user_id"])
+        insights = await QueryService(session).get_insights(
+            payload["query_id"], payload.get("use_web", False), payload.get("custom_instructions"), user
+        )
+        return {"Insights": insights}
+
+
+@job_handler(QUERY_SUGGEST)
+async def suggest_queries(payload: dict):
+    async with AsyncSessionLocal() as session:
+        user = await _get_user(session, payload["user_id"])
+        return await QueryService(session).suggest_queries(payload["db_id"], user)
+
+
+async def refresh_scheduled_dashboards():
+    async with AsyncSessionLocal() as session:
+        return await DashboardService(session).refresh_scheduled_tiles()
+
+
+# run next to the job workers, see worker.py
+refresh_scheduler = RefreshScheduler(refresh_scheduled_dashboards)
+
+
+class JobService:
+
+    async def submit(self, name: str, user: User, **payload) -> dict:
+        # the user is part of the payload, so identical jobs of different users never merge
+        job = await job_queue.submit(name, {"user_id": user.id, **payload}, user_id=user.id)
+        logger.info(f"{user.id=} submitted job {job['id']} ({name})")
+        return self._public(job)
+
+    async def get_job(self, job_id: str, user: User) -> dict:
+        job = await job_queue.get(job_id)
+        if not job or job["user_id"] != user.id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job with id {job_id} not found")
+        return self._public(job)
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        return {
+            "job_id": job["id"],
+            "name": job["name"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "result": job["result"],
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
@@ -1,20 +1,24 @@
 from fastapi import HTTPException, status
-from sqlalchemy import create_engine, select, text, update, func, insert
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import select, update, func, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from langchain_openai import ChatOpenAI
 
-from nemoguardrails import RailsConfig
-from nemoguardrails.integrations.langchain.runnable_rails import RunnableRails
-import nest_asyncio
-from config import llm_config
-from sqlalchemy.ext.asyncio import AsyncSession
-
-import os, json
+import os, json, time
+from functools import partial
 
 from utils.logger import logger
-from utils.user_queries import  result_to_json, load_prompts, limit_query, generate_sql_query
-from config.llm_config import settings as llm_settings
+from utils.metrics import metrics
+from utils.user_queries import load_prompts, generate_sql_query, format_query_output, output_row_limit
+from utils.sql_executor import execute_sql_page, stream_sql
+from utils.statement_timeout import StatementTimeoutError, statement_timeout
+from utils.cost_guard import CostGuardRejected, cost_guard
+from utils.result_cache import computed_at
+from utils.sql_cache import sql_generation_fingerprint
+from utils.guardrail_cache import guardrail_cache
+from utils.streaming import stream_response
+from utils.singleflight import singleflight
+from utils.llm_runtime import llm_runtime
+from utils.schema_format import decode_schema, render_schema
+from database.database import AsyncSessionLocal
 from models.databases import Database
 from models.queries import Query
 from models.users import User
@@ -22,13 +26,6 @@ from models.dashboards import Dashboard, dashboard_queries
 from schemas.queries import  SaveQueryRequest, UpdateQueryRequest, UserQueryRequest
 from langchain_core.output_parsers import JsonOutputParser
 
-os.environ["OPENAI_API_KEY"] = llm_settings.api_key
-model = llm_config.settings.model
-nest_asyncio.apply()
-config = RailsConfig.from_path("guardrails")
-guard_rail = RunnableRails(config=config)
-llm = ChatOpenAI(model=model, temperature=0)
-
 
 class QueryService:
     def __init__(self, db: AsyncSession):
@@ -64,11 +61,31 @@ class QueryService:
                 },
             )
         
-    async def execute_query(self, query_id, user: User):
+    async def execute_query(
+        self, query_id, user: User, stream: bool = False, stream_format: str = "ndjson", result_format: str = "records",
+        page_token: str | None = None, timeout: float | None = None,
+    ):
+        if stream:
+            # a stream belongs to its own response, it can't be shared
+            return await self._execute_query(query_id, user, stream, stream_format, result_format, None, timeout)
+        # concurrent runs of the same saved query share one pipeline and one Query.data update
+        return await singleflight.do(
+            f"query:{query_id}:{result_format}:{page_token or ''}:{timeout}",
+            partial(self._execute_query, query_id, user, False, stream_format, result_format, page_token, timeout),
+        )
+
+    async def _execute_query(
+        self, query_id, user: User, stream: bool, stream_format: str, result_format: str, page_token: str | None,
+        timeout: float | None,
+    ):
 
         # get query, schema, connection string, and database provider
         query_result = await self.db.execute(
-            select(Query, Database.schema, Database.db_connection_string, Database.db_provider)
+            select(
+                Query, Database.schema, Database.db_connection_string, Database.db_provider, Database.schema_index,
+                Database.result_cache_ttl, Database.statement_timeout,
+                Database.cost_guard_max_rows, Database.cost_guard_max_cost, Database.cost_guard_action,
+            )
             .join(Database, Query.db_id == Database.id)
             .where(Query.id == query_id, Query.is_deleted == False)
         )
@@ -78,59 +95,99 @@ class QueryService:
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Query with id {query_id} not found"
             )
-        query, schema, connection_string, database_provider = result
+        query, schema, connection_string, database_provider, schema_index, result_cache_ttl, database_timeout, *cost_limits = result
+        timeout = statement_timeout(database_timeout, timeout)
 
         try:
             output_type = query.output_type
             query_text = query.query_text
 
             # step 1: get sql query based on type
-            sql_query, final_data = await generate_sql_query(llm, guard_rail, query_text, output_type, schema, database_provider)
+            sql_query, final_data = await generate_sql_query(
+                llm_runtime.llm, llm_runtime.guard_rail, query_text, output_type, schema, database_provider, schema_index, query.db_id,
+                query.guardrail_verdict_key,
+            )
+            fingerprint = (
+                sql_generation_fingerprint(query_text, output_type, schema, database_provider)
+                if final_data is None else None
+            )
+            # the question passed the input checks, saved queries skip them until the text changes
+            verdict_key = guardrail_cache.key(query_text) if final_data is None else None
 
-            if final_data is None:
-                # step 2: execute sql query
-                engine = create_engine(connection_string)
-                Session = sessionmaker(bind=engine)
-                session = Session()
-                limit_query(sql_query)
-                result = session.execute(text(sql_query))
-                query_result = result_to_json(result)
+            if page_token and output_type != "tabular":
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Only tabular results are paged",
+                )
 
-                # Step 3: Process result based on type
-                prompts = load_prompts()
-                if output_type == "tabular":
-                    final_data = query_result
-                elif output_type == "descriptive":
-                    insights_prompt = (
-                        prompts["system_prompts"]["descriptive_prompt"] +
-                        f'User Query: {query_text}\n' +
-                        f'Generated SQL Query: {sql_query}\n' +
-                        f'Query Output from database: {query_result}'
+            run_sql, plan_summary = sql_query, None
+            if final_data is None:
+                # statements the database expects to be too expensive run as a preview, or not at all
+                try:
+                    run_sql, plan_summary = await cost_guard.check(
+                        query.db_id, connection_string, sql_query, database_provider, timeout, *cost_limits,
+                        paged=not (stream and output_type == "tabular"), row_limit=output_row_limit(output_type),
+                    )
+                except CostGuardRejected as e:
+                    await self.db.execute(
+                        update(Query)
+                        .where(Query.id == query_id)
+                        .values(generated_sql_query=sql_query, plan_summary=json.dumps(e.plan))
                     )
-                    insights_response = await llm.agenerate([insights_prompt])
-                    final_data = insights_response.generations[0][0].text.strip()
-                else:
-                    chart_prompt = (
-                        prompts["system_prompts"]["chartjs_formatter"] +
-                        f'User Query: {query_text}\n' +
-                        f'Generated SQL Query: {sql_query}\n' +
-                        f'Query Output From Database: {query_result}\n' +
-                        f'Graphical Representation type: {output_type}'
+                    await self.db.commit()
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail={"message": str(e), "generated_sql_query": sql_query, "plan_summary": e.plan},
                     )
-                    chart_response = await llm.agenerate([chart_prompt])
-                    final_data = json.loads(chart_response.generations[0][0].text.strip())
 
+            if stream and final_data is None and output_type == "tabular":
+                # stream rows to the client as they arrive, store the output once the stream is done
+                # streams aren't capped at ROW_LIMIT, the client reading them bounds them. Only the
+                # first ROW_LIMIT rows are stored, the same first page a run without streaming stores
 
-            # put final data and generated sql query in queries table
-            serialized_data = json.dumps(final_data)
-            await self.db.execute(
-                update(Query)
-                .where(Query.id == query_id)
-                .values(data=serialized_data, generated_sql_query=sql_query)
-            )
-            await self.db.commit()
+                async def save_output(rows):
+                    await self._save_query_output(
+                        query_id, sql_query, fingerprint, verdict_key, rows, {"hit": False, "age_seconds": 0.0}, plan_summary,
+                    )
+
+                return stream_response(
+                    {"success": True, "generated_sql_query": sql_query, "plan_summary": plan_summary},
+                    stream_sql(query.db_id, connection_string, run_sql, timeout),
+                    stream_format,
+                    on_complete=save_output,
+                )
+
+            cache, page = None, {"truncated": False, "next_page_token": None}
+            if final_data is None:
+                # step 2: execute sql query, at most ROW_LIMIT rows of it, CHART_ROW_LIMIT for charts and descriptions
+                # columnar output is only offered for tabular results, the llm formatters expect records
+                query_result, cache, page = await execute_sql_page(
+                    query.db_id, connection_string, run_sql,
+                    result_format if output_type == "tabular" else "records",
+                    ttl=result_cache_ttl, token=page_token, timeout=timeout, row_limit=output_row_limit(output_type),
+                )
+
+                # Step 3: Process result based on type
+                final_data = await format_query_output(llm_runtime.llm, output_type, query_text, sql_query, query_result)
+
+
+            # put final data and generated sql query in queries table, the stored output is the first page
+            if not page_token:
+                serialized_data = json.dumps(final_data)
+                await self.db.execute(
+                    update(Query)
+                    .where(Query.id == query_id)
+                    .values(
+                        data=serialized_data, generated_sql_query=sql_query,
+                        generation_fingerprint=fingerprint, guardrail_verdict_key=verdict_key,
+                        result_cached=cache["hit"] if cache else None,
+                        result_computed_at=computed_at(cache) if cache else None,
+                        plan_summary=json.dumps(plan_summary) if plan_summary else None,
+                    )
+                )
+                await self.db.commit()
 
-            logger.info(f'Output stored in db')
+                logger.info(f'Output stored in db')
 
             # return api response
             return {
@@ -139,9 +196,17 @@ class QueryService:
                 "data": {
                     "generated_sql_query": sql_query,
                     "query_result": final_data,
+                    "cache": cache,
+                    **page,
+                    "preview": bool(plan_summary and plan_summary["verdict"] == "sampled"),
+                    "plan_summary": plan_summary,
                 }
             }
         
+        except HTTPException:
+            raise
+        except StatementTimeoutError as e:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
         except Exception as e:
             logger.error(f"{user.id=} Error occured while executing query. Reason: {e}")
             raise HTTPException(
@@ -149,6 +214,25 @@ class QueryService:
                 detail="Error occured while executing query"
             )
 
+    async def _save_query_output(
+        self, query_id: int, sql_query: str, fingerprint: str | None, verdict_key: str | None, final_data, cache: dict,
+        plan_summary: dict | None = None,
+    ):
+        # runs after a streamed response, when the request scoped session is already closed
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(Query)
+                .where(Query.id == query_id)
+                .values(
+                    data=json.dumps(final_data), generated_sql_query=sql_query,
+                    generation_fingerprint=fingerprint, guardrail_verdict_key=verdict_key,
+                    result_cached=cache["hit"], result_computed_at=computed_at(cache),
+                    plan_summary=json.dumps(plan_summary) if plan_summary else None,
+                )
+            )
+            await session.commit()
+        logger.info(f'Streamed output for query {query_id} stored in db')
+
     async def get_insights(self, query_id: int, use_web: bool, custom_instructions:str | None, user:User) -> str:
         try:
             result = await self.db.execute(select(Query).where( (Query.id==query_id) & (Query.is_deleted==False) & (Query.user_id==user.id))) 
@@ -177,7 +261,7 @@ class QueryService:
             logger.info(f'Generating insights for query id: {query_id}...')
 
             # generate insights using llm
-            response = await llm.agenerate([prompt])
+            response = await llm_runtime.llm.agenerate([prompt])
             
             if response:
                 insights = response.generations[0][0].text.strip()
@@ -474,7 +558,11 @@ class QueryService:
                 detail="Error occurred while updating query."
             )
         
-    async def run_query(self, post_queries: UserQueryRequest, user: User):
+    async def run_query(
+        self, post_queries: UserQueryRequest, user: User, stream: bool = False, stream_format: str = "ndjson",
+        result_format: str = "records", page_token: str | None = None, timeout: float | None = None,
+    ):
+        started_at = time.perf_counter()
         try:
             query_text = post_queries.query_text
             output_type = post_queries.output_type
@@ -484,7 +572,11 @@ class QueryService:
 
             # get schema, connection string, and database provider
             query_result = await self.db.execute(
-                select(Database.schema, Database.db_connection_string, Database.db_provider)
+                select(
+                    Database.schema, Database.db_connection_string, Database.db_provider, Database.schema_index,
+                    Database.result_cache_ttl, Database.statement_timeout,
+                    Database.cost_guard_max_rows, Database.cost_guard_max_cost, Database.cost_guard_action,
+                )
                 .where((Database.id == database_id) & (Database.user_id == user.id))
             )
             result = query_result.one_or_none()
@@ -494,52 +586,69 @@ class QueryService:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Database not found"
                 )
-            schema, connection_string, database_provider = result
+            schema, connection_string, database_provider, schema_index, result_cache_ttl, database_timeout, *cost_limits = result
+            timeout = statement_timeout(database_timeout, timeout)
 
             # step 1: get sql query based on type
-            sql_query, final_data = await generate_sql_query(llm, guard_rail, query_text, output_type, schema, database_provider)
+            sql_query, final_data = await generate_sql_query(llm_runtime.llm, llm_runtime.guard_rail, query_text, output_type, schema, database_provider, schema_index, database_id)
+
+            if page_token and output_type != "tabular":
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Only tabular results are paged",
+                )
+
+            run_sql, plan_summary = sql_query, None
+            if final_data is None:
+                # statements the database expects to be too expensive run as a preview, or not at all
+                run_sql, plan_summary = await cost_guard.check(
+                    database_id, connection_string, sql_query, database_provider, timeout, *cost_limits,
+                    paged=not (stream and output_type == "tabular"), row_limit=output_row_limit(output_type),
+                )
+
+            if stream and final_data is None and output_type == "tabular":
+                logger.info(f"Streaming query result for user {user.id}")
+                return stream_response(
+                    {"generated_sql_query": sql_query, "plan_summary": plan_summary},
+                    stream_sql(database_id, connection_string, run_sql, timeout),
+                    stream_format,
+                )
 
+            cache, page = None, {"truncated": False, "next_page_token": None}
             if final_data is None:
-                # step 2: execute sql query
-                engine = create_engine(connection_string)
-                Session = sessionmaker(bind=engine)
-                session = Session()
-                limit_query(sql_query)
-                result = session.execute(text(sql_query))
-                query_result = result_to_json(result)
+                # step 2: execute sql query, at most ROW_LIMIT rows of it, CHART_ROW_LIMIT for charts and descriptions
+                # columnar output is only offered for tabular results, the llm formatters expect records
+                query_result, cache, page = await execute_sql_page(
+                    database_id, connection_string, run_sql,
+                    result_format if output_type == "tabular" else "records",
+                    ttl=result_cache_ttl, token=page_token, timeout=timeout, row_limit=output_row_limit(output_type),
+                )
 
                 # Step 3: Process result based on type
-                prompts = load_prompts()
-                if output_type == "tabular":
-                    final_data = query_result
-                elif output_type == "descriptive":
-                    insights_prompt = (
-                        prompts["system_prompts"]["descriptive_prompt"] +
-                        f'User Query: {query_text}\n' +
-                        f'Generated SQL Query: {sql_query}\n' +
-                        f'Query Output from database: {query_result}'
-                    )
-                    insights_response = await llm.agenerate([insights_prompt])
-                    final_data = insights_response.generations[0][0].text.strip()
-                else:
-                    chart_prompt = (
-                        prompts["system_prompts"]["chartjs_formatter"] +
-                        f'User Query: {query_text}\n' +
-                        f'Generated SQL Query: {sql_query}\n' +
-                        f'Query Output From Database: {query_result}\n' +
-                        f'Graphical Representation type: {output_type}'
-                    )
-                    chart_response = await llm.agenerate([chart_prompt])
-                    final_data = json.loads(chart_response.generations[0][0].text.strip())
+                final_data = await format_query_output(llm_runtime.llm, output_type, query_text, sql_query, query_result)
                     
 
             logger.info(f"Query executed successfully for user {user.id}")
+            metrics.observe("query.run", time.perf_counter() - started_at)
 
             # return api response
             return {
                     "generated_sql_query": sql_query,
                     "query_result": final_data,
+                    "cache": cache,
+                    **page,
+                    "preview": bool(plan_summary and plan_summary["verdict"] == "sampled"),
+                    "plan_summary": plan_summary,
             }
+        except HTTPException:
+            raise
+        except CostGuardRejected as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"message": str(e), "generated_sql_query": sql_query, "plan_summary": e.plan},
+            )
+        except StatementTimeoutError as e:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
         except Exception as e:
             logger.error(f"{user.id=} Error occurred while executing query. Reason: {e}")
             raise HTTPException(
@@ -565,10 +674,10 @@ class QueryService:
 
             # Load prompts
             prompts = load_prompts()
-            prompt = prompts["system_prompts"]["Generate_queries"] + f"\nSchema: {schema}"
+            prompt = prompts["system_prompts"]["Generate_queries"] + f"\nSchema:\n{render_schema(decode_schema(schema))}"
 
             # Generate queries using llm
-            chain = llm | JsonOutputParser()
+            chain = llm_runtime.llm | JsonOutputParser()
             response = await chain.ainvoke(prompt)
             return response
 
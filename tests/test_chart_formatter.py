@@ -0,0 +1,28 @@
+from utils.chart_formatter import format_chart
+
+
+def test_values_with_a_second_numeric_column_stay_wide():
+    rows = [
+        {"labels": "north", "values": 30, "percentage": 75.0},
+        {"labels": "south", "values": 10, "percentage": 25.0},
+    ]
+    chart = format_chart(rows, "bar chart", "Sales")
+    assert chart["labels"] == ["north", "south"]
+    assert chart["datasets"] == [
+        {"label": "values", "values": [30, 10]},
+        {"label": "percentage", "values": [75.0, 25.0]},
+    ]
+
+
+def test_series_column_is_pivoted():
+    rows = [
+        {"labels": "2024", "series": "north", "values": 3},
+        {"labels": "2024", "series": "south", "values": 1},
+        {"labels": "2025", "series": "north", "values": 4},
+    ]
+    chart = format_chart(rows, "line chart", "Sales")
+    assert chart["labels"] == ["2024", "2025"]
+    assert chart["datasets"] == [
+        {"label": "north", "values": [3, 4]},
+        {"label": "south", "values": [1, None]},
+    ]
@@ -0,0 +1,21 @@
+from utils.sql_fingerprint import analyze, canonicalize, tokenize
+
+
+def test_postgres_backslash_ends_standard_string():
+    # standard_conforming_strings is on, 'C:\' is a whole string
+    first = canonicalize(r"SELECT * FROM files WHERE dir = 'C:\' AND name = 'Bob'")
+    second = canonicalize(r"SELECT * FROM files WHERE dir = 'C:\' AND name = 'BOB'")
+    assert first != second
+    assert analyze(r"SELECT * FROM files WHERE dir = 'C:\' AND name = 'Bob'").fingerprint == (
+        analyze(r"SELECT * FROM files WHERE dir = 'C:\' AND name = 'BOB'").fingerprint
+    )
+
+
+def test_postgres_backslash_escapes_e_string():
+    tokens = tokenize(r"SELECT E'it\'s', 'a''b'")
+    assert [text for kind, text in tokens if kind == "string"] == [r"E'it\'s'", "'a''b'"]
+
+
+def test_mysql_backslash_escapes_string():
+    tokens = tokenize(r"SELECT 'it\'s' FROM t", "mysql")
+    assert [text for kind, text in tokens if kind == "string"] == [r"'it\'s'"]
@@ -0,0 +1,23 @@
+from utils.sql_guard import read_only_violation
+
+
+def test_read_only_select_passes():
+    assert read_only_violation("SELECT id, 'a;b' FROM orders WHERE note = 'it''s'") is None
+    assert read_only_violation(r"SELECT 'C:\\' AS dir FROM files", "mysql") is None
+
+
+def test_mysql_backslash_escaped_quote_doesnt_hide_a_statement():
+    assert read_only_violation(r"SELECT '\''; DELETE FROM orders; -- '", "mysql") is not None
+
+
+def test_postgres_e_string_escaped_quote_doesnt_hide_a_statement():
+    assert read_only_violation(r"SELECT E'\''; DELETE FROM orders; -- '", "postgres") is not None
+
+
+def test_postgres_backslash_escaped_quote_doesnt_hide_a_statement():
+    # one string with standard_conforming_strings on, two statements with it off
+    assert read_only_violation(r"SELECT '\''; DELETE FROM orders; -- '", "postgres") is not None
+
+
+def test_side_effect_function_is_caught():
+    assert read_only_violation("SELECT pg_sleep(10)") == "calls pg_sleep"
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from redis.asyncio import Redis
+
+from config.cache_config import settings
+from utils.logger import logger
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire after a TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl: int) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Any, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: int | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Any], bool]) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SizedTTLCache:
+    """
+    Thread-safe in-process LRU cache of bytes values, bounded by their total size
+    instead of the number of entries. Entries also expire after a TTL.
+    """
+
+    def __init__(self, max_bytes: int, ttl: int) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: OrderedDict[Any, tuple[bytes, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pop(self, key) -> None:
+        value, _ = self._entries.pop(key)
+        self.size -= len(value)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value: bytes, ttl: int | None = None) -> None:
+        if len(value) > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (value, expires_at)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache:
+    """
+    Thin async wrapper around Redis for shared cache entries.
+
+    Errors are logged and treated as cache misses, so an unavailable Redis never
+    fails a request.
+    """
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self._client: Redis | None = None
+
+    @property
+    def client(self) -> Redis:
+        if self._client is None:
+            self._client = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+        return self._client
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self.client.get(f"{self.prefix}:{key}")
+        except Exception as e:
+            logger.warning(f"Redis cache get failed for {self.prefix}: {e}")
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        try:
+            await self.client.set(f"{self.prefix}:{key}", value, ex=ttl)
+        except Exception as e:
+            logger.warning(f"Redis cache set failed for {self.prefix}: {e}")
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.client.delete(f"{self.prefix}:{key}")
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed for {self.prefix}: {e}")
+
+    async def delete_prefix(self, key_prefix: str) -> None:
+        try:
+            keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}:{key_prefix}*")]
+            if keys:
+                await self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed for {self.prefix}: {e}")
@@ -0,0 +1,110 @@
+import re
+from numbers import Number
+
+
+def chart_type(output_type: str) -> tuple[str, bool]:
+    # "stacked bar chart" -> ("bar", True), "pie chart" -> ("pie", False)
+    words = re.sub(r"[^a-z ]", " ", (output_type or "").lower()).split()
+    stacked = any(word.startswith("stack") for word in words)
+    words = [
+        word for word in words
+        if word not in {"chart", "graph", "plot", "diagram"} and not word.startswith("stack")
+    ]
+    return (words[0] if words else "bar"), stacked
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, Number):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _columns(query_result: list[dict]) -> dict[str, str]:
+    # lower case column name -> actual column name
+    return {column.lower(): column for column in query_result[0]}
+
+
+def format_chart(query_result, output_type: str, title: str) -> dict | None:
+    """
+    Build the Chart.js payload from a result that follows the graphical prompt's
+    labels/values column contract.
+
+    Supported shapes:
+        labels, values                  -> single series
+        labels, series, values          -> one dataset per distinct series (long format)
+        labels, <numeric>, <numeric>... -> one dataset per numeric column (wide format)
+
+    Returns None when the result doesn't follow the contract, so the caller can
+    fall back to the LLM formatter.
+    """
+    if not isinstance(query_result, list) or not query_result or not isinstance(query_result[0], dict):
+        return None
+
+    columns = _columns(query_result)
+    if "labels" not in columns:
+        return None
+    labels_column = columns["labels"]
+    other_columns = [column for key, column in columns.items() if key != "labels"]
+    if not other_columns:
+        return None
+
+    graph_type, stacked = chart_type(output_type)
+    chart = {
+        "graph_type": graph_type,
+        "title": title,
+        "datasetLabel": title,
+    }
+    if stacked:
+        chart["stacked"] = True
+
+    if "values" in columns and len(other_columns) == 1:
+        values_column = columns["values"]
+        values = [_number(row[values_column]) for row in query_result]
+        if any(value is None and row[values_column] is not None for value, row in zip(values, query_result)):
+            return None
+        labels = [row[labels_column] for row in query_result]
+        chart["labels"] = labels
+        chart["values"] = values
+        if graph_type == "scatter":
+            chart["points"] = [{"x": label, "y": value} for label, value in zip(labels, values)]
+        return chart
+
+    if "values" in columns and "series" in columns and len(other_columns) == 2:
+        # long format, pivot series into datasets
+        values_column, series_column = columns["values"], columns["series"]
+        labels, series, cells = [], [], {}
+        for row in query_result:
+            label, name = row[labels_column], row[series_column]
+            value = _number(row[values_column])
+            if value is None and row[values_column] is not None:
+                return None
+            if label not in cells:
+                labels.append(label)
+                cells[label] = {}
+            if name not in series:
+                series.append(name)
+            cells[label][name] = value
+        chart["labels"] = labels
+        chart["datasets"] = [
+            {"label": str(name), "values": [cells[label].get(name) for label in labels]}
+            for name in series
+        ]
+        return chart
+
+    # wide format, every other column must be numeric
+    datasets = []
+    for column in other_columns:
+        values = [_number(row[column]) for row in query_result]
+        if any(value is None and row[column] is not None for value, row in zip(values, query_result)):
+            return None
+        datasets.append({"label": column, "values": values})
+    chart["labels"] = [row[labels_column] for row in query_result]
+    chart["datasets"] = datasets
+    return chart
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import math
+
+from config.engine_config import settings as engine_settings
+from config.guard_config import settings
+from utils.cache import TTLCache
+from utils.logger import logger
+from utils.metrics import metrics
+from utils.sql_executor import execute_sql
+from utils.sql_fingerprint import analyze, table_sources, token_spans
+from utils.user_queries import limit_query, sample_query
+
+COST_GUARD_ACTIONS = ("sample", "reject")
+
+# a statement with any of these at its top level reads all its rows before returning the first
+_BLOCKING_WORDS = {
+    "group", "order", "distinct", "having", "union", "intersect", "except", "over",
+    "count", "sum", "avg", "min", "max", "group_concat", "string_agg", "array_agg", "json_agg",
+}
+
+
+class CostGuardRejected(Exception):
+    """
+    The database expects a statement to be too expensive to run, `plan` says why.
+    """
+
+    def __init__(self, plan: dict) -> None:
+        cost = f" at cost {plan['estimated_cost']}" if plan["estimated_cost"] is not None else ""
+        super().__init__(f"Query held back, the database estimates it reads {plan['estimated_rows']} rows{cost}")
+        self.plan = plan
+
+
+def cost_limits(
+    database_max_rows: int | None, database_max_cost: float | None, database_action: str | None,
+) -> tuple[int, float, str]:
+    """
+    The row and cost thresholds and the action of a database, the configured
+    defaults where it has none of its own. A threshold of 0 is no limit.
+    """
+    max_rows = settings.COST_GUARD_MAX_ROWS if database_max_rows is None else database_max_rows
+    max_cost = settings.COST_GUARD_MAX_COST if database_max_cost is None else database_max_cost
+    action = database_action if database_action in COST_GUARD_ACTIONS else settings.COST_GUARD_ACTION
+    return max_rows, max_cost, action
+
+
+def _statement(sql_query: str) -> str:
+    return sql_query.strip().rstrip(";").strip()
+
+
+def _stops_at_limit(sql_query: str, provider: str) -> bool:
+    # no sort, grouping or aggregate over the whole result, the tables are read until the limit is reached
+    depth = 0
+    for kind, text, _ in token_spans(sql_query, provider):
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif depth == 0 and kind == "word" and text.lower() in _BLOCKING_WORDS:
+            return False
+    return True
+
+
+def _postgres_plan(result: list[dict]) -> dict:
+    plan = next(iter(result[0].values()))
+    if isinstance(plan, str):
+        # asyncpg returns the json as text, psycopg2 parses it
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    full_scans, nodes = [], [root]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            full_scans.append(node.get("Relation Name"))
+        nodes.extend(node.get("Plans", []))
+    # the root already accounts for a Limit, the scans below it stop once it has its rows
+    return {"estimated_rows": root.get("Plan Rows"), "estimated_cost": root.get("Total Cost"), "full_scans": full_scans}
+
+
+def _mysql_plan(result: list[dict]) -> dict:
+    # the tables of one select are joined in nested loops, the selects add up
+    per_select: dict = {}
+    full_scans = []
+    for row in result:
+        row = {key.lower(): value for key, value in row.items()}
+        per_select[row.get("id")] = per_select.get(row.get("id"), 1) * int(row.get("rows") or 1)
+        if row.get("type") == "ALL":
+            full_scans.append(row.get("table"))
+    return {"estimated_rows": sum(per_select.values()), "estimated_cost": None, "full_scans": full_scans}
+
+
+async def _sqlite_plan(db_id: int, connection_string: str, sql_query: str, result: list[dict], timeout: float | None) -> dict:
+    # sqlite has no estimates, a full scan reads the whole table and a search a few rows of it
+    sources = table_sources(sql_query, "sqlite")
+    names = {}
+    for start, end, table, alias in sources:
+        names[(alias or table).lower()] = (table, sql_query[start:end])
+
+    sizes: dict = {}
+    per_parent: dict = {}
+    full_scans = []
+    for row in result:
+        words = row["detail"].split()
+        if len(words) < 2 or words[0] not in ("SCAN", "SEARCH") or words[1].lower() not in names:
+            continue
+        table, reference = names[words[1].lower()]
+        factor = 1
+        if words[0] == "SCAN":
+            full_scans.append(table)
+            if table not in sizes:
+                try:
+                    size = await execute_sql(db_id, connection_string, f"SELECT max(rowid) AS size FROM {reference}", timeout=timeout)
+                    sizes[table] = size[0]["size"] or 0
+                except Exception:
+                    # WITHOUT ROWID tables and views have no rowid
+                    sizes[table] = None
+            factor = sizes[table]
+        if factor is None or per_parent.get(row["parent"], 1) is None:
+            per_parent[row["parent"]] = None
+        else:
+            per_parent[row["parent"]] = per_parent.get(row["parent"], 1) * factor
+    rows = None if None in per_parent.values() else sum(per_parent.values())
+    return {"estimated_rows": rows, "estimated_cost": None, "full_scans": full_scans}
+
+
+class CostGuard:
+    """
+    EXPLAINs generated statements before they run and holds back those whose
+    estimated rows or cost exceed the thresholds of their database.
+
+    postgres gives the rows and cost of the statement as a whole, limit included,
+    mysql and mariadb the rows each table reads and
+    sqlite only which tables are scanned in full, sized from their largest rowid.
+    sqlserver statements aren't checked. Plans are kept for COST_GUARD_PLAN_TTL.
+    """
+
+    EXPLAIN = {
+        "postgres": "EXPLAIN (FORMAT JSON) {}",
+        "mysql": "EXPLAIN {}",
+        "mariadb": "EXPLAIN {}",
+        "sqlite": "EXPLAIN QUERY PLAN {}",
+    }
+
+    def __init__(self) -> None:
+        self.plans = TTLCache(max_entries=settings.COST_GUARD_PLAN_MAX_ENTRIES, ttl=settings.COST_GUARD_PLAN_TTL)
+
+    async def explain(
+        self, db_id: int, connection_string: str, sql_query: str, provider: str, timeout: float | None = None,
+    ) -> dict | None:
+        """
+        Estimated rows, cost and fully scanned tables of a statement, None when the
+        provider has no EXPLAIN we read or it failed.
+        """
+        if provider not in self.EXPLAIN:
+            return None
+        key = (db_id, hashlib.sha256(analyze(sql_query, provider).canonical.encode()).hexdigest())
+        plan = self.plans.get(key)
+        if plan is not None:
+            metrics.incr("cost_guard.plan_cache.hits")
+            return plan
+
+        timeouts = [seconds for seconds in (timeout, settings.COST_GUARD_EXPLAIN_TIMEOUT) if seconds]
+        timeout = min(timeouts) if timeouts else None
+        statement = _statement(sql_query)
+        try:
+            result = await execute_sql(db_id, connection_string, self.EXPLAIN[provider].format(statement), timeout=timeout)
+            if provider == "postgres":
+                plan = _postgres_plan(result)
+            elif provider == "sqlite":
+                plan = await _sqlite_plan(db_id, connection_string, statement, result, timeout)
+            else:
+                plan = _mysql_plan(result)
+        except Exception as e:
+            # the statement itself reports whatever is wrong with it
+            logger.warning(f"Couldn't explain query on database {db_id}, running it unchecked: {e}")
+            metrics.incr("cost_guard.explain_failed")
+            return None
+        plan = {"provider": provider, **plan}
+        self.plans.set(key, plan)
+        return plan
+
+    async def check(
+        self, db_id: int, connection_string: str, sql_query: str, provider: str, timeout: float | None = None,
+        max_rows: int | None = None, max_cost: float | None = None, action: str | None = None, paged: bool = True,
+        row_limit: int | None = None,
+    ) -> tuple[str, dict | None]:
+        """
+        The statement to run in place of `sql_query` and its plan summary, with the
+        verdict "allowed", or "sampled" when a preview on the first rows of every table
+        runs instead. Raises CostGuardRejected for statements that mustn't run at all.
+
+        A paged statement is explained the way execute_sql_page runs it, limited to
+        its first page of `row_limit` rows (ROW_LIMIT by default), streamed ones as they are.
+        """
+        if not settings.COST_GUARD_ENABLED:
+            return sql_query, None
+        row_limit = engine_settings.ROW_LIMIT if row_limit is None else row_limit
+        # execute_sql_page fetches one row past the page
+        explained = limit_query(sql_query, provider, row_limit + 1) if paged else sql_query
+        plan = await self.explain(db_id, connection_string, explained, provider, timeout)
+        if plan is None:
+            return sql_query, None
+        if paged and provider != "postgres" and plan["estimated_rows"] is not None and _stops_at_limit(sql_query, provider):
+            # only postgres accounts for the limit, the others estimate the rows of the whole tables
+            plan = {**plan, "estimated_rows": min(plan["estimated_rows"], row_limit + 1)}
+
+        max_rows, max_cost, action = cost_limits(max_rows, max_cost, action)
+        rows, cost = plan["estimated_rows"], plan["estimated_cost"]
+        # the cost is in the database's own units, only postgres has one
+        too_expensive = bool(
+            (max_rows and rows is not None and rows > max_rows)
+            or (max_cost and cost is not None and cost > max_cost)
+        )
+        if not too_expensive:
+            return sql_query, {**plan, "verdict": "allowed", "sample_rows": None}
+
+        tables = len(table_sources(sql_query, provider))
+        if action == "sample" and tables:
+            # every table joined multiplies the rows, the preview stays within max_rows
+            sample_rows = settings.COST_GUARD_SAMPLE_ROWS
+            if max_rows:
+                sample_rows = max(1, min(sample_rows, math.floor(max_rows ** (1 / tables))))
+            metrics.incr("cost_guard.sampled")
+            logger.warning(f"Query on database {db_id} estimated at {rows} rows and cost {cost}, running a preview on {sample_rows} rows per table")
+            return sample_query(sql_query, provider, sample_rows), {**plan, "verdict": "sampled", "sample_rows": sample_rows}
+
+        metrics.incr("cost_guard.rejected")
+        logger.warning(f"Query on database {db_id} rejected, estimated at {rows} rows and cost {cost}")
+        raise CostGuardRejected({**plan, "verdict": "rejected", "sample_rows": None})
+
+
+cost_guard = CostGuard()
@@ -0,0 +1,36 @@
+import asyncio
+from typing import Awaitable, TypeVar
+
+from fastapi import HTTPException, Request
+
+from utils.logger import logger
+from utils.metrics import metrics
+
+T = TypeVar("T")
+
+# nginx's status for a request the client closed before the response
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """
+    Await `awaitable`, cancelling it when the client disconnects first.
+
+    The server keeps running a request handler after its client went away, this
+    makes the statements started for that request get cancelled instead.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}, cancelling its work")
+                metrics.incr("requests.disconnected")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from config.engine_config import settings
+from utils.logger import logger
+
+
+def connection_string_hash(connection_string: str) -> str:
+    return hashlib.sha256(connection_string.encode()).hexdigest()[:16]
+
+
+def _dispose(engine: Engine | AsyncEngine) -> None:
+    if isinstance(engine, AsyncEngine):
+        try:
+            asyncio.get_running_loop().create_task(engine.dispose())
+        except RuntimeError:
+            # no running loop (shutdown), just drop the pool
+            engine.sync_engine.dispose(close=False)
+    else:
+        engine.dispose()
+
+
+class EngineRegistry:
+    """
+    Process-wide cache of pooled engines for customer databases.
+
+    Engines are keyed by (Database.id, connection string hash), so a changed
+    connection string never reuses a stale pool. Least recently used engines
+    are disposed once the registry is full or an engine has been idle for too long.
+    """
+
+    def __init__(self, max_engines: int, idle_timeout: int) -> None:
+        self.max_engines = max_engines
+        self.idle_timeout = idle_timeout
+        self._engines: OrderedDict[tuple[int, str, bool], tuple[Engine | AsyncEngine, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _engine_options(self, connection_string: str) -> dict:
+        options = {"pool_pre_ping": True, "pool_recycle": settings.POOL_RECYCLE}
+        # sqlite pools don't take size/overflow arguments
+        if not connection_string.startswith("sqlite"):
+            options.update(
+                pool_size=settings.POOL_SIZE,
+                max_overflow=settings.MAX_OVERFLOW,
+                pool_timeout=settings.POOL_TIMEOUT,
+            )
+        return options
+
+    def _evict_idle(self, now: float) -> None:
+        idle_keys = [
+            key for key, (_, last_used) in self._engines.items()
+            if now - last_used > self.idle_timeout
+        ]
+        for key in idle_keys:
+            engine, _ = self._engines.pop(key)
+            _dispose(engine)
+            logger.info(f"Disposed idle engine for database id {key[0]}")
+
+    def _get(self, db_id: int, connection_string: str, is_async: bool) -> Engine | AsyncEngine:
+        key = (db_id, connection_string_hash(connection_string), is_async)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._engines.get(key)
+            if entry:
+                self._engines[key] = (entry[0], now)
+                self._engines.move_to_end(key)
+                return entry[0]
+
+            # connection string changed for this database, drop the old pool
+            for stale_key in [k for k in self._engines if k[0] == db_id and k[2] == is_async]:
+                stale_engine, _ = self._engines.pop(stale_key)
+                _dispose(stale_engine)
+
+            factory = create_async_engine if is_async else create_engine
+            engine = factory(connection_string, **self._engine_options(connection_string))
+            self._engines[key] = (engine, now)
+            logger.info(f"Created pooled {'async ' if is_async else ''}engine for database id {db_id}")
+
+            while len(self._engines) > self.max_engines:
+                (evicted_db_id, _, _), (evicted_engine, _) = self._engines.popitem(last=False)
+                _dispose(evicted_engine)
+                logger.info(f"Evicted engine for database id {evicted_db_id}")
+
+            return engine
+
+    def get_engine(self, db_id: int, connection_string: str) -> Engine:
+        return self._get(db_id, connection_string, is_async=False)
+
+    def get_async_engine(self, db_id: int, connection_string: str) -> AsyncEngine:
+        return self._get(db_id, connection_string, is_async=True)
+
+    def invalidate(self, db_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._engines if k[0] == db_id]:
+                engine, _ = self._engines.pop(key)
+                _dispose(engine)
+                logger.info(f"Invalidated engine for database id {db_id}")
+
+    async def dispose_all(self) -> None:
+        with self._lock:
+            engines = [engine for engine, _ in self._engines.values()]
+            self._engines.clear()
+        for engine in engines:
+            if isinstance(engine, AsyncEngine):
+                await engine.dispose()
+            else:
+                engine.dispose()
+
+
+engine_registry = EngineRegistry(
+    max_engines=settings.MAX_ENGINES,
+    idle_timeout=settings.IDLE_TIMEOUT,
+)
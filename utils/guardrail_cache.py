@@ -0,0 +1,86 @@
+import hashlib
+import os
+
+from config.cache_config import settings
+from config.llm_config import settings as llm_settings
+from utils.cache import RedisCache, TTLCache
+from utils.logger import logger
+from utils.metrics import metrics
+
+GUARDRAIL_FILES = ("config.yml", "prompt.yml")
+
+
+def normalize_question(query_text: str) -> str:
+    # "  How many   Orders? " and "how many orders?" get the same verdict
+    return " ".join((query_text or "").lower().split())
+
+
+class GuardrailVerdictCache:
+    """
+    Guardrail input verdicts keyed by normalized question text and a hash of the
+    guardrail config files.
+
+    Editing config.yml or prompt.yml in the GUARDRAILS_PATH the rails are loaded from
+    changes the config hash, so verdicts given under the old config are never used again.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        path = llm_settings.guardrails_path if path is None else path
+        self.paths = [os.path.join(path, name) for name in GUARDRAIL_FILES]
+        self.memory = TTLCache(max_entries=settings.GUARDRAIL_CACHE_MAX_ENTRIES, ttl=settings.GUARDRAIL_CACHE_TTL)
+        self.redis = RedisCache(prefix="guardrail") if settings.GUARDRAIL_CACHE_USE_REDIS else None
+        self._mtimes: tuple | None = None
+        self._config_fingerprint: str | None = None
+
+    def config_fingerprint(self) -> str:
+        # files are re-hashed only when one of their mtimes changes
+        mtimes = tuple(os.stat(path).st_mtime if os.path.exists(path) else None for path in self.paths)
+        if mtimes != self._mtimes:
+            digest = hashlib.sha256()
+            for path in self.paths:
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+                digest.update(b"\x1f")
+            fingerprint = digest.hexdigest()[:16]
+            if self._config_fingerprint is not None and fingerprint != self._config_fingerprint:
+                self.memory.clear()
+                logger.info("Guardrail config changed, cleared cached verdicts")
+            self._mtimes, self._config_fingerprint = mtimes, fingerprint
+        return self._config_fingerprint
+
+    def key(self, query_text: str) -> str:
+        question = hashlib.sha256(normalize_question(query_text).encode()).hexdigest()
+        return f"{self.config_fingerprint()}:{question}"
+
+    async def get(self, query_text: str) -> bool | None:
+        if not settings.GUARDRAIL_CACHE_ENABLED:
+            return None
+        key = self.key(query_text)
+
+        allowed = self.memory.get(key)
+        if allowed is not None:
+            metrics.incr("guardrail_cache.hits.memory")
+            return allowed
+
+        if self.redis:
+            cached = await self.redis.get(key)
+            if cached is not None:
+                allowed = cached == b"1"
+                self.memory.set(key, allowed)
+                metrics.incr("guardrail_cache.hits.redis")
+                return allowed
+
+        metrics.incr("guardrail_cache.misses")
+        return None
+
+    async def set(self, query_text: str, allowed: bool) -> None:
+        if not settings.GUARDRAIL_CACHE_ENABLED:
+            return
+        key = self.key(query_text)
+        self.memory.set(key, allowed)
+        if self.redis:
+            await self.redis.set(key, b"1" if allowed else b"0", settings.GUARDRAIL_CACHE_TTL)
+
+
+guardrail_cache = GuardrailVerdictCache()
@@ -0,0 +1,316 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException
+from redis.asyncio import Redis
+
+from config.cache_config import settings as redis_settings
+from config.job_config import settings
+from utils.logger import logger
+from utils.metrics import metrics
+
+# job name -> async handler(payload) returning a json serializable result
+JOB_HANDLERS: dict[str, Callable[[dict], Awaitable[Any]]] = {}
+
+
+def job_handler(name: str):
+    def register(handler):
+        JOB_HANDLERS[name] = handler
+        return handler
+    return register
+
+
+def dedup_key(name: str, payload: dict) -> str:
+    return hashlib.sha256(f"{name}:{json.dumps(payload, sort_keys=True)}".encode()).hexdigest()
+
+
+def _lease_seconds() -> float:
+    # a running job whose worker died is picked up again after this long
+    return settings.JOB_TIMEOUT + 60
+
+
+class InMemoryJobBackend:
+    """
+    Job storage inside the current process, for tests and single process setups.
+    """
+
+    def __init__(self) -> None:
+        self.jobs: dict[str, str] = {}
+        self.queue: deque[str] = deque()
+        self.processing: set[str] = set()
+        self.delayed: dict[str, float] = {}
+        self.dedup: dict[str, tuple[str, float]] = {}
+        self._available = asyncio.Event()
+
+    async def save(self, job: dict) -> None:
+        self.jobs[job["id"]] = json.dumps(job, default=str)
+
+    async def load(self, job_id: str) -> dict | None:
+        job = self.jobs.get(job_id)
+        return json.loads(job) if job else None
+
+    async def push(self, job_id: str) -> None:
+        self.queue.appendleft(job_id)
+        self._available.set()
+
+    async def pop(self, timeout: float) -> str | None:
+        if not self.queue:
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if not self.queue:
+            return None
+        job_id = self.queue.pop()
+        self.processing.add(job_id)
+        return job_id
+
+    async def ack(self, job_id: str) -> None:
+        self.processing.discard(job_id)
+
+    async def delay(self, job_id: str, run_at: float) -> None:
+        self.processing.discard(job_id)
+        self.delayed[job_id] = run_at
+
+    async def promote_due(self) -> None:
+        now = time.time()
+        for job_id, run_at in list(self.delayed.items()):
+            if run_at <= now:
+                del self.delayed[job_id]
+                await self.push(job_id)
+
+    async def claim_dedup(self, key: str, job_id: str, ttl: float) -> str | None:
+        existing = self.dedup.get(key)
+        if existing and existing[1] > time.time():
+            return existing[0]
+        self.dedup[key] = (job_id, time.time() + ttl)
+        return None
+
+    async def release_dedup(self, key: str, job_id: str) -> None:
+        if self.dedup.get(key, (None,))[0] == job_id:
+            del self.dedup[key]
+
+    async def stale_processing(self) -> list[str]:
+        # nothing survives the process, so nothing is ever stale
+        return []
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisJobBackend:
+    """
+    Job storage in Redis, shared by the api and any number of worker processes.
+
+    Popped jobs are moved atomically to a processing list, so a job whose worker
+    dies is found there and queued again once its lease runs out.
+    """
+
+    QUEUE = "jobs:queue"
+    PROCESSING = "jobs:processing"
+    DELAYED = "jobs:delayed"
+
+    def __init__(self) -> None:
+        self.client = Redis(host=redis_settings.REDIS_HOST, port=redis_settings.REDIS_PORT)
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"jobs:job:{job_id}"
+
+    async def save(self, job: dict) -> None:
+        await self.client.set(self._job_key(job["id"]), json.dumps(job, default=str), ex=settings.JOB_RESULT_TTL)
+
+    async def load(self, job_id: str) -> dict | None:
+        job = await self.client.get(self._job_key(job_id))
+        return json.loads(job) if job else None
+
+    async def push(self, job_id: str) -> None:
+        await self.client.lpush(self.QUEUE, job_id)
+
+    async def pop(self, timeout: float) -> str | None:
+        job_id = await self.client.blmove(self.QUEUE, self.PROCESSING, timeout, "RIGHT", "LEFT")
+        return job_id.decode() if job_id else None
+
+    async def ack(self, job_id: str) -> None:
+        await self.client.lrem(self.PROCESSING, 0, job_id)
+
+    async def delay(self, job_id: str, run_at: float) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.DELAYED, {job_id: run_at})
+            pipe.lrem(self.PROCESSING, 0, job_id)
+            await pipe.execute()
+
+    async def promote_due(self) -> None:
+        for job_id in await self.client.zrangebyscore(self.DELAYED, 0, time.time()):
+            # zrem decides which worker promotes the job
+            if await self.client.zrem(self.DELAYED, job_id):
+                await self.client.lpush(self.QUEUE, job_id)
+
+    async def claim_dedup(self, key: str, job_id: str, ttl: float) -> str | None:
+        if await self.client.set(f"jobs:dedup:{key}", job_id, nx=True, ex=int(ttl)):
+            return None
+        existing = await self.client.get(f"jobs:dedup:{key}")
+        return existing.decode() if existing else None
+
+    async def release_dedup(self, key: str, job_id: str) -> None:
+        existing = await self.client.get(f"jobs:dedup:{key}")
+        if existing and existing.decode() == job_id:
+            await self.client.delete(f"jobs:dedup:{key}")
+
+    async def stale_processing(self) -> list[str]:
+        stale = []
+        for job_id in await self.client.lrange(self.PROCESSING, 0, -1):
+            job_id = job_id.decode()
+            job = await self.load(job_id)
+            # a job that was popped but hasn't started yet has no lease of its own
+            lease_until = (
+                job.get("lease_until") if job and job["status"] == "running"
+                else (job["updated_at"] + _lease_seconds() if job else 0)
+            )
+            if lease_until < time.time():
+                if await self.client.lrem(self.PROCESSING, 0, job_id):
+                    stale.append(job_id)
+        return stale
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class JobQueue:
+    """
+    Submits jobs, reports their status and runs them in workers.
+
+    Identical jobs (same name and payload) are deduplicated while one is queued
+    or running. Failed attempts are retried with exponential backoff, errors the
+    caller made (4xx HTTPExceptions) are not.
+    """
+
+    def __init__(self, backend) -> None:
+        self.backend = backend
+        self._stopping = asyncio.Event()
+
+    async def submit(self, name: str, payload: dict, user_id: int | None = None) -> dict:
+        if name not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job {name}")
+        key = dedup_key(name, payload)
+        job_id = uuid.uuid4().hex
+
+        existing_id = await self.backend.claim_dedup(key, job_id, _lease_seconds() * settings.JOB_MAX_ATTEMPTS)
+        if existing_id:
+            existing = await self.backend.load(existing_id)
+            if existing and existing["status"] in ("queued", "running", "retrying"):
+                metrics.incr("jobs.deduplicated")
+                return existing
+            await self.backend.release_dedup(key, existing_id)
+            return await self.submit(name, payload, user_id)
+
+        now = time.time()
+        job = {
+            "id": job_id,
+            "name": name,
+            "payload": payload,
+            "user_id": user_id,
+            "dedup_key": key,
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.backend.save(job)
+        await self.backend.push(job_id)
+        metrics.incr(f"jobs.submitted.{name}")
+        logger.info(f"Queued job {job_id} ({name})")
+        return job
+
+    async def get(self, job_id: str) -> dict | None:
+        return await self.backend.load(job_id)
+
+    async def _finish(self, job: dict, status: str, result=None, error: str | None = None) -> None:
+        job.update(status=status, result=result, error=error, updated_at=time.time())
+        await self.backend.save(job)
+        await self.backend.ack(job["id"])
+        await self.backend.release_dedup(job["dedup_key"], job["id"])
+        metrics.incr(f"jobs.{status}.{job['name']}")
+
+    async def run_one(self, job_id: str) -> None:
+        job = await self.backend.load(job_id)
+        if job is None:
+            await self.backend.ack(job_id)
+            return
+
+        job["attempts"] += 1
+        job.update(status="running", updated_at=time.time(), lease_until=time.time() + _lease_seconds())
+        await self.backend.save(job)
+        started_at = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(JOB_HANDLERS[job["name"]](job["payload"]), settings.JOB_TIMEOUT)
+        except Exception as e:
+            retryable = not (isinstance(e, HTTPException) and e.status_code < 500)
+            error = str(e.detail if isinstance(e, HTTPException) else e) or type(e).__name__
+            if retryable and job["attempts"] < settings.JOB_MAX_ATTEMPTS:
+                backoff = min(settings.JOB_RETRY_BACKOFF * 2 ** (job["attempts"] - 1), settings.JOB_RETRY_BACKOFF_MAX)
+                job.update(status="retrying", error=error, updated_at=time.time())
+                await self.backend.save(job)
+                await self.backend.delay(job_id, time.time() + backoff)
+                logger.warning(f"Job {job_id} ({job['name']}) failed, retrying in {backoff}s. Reason: {error}")
+                metrics.incr(f"jobs.retried.{job['name']}")
+            else:
+                logger.error(f"Job {job_id} ({job['name']}) failed after {job['attempts']} attempts. Reason: {error}")
+                await self._finish(job, "failed", error=error)
+        else:
+            await self._finish(job, "succeeded", result=result)
+            logger.info(f"Job {job_id} ({job['name']}) succeeded")
+        finally:
+            metrics.observe(f"jobs.run.{job['name']}", time.perf_counter() - started_at)
+
+    async def _maintenance(self) -> None:
+        await self.backend.promote_due()
+        for job_id in await self.backend.stale_processing():
+            logger.warning(f"Job {job_id} lost its worker, queueing it again")
+            await self.backend.push(job_id)
+
+    async def work(self, concurrency: int) -> None:
+        """
+        Run jobs until stop() is called, at most `concurrency` at a time.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        running: set[asyncio.Task] = set()
+        logger.info(f"Job worker started with concurrency {concurrency}")
+        while not self._stopping.is_set():
+            await self._maintenance()
+            await semaphore.acquire()
+            try:
+                job_id = await self.backend.pop(timeout=1)
+            except Exception as e:
+                semaphore.release()
+                logger.error(f"Couldn't fetch jobs. Reason: {e}")
+                await asyncio.sleep(1)
+                continue
+            if job_id is None:
+                semaphore.release()
+                continue
+            task = asyncio.create_task(self.run_one(job_id))
+            running.add(task)
+            task.add_done_callback(lambda task: (running.discard(task), semaphore.release()))
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        logger.info("Job worker stopped")
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+
+def create_job_queue() -> JobQueue:
+    backend = InMemoryJobBackend() if settings.JOBS_BACKEND == "memory" else RedisJobBackend()
+    return JobQueue(backend)
+
+
+job_queue = create_job_queue()
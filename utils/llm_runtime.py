@@ -0,0 +1,80 @@
+import asyncio
+import os
+import threading
+
+import httpx
+
+from config.llm_config import settings
+from utils.logger import logger
+
+
+class LLMRuntime:
+    """
+    Chat model and guardrails shared by every service, built on first use.
+
+    langchain_openai and nemoguardrails are imported lazily, so importing the app
+    doesn't pay for them. All llm calls, the guardrail's included, go through one
+    keep-alive HTTP pool.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._http_client: httpx.Client | None = None
+        self._http_async_client: httpx.AsyncClient | None = None
+        self._llm = None
+        self._guard_rail = None
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    from langchain_openai import ChatOpenAI
+
+                    self._http_client = httpx.Client(limits=self._limits())
+                    self._http_async_client = httpx.AsyncClient(limits=self._limits())
+                    self._llm = ChatOpenAI(
+                        model=settings.model,
+                        temperature=0,
+                        api_key=settings.api_key,
+                        http_client=self._http_client,
+                        http_async_client=self._http_async_client,
+                    )
+                    logger.info(f"Created chat model client for {settings.model}")
+        return self._llm
+
+    @property
+    def guard_rail(self):
+        if self._guard_rail is None:
+            llm = self.llm
+            with self._lock:
+                if self._guard_rail is None:
+                    from nemoguardrails import RailsConfig
+                    from nemoguardrails.integrations.langchain.runnable_rails import RunnableRails
+
+                    # the rails config may still build its own openai model
+                    os.environ.setdefault("OPENAI_API_KEY", settings.api_key or "")
+                    config = RailsConfig.from_path(settings.guardrails_path)
+                    self._guard_rail = RunnableRails(config=config, llm=llm)
+                    logger.info(f"Loaded guardrails from {settings.guardrails_path}")
+        return self._guard_rail
+
+    async def warm_up(self) -> None:
+        # construction is blocking, keep it off the event loop
+        await asyncio.to_thread(lambda: self.guard_rail)
+
+    async def aclose(self) -> None:
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+        if self._http_client is not None:
+            self._http_client.close()
+
+
+llm_runtime = LLMRuntime()
@@ -0,0 +1,56 @@
+import threading
+from collections import defaultdict, deque
+
+
+class Metrics:
+    """
+    In-process counters, gauges and timers.
+
+    Timers keep a bounded window of recent samples so p50/p95 can be reported
+    without an external metrics backend.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = defaultdict(int)
+        self._gauges: dict[str, float] = defaultdict(float)
+        self._timers: dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name: str, delta: float) -> None:
+        with self._lock:
+            self._gauges[name] += delta
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._timers[name].append(seconds)
+
+    @staticmethod
+    def _percentile(samples: list[float], percentile: float) -> float:
+        index = min(len(samples) - 1, int(round(percentile * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timers = {}
+            for name, samples in self._timers.items():
+                ordered = sorted(samples)
+                if not ordered:
+                    continue
+                timers[name] = {
+                    "count": len(ordered),
+                    "p50_ms": round(self._percentile(ordered, 0.50) * 1000, 2),
+                    "p95_ms": round(self._percentile(ordered, 0.95) * 1000, 2),
+                    "max_ms": round(ordered[-1] * 1000, 2),
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timers": timers,
+            }
+
+
+metrics = Metrics()
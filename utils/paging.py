@@ -0,0 +1,51 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from fastapi import HTTPException, status
+
+from utils.sql_fingerprint import analyze
+
+
+def _statement_key(sql_query: str, provider: str) -> str:
+    return hashlib.sha256(analyze(sql_query, provider).canonical.encode()).hexdigest()[:16]
+
+
+def page_token(sql_query: str, provider: str, offset: int) -> str:
+    """
+    Opaque cursor to the rows of a statement starting at `offset`.
+    """
+    token = json.dumps({"statement": _statement_key(sql_query, provider), "offset": offset})
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+
+
+def page_offset(token: str, sql_query: str, provider: str) -> int:
+    """
+    The offset a page_token points to, a 400 when it is malformed or was issued for another statement.
+    """
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        statement, offset = decoded["statement"], int(decoded["offset"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid page_token")
+    if statement != _statement_key(sql_query, provider) or offset < 0:
+        # the sql was generated again since, its rows may not line up with the earlier pages
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="page_token doesn't belong to this query anymore, start again from the first page",
+        )
+    return offset
+
+
+def truncate(result: list | dict, row_limit: int) -> tuple[list | dict, bool]:
+    """
+    The first `row_limit` rows of a records or columnar result, and whether there were more.
+    """
+    if isinstance(result, dict):
+        if len(result["data"]) <= row_limit:
+            return result, False
+        return {**result, "data": result["data"][:row_limit]}, True
+    if len(result) <= row_limit:
+        return result, False
+    return result[:row_limit], True
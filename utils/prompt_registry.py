@@ -0,0 +1,83 @@
+import os
+import threading
+from typing import Callable, Hashable
+
+import yaml
+
+from config.prompt_config import settings
+from utils.cache import TTLCache
+from utils.logger import logger
+from utils.metrics import metrics
+
+REQUIRED_PROMPTS = (
+    "primary",
+    "graphical",
+    "descriptive_prompt",
+    "chartjs_formatter",
+    "Insights",
+    "Generate_queries",
+)
+
+
+class PromptRegistry:
+    """
+    Prompts loaded once from the prompts YAML file and reloaded only when its mtime changes.
+
+    Also caches fully rendered system prompts, which are dropped whenever the
+    file is reloaded.
+    """
+
+    def __init__(self, path: str, rendered_cache_size: int) -> None:
+        self.path = path
+        self._prompts: dict | None = None
+        self._mtime: float | None = None
+        self._lock = threading.Lock()
+        # rendered prompts don't expire on their own, only on reload or eviction
+        self._rendered = TTLCache(max_entries=rendered_cache_size, ttl=float("inf"))
+
+    def _read(self) -> dict:
+        with open(self.path, "r") as f:
+            prompts = yaml.safe_load(f)
+        system_prompts = (prompts or {}).get("system_prompts") or {}
+        missing = [name for name in REQUIRED_PROMPTS if not system_prompts.get(name)]
+        if missing:
+            raise ValueError(f"Prompts file {self.path} is missing system prompts: {', '.join(missing)}")
+        return prompts
+
+    def load(self) -> dict:
+        mtime = os.stat(self.path).st_mtime
+        if self._prompts is not None and mtime == self._mtime:
+            return self._prompts
+        with self._lock:
+            if self._prompts is None or mtime != self._mtime:
+                try:
+                    prompts = self._read()
+                except Exception as e:
+                    if self._prompts is None:
+                        raise
+                    # keep serving the last good prompts while the file is being edited
+                    logger.error(f"Couldn't reload prompts from {self.path}, keeping the loaded ones. Reason: {e}")
+                    return self._prompts
+                reloaded = self._prompts is not None
+                self._prompts, self._mtime = prompts, mtime
+                self._rendered.clear()
+                logger.info(f"{'Reloaded' if reloaded else 'Loaded'} prompts from {self.path}")
+        return self._prompts
+
+    def get(self, name: str) -> str:
+        return self.load()["system_prompts"][name]
+
+    def rendered(self, key: Hashable, render: Callable[[dict], str]) -> str:
+        # render(prompts) runs only on a cache miss
+        prompts = self.load()
+        prompt = self._rendered.get(key)
+        if prompt is None:
+            metrics.incr("prompt_registry.rendered.misses")
+            prompt = render(prompts)
+            self._rendered.set(key, prompt)
+        else:
+            metrics.incr("prompt_registry.rendered.hits")
+        return prompt
+
+
+prompt_registry = PromptRegistry(settings.prompt_path, settings.rendered_prompt_cache_size)
@@ -0,0 +1,41 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from utils.logger import logger
+from utils.metrics import metrics
+
+# a tile returns its own status, eg. "ok" or "blocked"
+Tile = Callable[[], Awaitable[str]]
+
+
+async def run_tiles(tiles: dict[int, Tile], concurrency: int, timeout: float) -> list[dict]:
+    """
+    Run dashboard tiles with at most `concurrency` at a time, each within `timeout` seconds.
+
+    A failing or timed out tile doesn't affect the others, every tile gets its
+    own status and duration in the result.
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run_tile(query_id: int, tile: Tile) -> dict:
+        async with semaphore:
+            started_at = time.perf_counter()
+            result = {"query_id": query_id}
+            try:
+                result["status"] = await asyncio.wait_for(tile(), timeout)
+            except asyncio.TimeoutError as e:
+                # the tile's own timeout cancels its statement, a statement timeout ends just the statement
+                logger.error(f"Tile for query {query_id} timed out. Reason: {e or f'no result after {timeout}s'}")
+                result["status"] = "timeout"
+            except Exception as e:
+                logger.error(f"Tile for query {query_id} failed. Reason: {e}")
+                result["status"] = "failed"
+                result["error"] = str(e)
+            duration = time.perf_counter() - started_at
+            result["duration_ms"] = round(duration * 1000, 2)
+            metrics.observe("dashboard.tile", duration)
+            metrics.incr(f"dashboard.tile.{result['status']}")
+            return result
+
+    return await asyncio.gather(*(run_tile(query_id, tile) for query_id, tile in tiles.items()))
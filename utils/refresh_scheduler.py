@@ -0,0 +1,71 @@
+import asyncio
+import math
+import uuid
+from typing import Awaitable, Callable
+
+from config.dashboard_config import settings
+from utils.jobs import job_queue
+from utils.logger import logger
+from utils.metrics import metrics
+
+SCHEDULER_LOCK = "dashboard.scheduler"
+
+
+def refresh_priority(age: float | None, interval: float, since_view: float | None) -> float:
+    """
+    Priority of a scheduled tile, 0 while it is still fresh.
+
+    A tile overdue by twice its interval ranks like two tiles overdue by one, and
+    a dashboard viewed just now doubles the priority of its tiles. The boost halves
+    every SCHEDULER_VIEW_HALF_LIFE seconds, never viewed dashboards get none.
+    """
+    # a tile that was never refreshed is as stale as it gets
+    overdue = math.inf if age is None else age / interval
+    if overdue < 1:
+        return 0.0
+    view_boost = 0.0 if since_view is None else 0.5 ** (max(since_view, 0) / settings.SCHEDULER_VIEW_HALF_LIFE)
+    return overdue * (1 + view_boost)
+
+
+class RefreshScheduler:
+    """
+    Calls `refresh` every SCHEDULER_TICK seconds until stop() is called.
+
+    Every worker.py process runs one, a lock in the job backend makes sure only one
+    of them refreshes at a time, so SCHEDULER_CONCURRENCY is a global budget. The
+    memory backend's lock doesn't leave the process, a single worker.py may run then.
+    """
+
+    def __init__(self, refresh: Callable[[], Awaitable[dict]]) -> None:
+        self.refresh = refresh
+        self._stopping = asyncio.Event()
+        self._owner = uuid.uuid4().hex
+
+    async def tick(self) -> dict | None:
+        # held for the longest a tick can take: every batch of tiles hitting the timeout
+        batches = math.ceil(settings.SCHEDULER_MAX_TILES / max(settings.SCHEDULER_CONCURRENCY, 1))
+        lock_ttl = settings.SCHEDULER_TICK + batches * settings.REFRESH_TILE_TIMEOUT
+        if await job_queue.backend.claim_dedup(SCHEDULER_LOCK, self._owner, lock_ttl):
+            return None
+        try:
+            report = await self.refresh()
+            metrics.incr("dashboard.scheduler.ticks")
+            return report
+        finally:
+            await job_queue.backend.release_dedup(SCHEDULER_LOCK, self._owner)
+
+    async def run(self) -> None:
+        logger.info(f"Dashboard refresh scheduler started, ticking every {settings.SCHEDULER_TICK}s")
+        while not self._stopping.is_set():
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Scheduled dashboard refresh failed. Reason: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), settings.SCHEDULER_TICK)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Dashboard refresh scheduler stopped")
+
+    def stop(self) -> None:
+        self._stopping.set()
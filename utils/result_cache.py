@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.sql.elements import ColumnElement
+
+from config.cache_config import settings
+from config.job_config import settings as job_settings
+from utils.cache import RedisCache, SizedTTLCache
+from utils.logger import logger
+from utils.metrics import metrics
+from utils.sql_fingerprint import analyze
+
+# bumping this version of a database drops all its entries at once
+ALL_TABLES = "*"
+
+
+def computed_at(cache: dict) -> ColumnElement:
+    # when a result with this cache status was fetched from the customer database. Taken on the
+    # app database's clock, the other timestamps are stored naive in its session time zone by now()
+    return func.localtimestamp() - timedelta(seconds=cache["age_seconds"])
+
+
+class ResultCache:
+    """
+    Results of executed SQL, keyed by (database id, statement, row limit, result format).
+
+    Every table of a database has a version that is part of the keys of the
+    statements reading it, invalidating a table bumps its version so those entries
+    are never hit again and age out of the LRU. Entries are zlib compressed JSON,
+    kept in process memory up to RESULT_CACHE_MAX_BYTES and, when enabled, in Redis.
+
+    Without Redis the versions only live in the process that bumped them, the other
+    api workers and worker.py serve their stale entries until the TTL ends.
+    Invalidation across processes needs RESULT_CACHE_USE_REDIS.
+    """
+
+    def __init__(self) -> None:
+        self.memory = SizedTTLCache(max_bytes=settings.RESULT_CACHE_MAX_BYTES, ttl=settings.RESULT_CACHE_TTL)
+        self.redis = RedisCache(prefix="results") if settings.RESULT_CACHE_USE_REDIS else None
+        self._versions: dict[str, int] = {}
+
+    def warn_if_unshared(self) -> None:
+        # other processes serving results are api workers next to this one and worker.py for background jobs
+        workers = int(os.environ.get("WEB_CONCURRENCY") or 1)
+        if settings.RESULT_CACHE_ENABLED and not self.redis and (workers > 1 or job_settings.JOBS_BACKEND == "redis"):
+            logger.warning(
+                "Result cache runs without Redis while several processes serve results, invalidations only "
+                "reach the process that received them. Set RESULT_CACHE_USE_REDIS=True to share them"
+            )
+
+    @staticmethod
+    def _version_key(db_id: int, table: str) -> str:
+        return f"version:{db_id}:{table}"
+
+    async def _table_versions(self, db_id: int, tables: list[str]) -> list[int]:
+        keys = [self._version_key(db_id, table) for table in tables]
+        if self.redis:
+            try:
+                versions = await self.redis.client.mget([f"{self.redis.prefix}:{key}" for key in keys])
+                return [int(version or 0) for version in versions]
+            except Exception as e:
+                logger.warning(f"Redis result cache versions failed: {e}")
+        return [self._versions.get(key, 0) for key in keys]
+
+    async def key(
+        self, db_id: int, sql_query: str, provider: str, row_limit: int | None = None, result_format: str = "records",
+    ) -> str:
+        # statements differing only in whitespace, comments or case share their entry
+        signature = analyze(sql_query, provider)
+        tables = [ALL_TABLES, *sorted(table.lower() for table in signature.tables)]
+        versions = await self._table_versions(db_id, tables)
+        statement = hashlib.sha256(signature.canonical.encode()).hexdigest()
+        generation = hashlib.sha256(repr(list(zip(tables, versions))).encode()).hexdigest()[:16]
+        return f"{db_id}:{statement}:{row_limit}:{result_format}:{generation}"
+
+    async def get(self, key: str) -> tuple[list | dict, float] | None:
+        """
+        The cached result and its age in seconds, None on a miss.
+        """
+        if not settings.RESULT_CACHE_ENABLED:
+            return None
+
+        entry = self.memory.get(key)
+        if entry is not None:
+            metrics.incr("result_cache.hits.memory")
+        elif self.redis:
+            entry = await self.redis.get(key)
+            if entry is not None:
+                metrics.incr("result_cache.hits.redis")
+
+        if entry is None:
+            metrics.incr("result_cache.misses")
+            return None
+        cached = json.loads(zlib.decompress(entry))
+        return cached["result"], max(time.time() - cached["stored_at"], 0.0)
+
+    async def set(self, key: str, result: list | dict, ttl: int | None = None) -> None:
+        ttl = settings.RESULT_CACHE_TTL if ttl is None else ttl
+        if not settings.RESULT_CACHE_ENABLED or ttl <= 0:
+            return
+        entry = zlib.compress(json.dumps({"stored_at": time.time(), "result": result}, default=str).encode())
+        if len(entry) > settings.RESULT_CACHE_MAX_ENTRY_BYTES:
+            metrics.incr("result_cache.too_large")
+            return
+        self.memory.set(key, entry, ttl)
+        if self.redis:
+            await self.redis.set(key, entry, ttl)
+
+    async def invalidate(self, db_id: int, tables: list[str] | None = None) -> None:
+        """
+        Drop the cached results reading any of `tables`, or all results of the database.
+        """
+        tables = [table.split(".")[-1].strip('"`[]').lower() for table in tables] if tables else [ALL_TABLES]
+        for table in tables:
+            key = self._version_key(db_id, table)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            if self.redis:
+                try:
+                    await self.redis.client.incr(f"{self.redis.prefix}:{key}")
+                except Exception as e:
+                    logger.warning(f"Redis result cache invalidation failed: {e}")
+        metrics.incr("result_cache.invalidations")
+        logger.info(f"Invalidated cached results of database {db_id} for tables {', '.join(tables)}")
+
+
+result_cache = ResultCache()
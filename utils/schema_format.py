@@ -0,0 +1,85 @@
+import ast
+import json
+
+SCHEMA_FORMAT_VERSION = 1
+
+
+def _compact_column(column: dict) -> dict:
+    # keep what the llm needs to write sql, drop reflection noise (autoincrement, comment, default...)
+    compact = {
+        'name': column['name'],
+        'type': str(column['type']),
+        'nullable': bool(column.get('nullable', True)),
+    }
+    if column.get('primary_key'):
+        compact['primary_key'] = True
+    if column.get('foreign_keys'):
+        compact['foreign_keys'] = [
+            {'referred_table': fk['referred_table'], 'referred_column': fk['referred_column']}
+            for fk in column['foreign_keys']
+        ]
+    return compact
+
+
+def compact_schema(scheme: dict) -> dict:
+    return {
+        'version': SCHEMA_FORMAT_VERSION,
+        'tables': {
+            table_name: [_compact_column(column) for column in columns]
+            for table_name, columns in scheme.items()
+        },
+    }
+
+
+def encode_schema(scheme: dict) -> str:
+    """
+    Serialize an introspected schema to the versioned JSON stored in Database.schema.
+    """
+    return json.dumps(compact_schema(scheme), separators=(',', ':'))
+
+
+def decode_schema(schema: str) -> dict:
+    """
+    Parse Database.schema back into {'version': ..., 'tables': {table: [column, ...]}}.
+
+    Schemas stored before the JSON format (str() of the introspected dict) are
+    converted on the way.
+    """
+    try:
+        decoded = json.loads(schema)
+    except (TypeError, ValueError):
+        decoded = None
+    if isinstance(decoded, dict) and 'version' in decoded:
+        if decoded['version'] != SCHEMA_FORMAT_VERSION:
+            raise ValueError(f"Unsupported schema format version {decoded['version']}")
+        return decoded
+
+    legacy = ast.literal_eval(schema)
+    if not isinstance(legacy, dict):
+        raise ValueError("Schema is neither versioned JSON nor a legacy schema dict")
+    return compact_schema(legacy)
+
+
+def render_table(table_name: str, columns: list[dict]) -> str:
+    # orders(id INTEGER PK, customer_id INTEGER→customers.id, total NUMERIC)
+    rendered = []
+    for column in columns:
+        text = f"{column['name']} {column['type']}"
+        if column.get('primary_key'):
+            text += " PK"
+        for fk in column.get('foreign_keys', []):
+            text += f"→{fk['referred_table']}.{fk['referred_column']}"
+        rendered.append(text)
+    return f"{table_name}({', '.join(rendered)})"
+
+
+def render_schema(schema: dict, tables: set | None = None) -> str:
+    """
+    Compact DDL-like text of a decoded schema, one table per line.
+    Only the given tables when `tables` is set, in schema order.
+    """
+    return "\n".join(
+        render_table(table_name, columns)
+        for table_name, columns in schema['tables'].items()
+        if tables is None or table_name in tables
+    )
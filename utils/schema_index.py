@@ -0,0 +1,186 @@
+import json
+import math
+import re
+from collections import Counter, deque
+from functools import lru_cache
+
+from config.schema_config import settings
+from utils.logger import logger
+from utils.schema_format import decode_schema, render_schema, render_table
+
+INDEX_VERSION = 2
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# a table name says more about a table than any of its columns
+TABLE_NAME_WEIGHT = 3
+# longest FK path added to join a table to the ones already picked
+MAX_JOIN_HOPS = 3
+
+
+def _words(text: str) -> list[str]:
+    # "orderItems", "order_items", "ORDER ITEMS" -> ["order", "item"]
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(text))
+    words = []
+    for word in re.split(r"[^A-Za-z0-9]+", text.lower()):
+        if not word:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token, close enough for budgeting without a tokenizer
+    return len(text) // 4 + 1
+
+
+def _neighbours(tables: dict) -> dict[str, set]:
+    neighbours = {table_name: set() for table_name in tables}
+    for table_name, columns in tables.items():
+        for column in columns:
+            for fk in column.get('foreign_keys') or []:
+                referred_table = fk.get('referred_table')
+                if referred_table in neighbours and referred_table != table_name:
+                    neighbours[table_name].add(referred_table)
+                    neighbours[referred_table].add(table_name)
+    return neighbours
+
+
+def build_schema_index(schema: dict) -> dict:
+    """
+    BM25 index over table names, column names and FK neighbourhoods of a decoded schema.
+
+    The index is plain JSON so it can be stored next to the Database it was built from.
+    """
+    neighbours = _neighbours(schema['tables'])
+    tables, df = {}, Counter()
+    for table_name, columns in schema['tables'].items():
+        terms = Counter()
+        for word in _words(table_name):
+            terms[word] += TABLE_NAME_WEIGHT
+        for column in columns:
+            terms.update(_words(column['name']))
+        for neighbour in neighbours[table_name]:
+            terms.update(_words(neighbour))
+        df.update(terms.keys())
+        tables[table_name] = {
+            'terms': dict(terms),
+            'length': sum(terms.values()),
+            'tokens': estimate_tokens(render_table(table_name, columns)),
+        }
+
+    return {
+        'version': INDEX_VERSION,
+        'tables': tables,
+        'df': dict(df),
+        'avgdl': sum(table['length'] for table in tables.values()) / max(len(tables), 1),
+        'neighbours': {table_name: sorted(names) for table_name, names in neighbours.items()},
+        'total_tokens': estimate_tokens(render_schema(schema)),
+    }
+
+
+def _scores(index: dict, query_text: str) -> dict[str, float]:
+    tables, df, avgdl = index['tables'], index['df'], index['avgdl'] or 1
+    count = len(tables)
+    scores = {}
+    for table_name, table in tables.items():
+        terms, length = table['terms'], table['length']
+        score = 0.0
+        for word in set(_words(query_text)):
+            tf = terms.get(word)
+            if not tf:
+                continue
+            idf = math.log(1 + (count - df[word] + 0.5) / (df[word] + 0.5))
+            score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avgdl))
+        if score > 0:
+            scores[table_name] = score
+    return scores
+
+
+def _join_path(neighbours: dict, start: str, targets: set) -> list[str]:
+    # shortest FK path from start to any of the targets, endpoints excluded
+    if not targets:
+        return []
+    previous = {start: None}
+    queue = deque([(start, 0)])
+    while queue:
+        table_name, hops = queue.popleft()
+        if table_name in targets:
+            path = []
+            table_name = previous[table_name]
+            while table_name != start:
+                path.append(table_name)
+                table_name = previous[table_name]
+            return path
+        if hops == MAX_JOIN_HOPS:
+            continue
+        for neighbour in neighbours.get(table_name, []):
+            if neighbour not in previous:
+                previous[neighbour] = table_name
+                queue.append((neighbour, hops + 1))
+    return []
+
+
+def select_tables(index: dict, query_text: str, top_k: int, token_budget: int) -> list[str]:
+    """
+    Pick the top_k tables most relevant to the question, plus the tables on the FK
+    paths that join them, without going over the token budget.
+    """
+    tables, neighbours = index['tables'], index['neighbours']
+    scores = _scores(index, query_text)
+    if scores:
+        ranked = sorted(scores, key=lambda table_name: -scores[table_name])
+    else:
+        # nothing matched, the most connected tables are the best guess
+        ranked = sorted(tables, key=lambda table_name: -len(neighbours.get(table_name, [])))
+
+    selected, tokens = [], 0
+    for table_name in ranked[:top_k]:
+        if table_name in selected:
+            continue
+        candidates = [table_name] + [
+            path_table for path_table in _join_path(neighbours, table_name, set(selected))
+            if path_table not in selected
+        ]
+        candidate_tokens = sum(tables[candidate]['tokens'] for candidate in candidates)
+        if tokens + candidate_tokens > token_budget:
+            continue
+        selected.extend(candidates)
+        tokens += candidate_tokens
+    return selected
+
+
+@lru_cache(maxsize=64)
+def _index_for(schema: str) -> dict:
+    # databases connected before the current index format
+    return build_schema_index(decode_schema(schema))
+
+
+def tables_for_prompt(schema: str, schema_index: str | None, query_text: str | None) -> frozenset | None:
+    """
+    Tables of the schema to embed in a prompt for query_text, None for all of them
+    (pruning disabled, or the whole schema fits the token budget).
+    """
+    if not settings.SCHEMA_PRUNING_ENABLED or not query_text:
+        return None
+
+    index = json.loads(schema_index) if schema_index else None
+    if index is None or index.get('version') != INDEX_VERSION:
+        index = _index_for(schema)
+    if index['total_tokens'] <= settings.SCHEMA_TOKEN_BUDGET:
+        return None
+
+    selected = select_tables(index, query_text, settings.SCHEMA_TOP_K_TABLES, settings.SCHEMA_TOKEN_BUDGET)
+    if not selected:
+        return None
+    logger.info(f'Pruned schema to {len(selected)} of {len(index["tables"])} tables for the prompt')
+    return frozenset(selected)
+
+
+def schema_for_prompt(schema: str, tables: frozenset | None = None) -> str:
+    # compact schema text, keeping the schema's own table order so the same tables always render the same
+    return render_schema(decode_schema(schema), tables)
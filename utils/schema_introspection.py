@@ -0,0 +1,103 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# every column of every table in one statement, via table-valued pragmas (sqlite >= 3.16)
+SQLITE_COLUMNS = text("""
+    SELECT m.name, p.name, p.type, p."notnull", p.dflt_value, p.pk
+    FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite~_%' ESCAPE '~'
+    ORDER BY m.name, p.cid
+""")
+
+SQLITE_FOREIGN_KEYS = text("""
+    SELECT m.name, f."from", f."table", f."to"
+    FROM sqlite_master AS m JOIN pragma_foreign_key_list(m.name) AS f
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite~_%' ESCAPE '~'
+    ORDER BY m.name, f.id, f.seq
+""")
+
+
+def _add_foreign_key(fk_info: dict, table_name: str, constrained: str, referred_table: str, referred: str) -> None:
+    fk_info.setdefault(table_name, {}).setdefault(constrained, []).append({
+        'referred_table': referred_table,
+        'referred_column': referred
+    })
+
+
+def _build_scheme(columns_by_table: dict, pks_by_table: dict, fks_by_table: dict) -> dict:
+    scheme = {}
+    for table_name, columns in columns_by_table.items():
+        pk_columns = pks_by_table.get(table_name, set())
+        fk_info = fks_by_table.get(table_name, {})
+        for column in columns:
+            # Convert SQLAlchemy type to string representation
+            column['type'] = str(column['type'])
+            if column['name'] in fk_info:
+                column['foreign_keys'] = fk_info[column['name']]
+            column['primary_key'] = column['name'] in pk_columns
+            # Clean up any database-specific attributes
+            column.pop('dialect_options', None)
+        scheme[table_name] = columns
+    return scheme
+
+
+def _introspect_sqlite(engine: Engine) -> dict:
+    dialect = engine.dialect
+    columns_by_table, pks_by_table, fks_by_table = {}, {}, {}
+
+    with engine.connect() as connection:
+        for table_name, name, declared_type, notnull, default, pk in connection.execute(SQLITE_COLUMNS):
+            # same type resolution the sqlite inspector uses, so type strings don't change
+            column_type = dialect._resolve_type_affinity(declared_type.upper())
+            columns_by_table.setdefault(table_name, []).append({
+                'name': name,
+                'type': column_type,
+                'nullable': not notnull,
+                'default': default,
+            })
+            if pk:
+                pks_by_table.setdefault(table_name, []).append((pk, name))
+
+        pks_by_table = {
+            table_name: [name for _, name in sorted(pk_columns)]
+            for table_name, pk_columns in pks_by_table.items()
+        }
+
+        for table_name, constrained, referred_table, referred in connection.execute(SQLITE_FOREIGN_KEYS):
+            if referred is None:
+                # "REFERENCES parent" without columns points at the parent's primary key
+                referred = (pks_by_table.get(referred_table) or [None])[0]
+            _add_foreign_key(fks_by_table, table_name, constrained, referred_table, referred)
+
+    pks_by_table = {table_name: set(pk_columns) for table_name, pk_columns in pks_by_table.items()}
+    return _build_scheme(columns_by_table, pks_by_table, fks_by_table)
+
+
+def _introspect_multi(engine: Engine) -> dict:
+    # get_multi_* reflects all tables in a few catalog queries on postgres/oracle,
+    # other dialects fall back to one round of queries per table
+    inspector = inspect(engine)
+    columns_by_table = {
+        table_name: columns
+        for (_, table_name), columns in inspector.get_multi_columns().items()
+    }
+    pks_by_table = {
+        table_name: set((pk or {}).get('constrained_columns') or [])
+        for (_, table_name), pk in inspector.get_multi_pk_constraint().items()
+    }
+    fks_by_table = {}
+    for (_, table_name), fks in inspector.get_multi_foreign_keys().items():
+        for fk in fks:
+            for constrained, referred in zip(fk['constrained_columns'], fk['referred_columns']):
+                _add_foreign_key(fks_by_table, table_name, constrained, fk['referred_table'], referred)
+    return _build_scheme(columns_by_table, pks_by_table, fks_by_table)
+
+
+def introspect_schema(engine: Engine) -> dict:
+    """
+    Read tables, columns, primary keys and foreign keys of a database in bulk,
+    instead of asking for keys once per column.
+    """
+    if engine.dialect.name == "sqlite":
+        return _introspect_sqlite(engine)
+    return _introspect_multi(engine)
@@ -0,0 +1,94 @@
+import base64
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable, Iterable, Sequence
+from uuid import UUID
+
+
+def _to_base64(value) -> str:
+    return base64.b64encode(bytes(value)).decode("ascii")
+
+
+# python type -> json friendly conversion
+CONVERTERS: dict[type, Callable] = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    time: time.isoformat,
+    timedelta: timedelta.total_seconds,
+    Decimal: float,
+    UUID: str,
+    bytes: _to_base64,
+    bytearray: _to_base64,
+    memoryview: _to_base64,
+}
+
+
+def convert_value(value):
+    # slow path, used for values whose type differs from the one picked for the column
+    converter = CONVERTERS.get(value.__class__)
+    if converter:
+        return converter(value)
+    for value_type, converter in CONVERTERS.items():
+        if isinstance(value, value_type):
+            return converter(value)
+    return value
+
+
+def _column_converter(value_type: type) -> Callable | None:
+    converter = CONVERTERS.get(value_type)
+    if converter is None:
+        for known_type, known_converter in CONVERTERS.items():
+            if issubclass(value_type, known_type):
+                return known_converter
+    return converter
+
+
+class RowSerializer:
+    """
+    Converts result rows to JSON friendly values with one converter per column.
+
+    Column types are resolved once from the first non-null value of each column
+    (DB-API type codes in cursor.description are driver specific, values are not),
+    after which only the columns that need converting are touched, one column at a time.
+    """
+
+    def __init__(self, columns: Iterable[str]) -> None:
+        self.columns = list(columns)
+        self._unresolved = set(range(len(self.columns)))
+        self._converters: list[tuple[int, type, Callable]] = []
+
+    def _resolve(self, rows: Sequence[Sequence]) -> None:
+        for row in rows:
+            if not self._unresolved:
+                break
+            for index in list(self._unresolved):
+                value = row[index]
+                if value is None:
+                    continue
+                self._unresolved.discard(index)
+                converter = _column_converter(value.__class__)
+                if converter:
+                    self._converters.append((index, value.__class__, converter))
+
+    def _convert_rows(self, rows: Sequence[Sequence]) -> Iterable[Sequence]:
+        if self._unresolved:
+            self._resolve(rows)
+        if not self._converters or not rows:
+            return rows
+        # convert column by column, so each converter runs in one tight loop
+        columns = list(zip(*rows))
+        for index, value_type, convert in self._converters:
+            columns[index] = [
+                convert(value) if value.__class__ is value_type
+                else None if value is None
+                else convert_value(value)
+                for value in columns[index]
+            ]
+        return zip(*columns)
+
+    def to_records(self, rows: Sequence[Sequence]) -> list[dict]:
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self._convert_rows(rows)]
+
+    def to_columnar(self, rows: Sequence[Sequence]) -> list[list]:
+        return [list(row) for row in self._convert_rows(rows)]
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+from config.cache_config import settings
+from utils.cache import RedisCache
+from utils.logger import logger
+from utils.metrics import metrics
+
+# deletes the lock only while it still belongs to the leader that set it
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller (the leader) runs the call, callers arriving while it is in
+    flight (followers) await its result or exception instead of running it again.
+    With Redis enabled this also holds across processes: the leader holds a lock
+    and publishes its result, followers in other processes poll for it and only
+    run the call themselves if the leader failed or took too long.
+    """
+
+    def __init__(self, prefix: str = "singleflight") -> None:
+        self._calls: dict[str, asyncio.Future] = {}
+        self.redis = RedisCache(prefix=prefix) if settings.SINGLEFLIGHT_USE_REDIS else None
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return await call()
+
+        in_flight = self._calls.get(key)
+        if in_flight is not None:
+            metrics.incr("singleflight.coalesced.local")
+            try:
+                # shielded, a cancelled follower must not cancel the leader's call
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                # the leader was cancelled, not this follower: take over the call
+                if in_flight.cancelled() and not asyncio.current_task().cancelling():
+                    return await self.do(key, call)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await (self._do_shared(key, call) if self.redis else call())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # marks the exception as retrieved when no follower was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    async def _do_shared(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        client = self.redis.client
+        lock_key, result_key = f"{self.redis.prefix}:lock:{key}", f"{self.redis.prefix}:result:{key}"
+        token = uuid.uuid4().hex
+        try:
+            leader = await client.set(lock_key, token, nx=True, ex=settings.SINGLEFLIGHT_LOCK_TTL)
+        except Exception as e:
+            logger.warning(f"Singleflight lock failed for {key}, running without it: {e}")
+            return await call()
+
+        if not leader:
+            waited = await self._wait_for_leader(lock_key, result_key)
+            if waited is not None:
+                metrics.incr("singleflight.coalesced.redis")
+                return json.loads(waited)
+            # the leader failed or gave up, run the call here instead
+            return await call()
+
+        try:
+            # a result left by an earlier leader must not be taken for this one's
+            await client.delete(result_key)
+            result = await call()
+            await client.set(result_key, json.dumps(result, default=str), ex=settings.SINGLEFLIGHT_RESULT_TTL)
+            return result
+        finally:
+            try:
+                await client.eval(_RELEASE_LOCK, 1, lock_key, token)
+            except Exception as e:
+                logger.warning(f"Singleflight unlock failed for {key}: {e}")
+
+    async def _wait_for_leader(self, lock_key: str, result_key: str) -> bytes | None:
+        deadline = time.monotonic() + settings.SINGLEFLIGHT_WAIT_TIMEOUT
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(settings.SINGLEFLIGHT_POLL_INTERVAL)
+                # the leader stores its result before releasing the lock
+                if not await self.redis.client.exists(lock_key):
+                    return await self.redis.client.get(result_key)
+        except Exception as e:
+            logger.warning(f"Singleflight wait failed for {lock_key}: {e}")
+        return None
+
+
+singleflight = SingleFlight()
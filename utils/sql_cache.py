@@ -0,0 +1,79 @@
+import hashlib
+
+from config.cache_config import settings
+from utils.cache import RedisCache, TTLCache
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+def schema_fingerprint(schema: str) -> str:
+    return hashlib.sha256(str(schema).encode()).hexdigest()[:16]
+
+
+def sql_generation_fingerprint(query_text: str, output_type: str, schema: str, database_provider: str) -> str:
+    # everything the generated sql depends on
+    payload = "\x1f".join([query_text or "", output_type or "", str(schema), database_provider or ""])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SqlGenerationCache:
+    """
+    Cache of generated SQL, keyed by a hash of (query_text, output_type, schema, db_provider).
+
+    Keys are prefixed with the schema fingerprint, so a changed Database.schema
+    never hits old entries and all entries of a schema can be dropped at once.
+    Entries live in process memory and, when enabled, in Redis shared by all workers.
+    """
+
+    def __init__(self) -> None:
+        self.memory = TTLCache(max_entries=settings.SQL_CACHE_MAX_ENTRIES, ttl=settings.SQL_CACHE_TTL)
+        self.redis = RedisCache(prefix="sqlgen") if settings.SQL_CACHE_USE_REDIS else None
+
+    @staticmethod
+    def _key(query_text, output_type, schema, database_provider) -> str:
+        return f"{schema_fingerprint(schema)}:{sql_generation_fingerprint(query_text, output_type, schema, database_provider)}"
+
+    async def get(self, query_text, output_type, schema, database_provider) -> str | None:
+        if not settings.SQL_CACHE_ENABLED:
+            return None
+        key = self._key(query_text, output_type, schema, database_provider)
+
+        sql_query = self.memory.get(key)
+        if sql_query is not None:
+            metrics.incr("sql_cache.hits.memory")
+            return sql_query
+
+        if self.redis:
+            cached = await self.redis.get(key)
+            if cached is not None:
+                sql_query = cached.decode()
+                self.memory.set(key, sql_query)
+                metrics.incr("sql_cache.hits.redis")
+                return sql_query
+
+        metrics.incr("sql_cache.misses")
+        return None
+
+    async def set(self, query_text, output_type, schema, database_provider, sql_query: str) -> None:
+        if not settings.SQL_CACHE_ENABLED:
+            return
+        key = self._key(query_text, output_type, schema, database_provider)
+        self.memory.set(key, sql_query)
+        if self.redis:
+            await self.redis.set(key, sql_query.encode(), settings.SQL_CACHE_TTL)
+
+    async def delete(self, query_text, output_type, schema, database_provider) -> None:
+        key = self._key(query_text, output_type, schema, database_provider)
+        self.memory.delete(key)
+        if self.redis:
+            await self.redis.delete(key)
+
+    async def invalidate_schema(self, schema: str) -> None:
+        prefix = f"{schema_fingerprint(schema)}:"
+        removed = self.memory.delete_where(lambda key: key.startswith(prefix))
+        if self.redis:
+            await self.redis.delete_prefix(prefix)
+        logger.info(f"Invalidated {removed} cached sql queries for schema {prefix[:-1]}")
+
+
+sql_cache = SqlGenerationCache()
@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import importlib.util
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator
+
+from sqlalchemy import text
+
+from config.engine_config import settings
+from utils.engine_registry import engine_registry
+from utils.logger import logger
+from utils.metrics import metrics
+from utils.serializers import RowSerializer
+from utils.singleflight import singleflight
+from utils.result_cache import result_cache
+from utils.user_queries import limit_query, provider_of, result_to_json, result_to_columnar
+from utils.paging import page_offset, page_token, truncate
+from utils.sql_fingerprint import analyze
+from utils.statement_timeout import StatementControl, StatementTimeoutError
+
+# sync driver prefix -> (async driver prefix, module that must be importable)
+ASYNC_DRIVERS = {
+    "postgresql+psycopg2://": ("postgresql+asyncpg://", "asyncpg"),
+    "mysql+pymysql://": ("mysql+aiomysql://", "aiomysql"),
+    "sqlite:///": ("sqlite+aiosqlite:///", "aiosqlite"),
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.EXECUTOR_MAX_WORKERS,
+    thread_name_prefix="customer-db",
+)
+
+
+def get_async_connection_string(connection_string: str) -> str | None:
+    # returns None when the dialect has no usable async driver
+    if not settings.USE_ASYNC_DRIVERS:
+        return None
+    for sync_prefix, (async_prefix, module) in ASYNC_DRIVERS.items():
+        if connection_string.startswith(sync_prefix):
+            if importlib.util.find_spec(module) is None:
+                logger.warning(f"{module} not installed, falling back to thread pool execution")
+                return None
+            return async_prefix + connection_string[len(sync_prefix):]
+    return None
+
+
+RESULT_FORMATS = {
+    "records": result_to_json,
+    "columnar": result_to_columnar,
+}
+
+
+async def _cancellable(awaitable, control: StatementControl):
+    """
+    Await a call running a statement, stopping the statement on the database when cancelled.
+
+    The call itself is only cancelled afterwards, sqlalchemy cleans a cancelled call
+    up on the same connection, which would otherwise wait for the statement to end.
+    """
+    call = asyncio.ensure_future(awaitable)
+    try:
+        return await asyncio.shield(call)
+    except asyncio.CancelledError:
+        await control.cancel()
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        raise
+
+
+async def _execute_async(db_id: int, async_connection_string: str, sql_query: str, result_format: str, control: StatementControl):
+    engine = engine_registry.get_async_engine(db_id, async_connection_string)
+    async with engine.connect() as connection:
+        await control.apply_async(connection)
+        result = await _cancellable(connection.execute(text(sql_query)), control)
+        await control.release_async(connection)
+        return RESULT_FORMATS[result_format](result)
+
+
+def _execute_sync(db_id: int, connection_string: str, sql_query: str, result_format: str, control: StatementControl, submitted_at: float):
+    metrics.observe("sql.threadpool.queue_wait", time.perf_counter() - submitted_at)
+    metrics.gauge("sql.threadpool.queued", -1)
+    metrics.gauge("sql.threadpool.in_flight", 1)
+    try:
+        engine = engine_registry.get_engine(db_id, connection_string)
+        with engine.connect() as connection:
+            control.apply(connection)
+            try:
+                result = connection.execute(text(sql_query))
+                return RESULT_FORMATS[result_format](result)
+            finally:
+                control.release(connection)
+    finally:
+        metrics.gauge("sql.threadpool.in_flight", -1)
+
+
+async def execute_sql(
+    db_id: int, connection_string: str, sql_query: str, result_format: str = "records", timeout: float | None = None,
+) -> list[dict] | dict:
+    """
+    Run a generated statement against a customer database without blocking the event loop.
+
+    result_format is "records" (list of dicts) or "columnar" ({"columns": [...], "data": [[...]]}).
+    The database stops the statement after `timeout` seconds (see statement_timeout), and
+    cancelling the caller cancels the statement.
+    """
+    if result_format not in RESULT_FORMATS:
+        result_format = "records"
+    # the same statement already running against the same database is awaited, not run again
+    statement = hashlib.sha256(analyze(sql_query, provider_of(connection_string)).canonical.encode()).hexdigest()
+    return await singleflight.do(
+        f"sql:{db_id}:{result_format}:{timeout}:{statement}",
+        partial(_execute, db_id, connection_string, sql_query, result_format, timeout),
+    )
+
+
+async def execute_sql_cached(
+    db_id: int, connection_string: str, sql_query: str, result_format: str = "records",
+    ttl: int | None = None, row_limit: int | None = None, timeout: float | None = None,
+) -> tuple[list[dict] | dict, dict]:
+    """
+    execute_sql through the result cache. Also returns whether the result came from
+    the cache and how old it is, eg. {"hit": True, "age_seconds": 12.5}.
+    """
+    if result_format not in RESULT_FORMATS:
+        result_format = "records"
+    key = await result_cache.key(db_id, sql_query, provider_of(connection_string), row_limit, result_format)
+    cached = await result_cache.get(key)
+    if cached is not None:
+        result, age = cached
+        return result, {"hit": True, "age_seconds": round(age, 3)}
+
+    result = await execute_sql(db_id, connection_string, sql_query, result_format, timeout)
+    await result_cache.set(key, result, ttl)
+    return result, {"hit": False, "age_seconds": 0.0}
+
+
+async def execute_sql_page(
+    db_id: int, connection_string: str, sql_query: str, result_format: str = "records",
+    ttl: int | None = None, token: str | None = None, timeout: float | None = None, row_limit: int | None = None,
+) -> tuple[list[dict] | dict, dict, dict]:
+    """
+    execute_sql_cached for at most `row_limit` rows (ROW_LIMIT by default) of the statement, from the first row
+    or the one `token` points to. The limit is applied by the database, the rows after
+    the page are never fetched. Also returns whether rows were left out and the
+    token of the next page, eg. {"truncated": True, "next_page_token": "..."}.
+    """
+    provider = provider_of(connection_string)
+    offset = page_offset(token, sql_query, provider) if token else 0
+    row_limit = settings.ROW_LIMIT if row_limit is None else row_limit
+    # one row past the page tells whether another page follows
+    limited_query = limit_query(sql_query, provider, row_limit + 1, offset)
+    result, cache = await execute_sql_cached(
+        db_id, connection_string, limited_query, result_format, ttl=ttl, row_limit=row_limit + 1, timeout=timeout,
+    )
+    result, truncated = truncate(result, row_limit)
+    if truncated:
+        metrics.incr("sql.results.truncated")
+    next_page_token = page_token(sql_query, provider, offset + row_limit) if truncated else None
+    return result, cache, {"truncated": truncated, "next_page_token": next_page_token}
+
+
+async def _execute(db_id: int, connection_string: str, sql_query: str, result_format: str, timeout: float | None) -> list[dict] | dict:
+    started_at = time.perf_counter()
+    async_connection_string = get_async_connection_string(connection_string)
+    control = StatementControl(timeout)
+    try:
+        if async_connection_string:
+            metrics.incr("sql.executions.async")
+            return await _execute_async(db_id, async_connection_string, sql_query, result_format, control)
+
+        metrics.incr("sql.executions.threadpool")
+        metrics.gauge("sql.threadpool.queued", 1)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, _execute_sync, db_id, connection_string, sql_query, result_format, control, time.perf_counter()
+        )
+    except asyncio.CancelledError:
+        # client went away or the tile timed out, the statement mustn't keep running for nobody
+        metrics.incr("sql.executions.cancelled")
+        await control.cancel()
+        raise
+    except Exception as e:
+        if control.timed_out():
+            metrics.incr("sql.executions.timed_out")
+            logger.warning(f"Query on database {db_id} stopped after its {timeout}s timeout")
+            raise StatementTimeoutError(f"Query didn't finish within {timeout}s") from e
+        metrics.incr("sql.executions.failed")
+        raise
+    finally:
+        duration = time.perf_counter() - started_at
+        metrics.observe("sql.execution", duration)
+        if duration >= settings.SLOW_QUERY_SECONDS:
+            # the fingerprint groups runs of the same query with other literals
+            signature = analyze(sql_query, provider_of(connection_string))
+            metrics.incr("sql.executions.slow")
+            logger.warning(
+                f"Slow query {signature.fingerprint} on database {db_id} took {duration:.2f}s "
+                f"(tables {', '.join(sorted(signature.tables)) or '-'}): {signature.template}"
+            )
+
+
+async def _stream_async(db_id: int, async_connection_string: str, sql_query: str, chunk_size: int, control: StatementControl):
+    engine = engine_registry.get_async_engine(db_id, async_connection_string)
+    async with engine.connect() as connection:
+        await control.apply_async(connection)
+        finished = False
+        try:
+            # server side cursor, rows are fetched chunk by chunk
+            result = await _cancellable(
+                connection.stream(text(sql_query), execution_options={"yield_per": chunk_size}), control,
+            )
+            serializer = RowSerializer(result.keys())
+            async for partition in result.partitions():
+                yield serializer.to_records(partition)
+            finished = True
+            await control.release_async(connection)
+        except Exception:
+            finished = True
+            raise
+        finally:
+            if not finished:
+                metrics.incr("sql.streams.cancelled")
+                await control.cancel()
+
+
+def _stream_sync(db_id: int, connection_string: str, sql_query: str, chunk_size: int, loop, queue: asyncio.Queue, control: StatementControl):
+    def put(item):
+        # blocks the worker thread while the queue is full, giving backpressure to the cursor
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    try:
+        engine = engine_registry.get_engine(db_id, connection_string)
+        with engine.connect() as connection:
+            control.apply(connection)
+            try:
+                result = connection.execution_options(
+                    stream_results=True, yield_per=chunk_size
+                ).execute(text(sql_query))
+                serializer = RowSerializer(result.keys())
+                for partition in result.partitions():
+                    # consumer went away (e.g. client disconnected), stop reading
+                    if control.cancelled.is_set():
+                        return
+                    put(serializer.to_records(partition))
+            finally:
+                control.release(connection)
+        put(None)
+    except asyncio.CancelledError:
+        # cancelled before the statement started, nobody is reading anymore
+        return
+    except Exception as e:
+        put(e)
+
+
+async def _stream_threadpool(db_id: int, connection_string: str, sql_query: str, chunk_size: int, control: StatementControl):
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    producer = loop.run_in_executor(
+        executor, _stream_sync, db_id, connection_string, sql_query, chunk_size, loop, queue, control
+    )
+    finished = False
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                finished = True
+                break
+            if isinstance(item, Exception):
+                finished = True
+                raise item
+            yield item
+    finally:
+        if not finished:
+            # stops a statement still running on the database, not just the reading of its rows
+            metrics.incr("sql.streams.cancelled")
+            await control.cancel()
+        # unblock a producer waiting on a full queue so the worker thread is released
+        while not producer.done():
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.sleep(0.01)
+
+
+async def stream_sql(db_id: int, connection_string: str, sql_query: str, timeout: float | None = None) -> AsyncIterator[list[dict]]:
+    """
+    Like execute_sql, but yields the result in chunks of rows as they leave the database.
+    """
+    chunk_size = settings.STREAM_CHUNK_SIZE
+    control = StatementControl(timeout)
+    async_connection_string = get_async_connection_string(connection_string)
+    if async_connection_string:
+        metrics.incr("sql.streams.async")
+        chunks = _stream_async(db_id, async_connection_string, sql_query, chunk_size, control)
+    else:
+        metrics.incr("sql.streams.threadpool")
+        chunks = _stream_threadpool(db_id, connection_string, sql_query, chunk_size, control)
+
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        if control.timed_out():
+            metrics.incr("sql.streams.timed_out")
+            raise StatementTimeoutError(f"Query didn't finish within {timeout}s") from e
+        metrics.incr("sql.streams.failed")
+        raise
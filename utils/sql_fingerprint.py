@@ -0,0 +1,348 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# quoted identifiers per provider. mysql and mariadb read "..." as a string
+# unless ANSI_QUOTES is on, sqlserver also quotes with [...]
+_IDENTIFIER_QUOTES = {
+    "postgres": r'"(?:[^"]|"")*"',
+    "sqlite": r'"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]',
+    "mysql": r"`(?:[^`]|``)*`",
+    "mariadb": r"`(?:[^`]|``)*`",
+    "sqlserver": r'"(?:[^"]|"")*"|\[(?:[^\]]|\]\])*\]',
+}
+_STRINGS = {
+    # standard_conforming_strings: a backslash only escapes inside E'...'
+    "postgres": r"[eE]'(?:[^'\\]|''|\\.)*'|(?:[bBxX]|[uU]&)?'(?:[^']|'')*'|\$(?P<tag>[a-zA-Z_]\w*)?\$.*?\$(?P=tag)?\$",
+    "mysql": r"[nNbBxX]?'(?:[^'\\]|''|\\.)*'|\"(?:[^\"\\]|\"\"|\\.)*\"",
+    "mariadb": r"[nNbBxX]?'(?:[^'\\]|''|\\.)*'|\"(?:[^\"\\]|\"\"|\\.)*\"",
+    "sqlserver": r"[nN]?'(?:[^']|'')*'",
+    "sqlite": r"[xX]?'(?:[^']|'')*'",
+}
+# strings of servers where a backslash escapes in every string, postgres with
+# standard_conforming_strings off
+_BACKSLASH_STRINGS = {
+    "postgres": r"[eEbBxXuU]?&?'(?:[^'\\]|''|\\.)*'|\$(?P<tag>[a-zA-Z_]\w*)?\$.*?\$(?P=tag)?\$",
+}
+_DEFAULT_PROVIDER = "postgres"
+
+# token kinds, in the order they are tried
+COMMENT, STRING, IDENTIFIER, NUMBER, PARAMETER, WORD, OPERATOR = (
+    "comment", "string", "identifier", "number", "parameter", "word", "operator",
+)
+_COMMON_TOKENS = [
+    (COMMENT, r"--[^\n]*|/\*.*?\*/"),
+    (NUMBER, r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"),
+    (PARAMETER, r"\$\d+|:[a-zA-Z_]\w*|%\(\w+\)s|%s|\?|@[a-zA-Z_]\w*"),
+    (WORD, r"[a-zA-Z_][\w$]*"),
+    (OPERATOR, r"<>|!=|<=|>=|\|\||::|->>|->|#>>|#>|[^\s\w]"),
+]
+
+# words that are never a table, alias or column
+KEYWORDS = {
+    "select", "from", "where", "and", "or", "not", "in", "is", "null", "as", "on", "join", "inner",
+    "left", "right", "full", "outer", "cross", "natural", "using", "group", "by", "order", "having",
+    "limit", "offset", "fetch", "first", "next", "rows", "row", "only", "top", "percent", "ties",
+    "distinct", "all", "any", "some", "union", "intersect", "except", "minus", "with", "recursive",
+    "case", "when", "then", "else", "end", "between", "like", "ilike", "similar", "escape", "exists",
+    "asc", "desc", "nulls", "last", "true", "false", "unknown", "cast", "interval", "over", "partition",
+    "window", "range", "rows", "preceding", "following", "unbounded", "current", "filter", "within",
+    "lateral", "values", "default", "collate", "at", "time", "zone", "date", "timestamp", "into",
+    "for", "update", "share", "nowait", "skip", "locked", "array", "distinctrow", "straight_join",
+    "regexp", "rlike", "div", "mod", "xor", "sounds", "apply", "pivot", "unpivot", "tablesample",
+    "qualify", "materialized", "ordinality", "sql_no_cache", "sql_calc_found_rows", "high_priority",
+}
+# functions whose arguments use FROM without it introducing a table
+_FROM_FUNCTIONS = {"extract", "substring", "trim", "overlay", "position", "date_part"}
+_SOURCE_STARTS = {"from", "join", "apply"}
+_CLAUSE_ENDS = {
+    "where", "group", "order", "having", "limit", "offset", "fetch", "union", "intersect", "except",
+    "window", "on", "using", "join", "inner", "left", "right", "full", "cross", "natural", "outer",
+    "for", "qualify", "minus", "tablesample", "pivot", "unpivot", "straight_join",
+}
+
+
+@lru_cache(maxsize=None)
+def _lexer(provider: str, backslash_escapes: bool = False) -> re.Pattern:
+    provider = provider if provider in _STRINGS else _DEFAULT_PROVIDER
+    strings = _BACKSLASH_STRINGS.get(provider, _STRINGS[provider]) if backslash_escapes else _STRINGS[provider]
+    kinds = [_COMMON_TOKENS[0], (STRING, strings), (IDENTIFIER, _IDENTIFIER_QUOTES[provider])]
+    kinds += _COMMON_TOKENS[1:]
+    return re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in kinds), re.DOTALL)
+
+
+def token_spans(
+    sql_query: str, provider: str = _DEFAULT_PROVIDER, backslash_escapes: bool = False,
+) -> list[tuple[str, str, int]]:
+    """
+    (kind, text, start offset) tokens of a statement, without whitespace and comments.
+
+    backslash_escapes reads a backslash as an escape in every string, the way a
+    postgres server with standard_conforming_strings off does.
+    """
+    tokens = []
+    for match in _lexer(provider, backslash_escapes).finditer(sql_query or ""):
+        kind = match.lastgroup if match.lastgroup != "tag" else STRING
+        # the dollar quote tag group is nested inside the string group
+        if match.group(STRING) is not None:
+            kind = STRING
+        if kind != COMMENT:
+            tokens.append((kind, match.group(), match.start()))
+    return tokens
+
+
+def tokenize(sql_query: str, provider: str = _DEFAULT_PROVIDER) -> list[tuple[str, str]]:
+    """
+    (kind, text) tokens of a statement, without whitespace and comments.
+    """
+    return [(kind, text) for kind, text, _ in token_spans(sql_query, provider)]
+
+
+def _unquote(identifier: str) -> str:
+    if identifier[0] in '"`[':
+        return identifier[1:-1]
+    return identifier
+
+
+def _name(kind: str, text: str) -> str:
+    # unquoted names fold to lower case, quoted ones keep theirs
+    return _unquote(text) if kind == IDENTIFIER else text.lower()
+
+
+def _canonical_token(kind: str, text: str) -> str:
+    if kind == WORD:
+        return text.lower()
+    if kind == IDENTIFIER:
+        name = _unquote(text)
+        # "orders" and orders are the same table, "Orders" is not
+        if re.fullmatch(r"[a-z_][a-z0-9_$]*", name) and name not in KEYWORDS:
+            return name
+        return text
+    return text
+
+
+def _join(tokens: list[str]) -> str:
+    text = []
+    for index, token in enumerate(tokens):
+        previous = tokens[index - 1] if index else None
+        # sum(x) but in (x)
+        call = token == "(" and previous is not None and previous.isidentifier() and previous not in KEYWORDS
+        if previous is not None and token not in (",", ")", ".", "::") and previous not in ("(", ".", "::") and not call:
+            text.append(" ")
+        text.append(token)
+    return "".join(text)
+
+
+def canonicalize(sql_query: str, provider: str = _DEFAULT_PROVIDER) -> str:
+    """
+    The statement without comments, with single spaces, lower case keywords and
+    unquoted names and no trailing semicolon. Literals are kept.
+    """
+    return _canonical(tokenize(sql_query, provider))
+
+
+def _canonical(tokens: list[tuple[str, str]]) -> str:
+    tokens = [_canonical_token(kind, text) for kind, text in tokens]
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return _join(tokens)
+
+
+def template(sql_query: str, provider: str = _DEFAULT_PROVIDER) -> str:
+    """
+    The canonical statement with every literal replaced by ?, and lists of literals
+    by a single ?, so the same query with other values has the same template.
+    """
+    return _template(tokenize(sql_query, provider))
+
+
+def _template(lexed: list[tuple[str, str]]) -> str:
+    tokens = []
+    for kind, text in lexed:
+        if kind in (STRING, NUMBER, PARAMETER):
+            # a negative number is the same literal as a positive one
+            if tokens and tokens[-1] == "-" and (len(tokens) < 2 or tokens[-2] in ("(", ",", "=", "<", ">", "<=", ">=", "<>", "!=")):
+                tokens.pop()
+            tokens.append("?")
+        else:
+            tokens.append(_canonical_token(kind, text))
+        # (?, ?, ?) -> (?)
+        while len(tokens) >= 3 and tokens[-1] == "?" and tokens[-2] == "," and tokens[-3] == "?":
+            del tokens[-2:]
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return _join(tokens)
+
+
+def _dotted(tokens: list[tuple[str, str]], index: int) -> tuple[list[str], int]:
+    # the parts of a.b.c starting at index, and the index after it
+    parts = []
+    while index < len(tokens) and tokens[index][0] in (WORD, IDENTIFIER):
+        parts.append(_name(*tokens[index]))
+        if index + 2 < len(tokens) and tokens[index + 1][1] == "." and tokens[index + 2][0] in (WORD, IDENTIFIER):
+            index += 2
+        else:
+            index += 1
+            break
+    return parts, index
+
+
+def references(sql_query: str, provider: str = _DEFAULT_PROVIDER) -> tuple[set[str], set[str]]:
+    """
+    Tables and columns a statement reads, all names without schema.
+
+    Columns qualified with a known table or alias are returned as table.column,
+    others by their bare name. CTE names count as neither.
+    """
+    return _references(tokenize(sql_query, provider))
+
+
+def table_sources(sql_query: str, provider: str = _DEFAULT_PROVIDER) -> list[tuple[int, int, str, str | None]]:
+    """
+    Every reference to a table in FROM and JOIN clauses, as (start, end, table, alias)
+    with the character offsets of the possibly schema qualified name. CTEs aren't tables.
+    """
+    spans = token_spans(sql_query, provider)
+    sources = []
+    _references([(kind, text) for kind, text, _ in spans], sources)
+    return [
+        (spans[start][2], spans[end - 1][2] + len(spans[end - 1][1]), table, alias)
+        for start, end, table, alias in sources
+    ]
+
+
+def _references(tokens: list[tuple[str, str]], sources: list | None = None) -> tuple[set[str], set[str]]:
+    words = [text.lower() if kind == WORD else None for kind, text in tokens]
+
+    ctes = set()
+    for index, word in enumerate(words):
+        # WITH name AS ( and , name AS (
+        if (
+            word is not None and word not in KEYWORDS and index + 2 < len(tokens)
+            and words[index + 1] == "as" and tokens[index + 2][1] == "("
+            and index and (words[index - 1] in ("with", "recursive") or tokens[index - 1][1] == ",")
+        ):
+            ctes.add(_name(*tokens[index]))
+
+    tables, aliases, output_aliases, table_positions = set(), {}, set(), set()
+    opened_by = []
+    index = 0
+    while index < len(tokens):
+        kind, text = tokens[index]
+        if text == "(":
+            opened_by.append(words[index - 1] if index else None)
+        elif text == ")" and opened_by:
+            opened_by.pop()
+        elif words[index] == "as" and index + 1 < len(tokens) and tokens[index + 1][0] in (WORD, IDENTIFIER):
+            if index + 2 >= len(tokens) or tokens[index + 2][1] != "(":
+                output_aliases.add(_name(*tokens[index + 1]))
+        elif words[index] in _SOURCE_STARTS and not (opened_by and opened_by[-1] in _FROM_FUNCTIONS):
+            index += 1
+            # FROM a [AS] x, b y JOIN ...
+            while index < len(tokens):
+                start = index
+                parts, index = _dotted(tokens, index)
+                if not parts or (index < len(tokens) and tokens[index][1] == "("):
+                    # a subquery or a table function
+                    index = start
+                    break
+                table, name_end, alias = parts[-1], index, None
+                is_table = words[start] is None or words[start] not in KEYWORDS
+                if is_table:
+                    if table not in ctes:
+                        tables.add(table)
+                    table_positions.update(range(start, index))
+                    aliases[table] = table
+                if words[index:index + 1] == ["as"]:
+                    index += 1
+                if index < len(tokens) and tokens[index][0] in (WORD, IDENTIFIER) and words[index] not in KEYWORDS | _CLAUSE_ENDS:
+                    alias = _name(*tokens[index])
+                    aliases[alias] = table
+                    table_positions.add(index)
+                    index += 1
+                if sources is not None and is_table and table not in ctes:
+                    sources.append((start, name_end, table, alias))
+                if index < len(tokens) and tokens[index][1] == ",":
+                    index += 1
+                    continue
+                break
+            continue
+        index += 1
+
+    columns = set()
+    skip = set(table_positions)
+    for index, (kind, text) in enumerate(tokens):
+        if index in skip or kind not in (WORD, IDENTIFIER):
+            continue
+        word = words[index]
+        if word in KEYWORDS or (index + 1 < len(tokens) and tokens[index + 1][1] == "("):
+            continue
+        if index and (words[index - 1] == "as" or tokens[index - 1][1] == "::"):
+            continue
+        # an alias without AS: count(*) total, (select ...) sub, o.total amount
+        if index and (
+            tokens[index - 1][1] == ")"
+            or (tokens[index - 1][0] in (WORD, IDENTIFIER) and words[index - 1] not in KEYWORDS)
+        ):
+            output_aliases.add(_name(kind, text))
+            continue
+        # extract(year FROM x)
+        if index + 1 < len(tokens) and words[index + 1] == "from" and _opened_by_at(tokens, words, index) in _FROM_FUNCTIONS:
+            continue
+        parts, end = _dotted(tokens, index)
+        skip.update(range(index, end))
+        if end < len(tokens) and tokens[end][1] == "(":
+            continue
+        if len(parts) >= 2:
+            qualifier, column = parts[-2], parts[-1]
+            # columns of subqueries and CTEs have no table of their own
+            if qualifier in output_aliases or qualifier in ctes:
+                columns.add(column)
+            else:
+                columns.add(f"{aliases.get(qualifier, qualifier)}.{column}")
+        elif parts[0] not in output_aliases and parts[0] not in aliases and parts[0] not in ctes:
+            columns.add(parts[0])
+    return tables, columns
+
+
+def _opened_by_at(tokens: list[tuple[str, str]], words: list, index: int) -> str | None:
+    # the word before the innermost parenthesis around tokens[index]
+    depth = 0
+    for position in range(index - 1, -1, -1):
+        text = tokens[position][1]
+        if text == ")":
+            depth += 1
+        elif text == "(":
+            if depth == 0:
+                return words[position - 1] if position else None
+            depth -= 1
+    return None
+
+
+@dataclass(frozen=True)
+class SqlSignature:
+    canonical: str
+    template: str
+    fingerprint: str
+    tables: frozenset[str]
+    columns: frozenset[str]
+
+
+@lru_cache(maxsize=4096)
+def analyze(sql_query: str, provider: str = _DEFAULT_PROVIDER) -> SqlSignature:
+    """
+    Canonical form, literal-free template and its fingerprint, and the tables and
+    columns read, for a generated statement. Cached, the same statements come back
+    from every refresh.
+    """
+    tokens = tokenize(sql_query, provider)
+    literal_free = _template(tokens)
+    tables, columns = _references(tokens)
+    return SqlSignature(
+        canonical=_canonical(tokens),
+        template=literal_free,
+        fingerprint=hashlib.sha256(literal_free.encode()).hexdigest()[:16],
+        tables=frozenset(tables),
+        columns=frozenset(columns),
+    )
@@ -0,0 +1,124 @@
+import re
+from enum import Enum
+
+from utils.sql_fingerprint import OPERATOR, WORD, token_spans
+
+# statements allowed to reach a customer database
+READ_ONLY_STATEMENTS = {"select", "with"}
+
+# reserved words that write or change something wherever they appear in the statement
+# (data modifying CTEs, SELECT ... INTO, FOR UPDATE locks, ...)
+WRITE_KEYWORDS = {
+    "insert", "update", "delete", "merge", "into",
+    "create", "alter", "drop", "truncate", "grant", "revoke",
+}
+
+# functions with side effects, callable from an otherwise harmless SELECT
+SIDE_EFFECT_FUNCTIONS = {
+    "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf", "set_config",
+    "lo_import", "lo_export", "pg_read_file", "pg_read_binary_file", "pg_ls_dir",
+    "dblink_exec", "load_file", "sleep", "pg_sleep", "benchmark", "xp_cmdshell",
+    # sequences move on every call
+    "nextval", "setval",
+    # statements run on another server, outside of this connection's read-only checks
+    "dblink", "dblink_open", "dblink_send_query", "dblink_connect", "dblink_connect_u",
+    # locks held past the statement, blocking the customer's own sessions
+    "pg_advisory_lock", "pg_advisory_lock_shared", "pg_advisory_xact_lock", "pg_advisory_xact_lock_shared",
+    "pg_try_advisory_lock", "pg_try_advisory_lock_shared", "pg_try_advisory_xact_lock",
+    "pg_try_advisory_xact_lock_shared", "pg_advisory_unlock", "pg_advisory_unlock_shared",
+    "pg_advisory_unlock_all", "get_lock", "release_lock", "release_all_locks",
+}
+
+def split_statements(sql_query: str, provider: str = "postgres", backslash_escapes: bool = False) -> list[list[tuple[str, str]]]:
+    # the (kind, text) tokens of each statement, lexed with the provider's own
+    # quoting so a ';' inside a string or comment doesn't split
+    statements, current = [], []
+    for kind, text, _ in token_spans(sql_query, provider, backslash_escapes):
+        if kind == OPERATOR and text == ";":
+            if current:
+                statements.append(current)
+            current = []
+        else:
+            current.append((kind, text))
+    if current:
+        statements.append(current)
+    return statements
+
+
+def _violation(statements: list[list[tuple[str, str]]]) -> str | None:
+    if not statements:
+        return "empty query"
+    if len(statements) > 1:
+        return f"{len(statements)} statements, only one is allowed"
+
+    tokens = statements[0]
+    words = [text.lower() for kind, text in tokens if kind == WORD]
+    if not words or words[0] not in READ_ONLY_STATEMENTS:
+        return f"{words[0].upper() if words else 'unknown'} statement"
+    writes = sorted(set(words) & WRITE_KEYWORDS)
+    if writes:
+        return f"contains {', '.join(word.upper() for word in writes)}"
+    calls = sorted({
+        text.lower() for (kind, text), following in zip(tokens, tokens[1:])
+        if kind == WORD and following[1] == "("
+    } & SIDE_EFFECT_FUNCTIONS)
+    if calls:
+        return f"calls {', '.join(calls)}"
+    return None
+
+
+def read_only_violation(sql_query: str, provider: str = "postgres") -> str | None:
+    """
+    Why sql_query isn't a single read-only SELECT/WITH statement, None when it is.
+
+    Postgres statements are also read with backslash escapes in every string, how
+    a server with standard_conforming_strings off ends them, and must pass both ways.
+    """
+    for backslash_escapes in (False, True) if provider == "postgres" else (False,):
+        violation = _violation(split_statements(sql_query or "", provider, backslash_escapes))
+        if violation:
+            return violation
+    return None
+
+
+class Verdict(Enum):
+    SAFE = "safe"
+    AMBIGUOUS = "ambiguous"
+
+
+# words asking to change data, or to change how the assistant behaves
+_RISKY_WORDS = {
+    "insert", "update", "delete", "drop", "alter", "truncate", "create", "remove", "modify",
+    "change", "add", "set", "rename", "replace", "grant", "revoke", "erase", "wipe", "purge",
+    "overwrite", "edit", "write", "save", "store", "upload", "reset", "clear", "destroy",
+    "kill", "make", "assign", "move", "merge", "append", "execute", "exec", "run",
+    "ignore", "instruction", "instructions", "prompt", "system", "pretend", "jailbreak",
+    "bypass", "override", "disregard", "forget", "sql", "query", "statement",
+}
+
+# words of a read-only, analytical question
+_ANALYTICAL_WORDS = {
+    "how", "what", "which", "who", "when", "where", "show", "list", "count", "number",
+    "total", "sum", "average", "avg", "mean", "median", "max", "maximum", "min", "minimum",
+    "top", "bottom", "highest", "lowest", "most", "least", "rank", "compare", "comparison",
+    "distribution", "trend", "breakdown", "per", "by", "percentage", "percent", "ratio", "share",
+    "growth", "monthly", "weekly", "daily", "yearly", "quarterly",
+}
+
+# longer questions are left to the guardrail, they are more likely to hide instructions
+MAX_PRECHECK_LENGTH = 300
+
+
+def precheck_question(query_text: str) -> Verdict:
+    """
+    Local input check: obviously safe analytical questions don't need the guardrail
+    LLM call, everything else is ambiguous and goes through it.
+    """
+    if not query_text or len(query_text) > MAX_PRECHECK_LENGTH:
+        return Verdict.AMBIGUOUS
+    if re.search(r";|--|/\*|`|\{|\}|<|>", query_text):
+        return Verdict.AMBIGUOUS
+    words = set(re.findall(r"[a-z]+", query_text.lower()))
+    if words & _RISKY_WORDS or not words & _ANALYTICAL_WORDS:
+        return Verdict.AMBIGUOUS
+    return Verdict.SAFE
@@ -0,0 +1,143 @@
+import asyncio
+import math
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from config.engine_config import settings
+from utils.logger import logger
+
+# sqlite calls the progress handler every this many virtual machine instructions
+SQLITE_PROGRESS_STEPS = 1000
+
+
+class StatementTimeoutError(TimeoutError):
+    """
+    A statement ran into its timeout and was stopped by the database.
+    """
+
+
+def statement_timeout(database_timeout: int | None, request_timeout: float | None = None) -> float | None:
+    """
+    Seconds a statement may run, None for no limit.
+
+    The database's own timeout (STATEMENT_TIMEOUT when it has none, 0 for no limit)
+    can be shortened by the request, never extended.
+    """
+    timeout = settings.STATEMENT_TIMEOUT if database_timeout is None else database_timeout
+    timeouts = [seconds for seconds in (timeout, request_timeout) if seconds]
+    return min(timeouts) if timeouts else None
+
+
+class StatementControl:
+    """
+    Timeout and cancellation of the statement running on one connection.
+
+    The timeout is enforced by the database itself: statement_timeout on postgres,
+    MAX_EXECUTION_TIME (max_statement_time on mariadb) on mysql, the query timeout
+    of the odbc connection on sqlserver and a progress handler on sqlite.
+    cancel() stops a running statement from the event loop: the sqlite progress
+    handler gives up, psycopg2 sends a cancel request, mysql gets a KILL QUERY
+    from another connection and asyncpg cancels by itself once its task is.
+    sqlserver statements only end at their timeout.
+    """
+
+    def __init__(self, timeout: float | None) -> None:
+        self.timeout = timeout
+        self.cancelled = threading.Event()
+        self._deadline: float | None = None
+        self._engine = None
+        self._dialect = None
+        self._driver_connection = None
+
+    def _interrupted(self) -> int:
+        # sqlite progress handler, a non-zero return aborts the statement
+        return int(self.cancelled.is_set() or (self._deadline is not None and time.monotonic() > self._deadline))
+
+    def _session_statements(self) -> list[str]:
+        dialect = self._dialect
+        if dialect.name == "postgresql" and self.timeout:
+            # SET LOCAL ends with the transaction, pooled connections don't keep it
+            return [f"SET LOCAL statement_timeout = {math.ceil(self.timeout * 1000)}"]
+        if dialect.name == "mysql":
+            # session variables outlive the statement, so they are set on every execution
+            if dialect.is_mariadb:
+                return [f"SET SESSION max_statement_time = {self.timeout or 'DEFAULT'}"]
+            return [f"SET SESSION MAX_EXECUTION_TIME = {math.ceil(self.timeout * 1000) if self.timeout else 'DEFAULT'}"]
+        return []
+
+    def _attach(self, dialect, engine, driver_connection) -> None:
+        self._dialect, self._engine, self._driver_connection = dialect, engine, driver_connection
+        self._deadline = time.monotonic() + self.timeout if self.timeout else None
+
+    def apply(self, connection: Connection) -> None:
+        """
+        Set the timeout on a connection about to run the statement.
+        """
+        if self.cancelled.is_set():
+            # cancelled while waiting for a worker thread
+            raise asyncio.CancelledError()
+        driver_connection = connection.connection.driver_connection
+        self._attach(connection.dialect, connection.engine, driver_connection)
+        for statement in self._session_statements():
+            connection.execute(text(statement))
+        if connection.dialect.name == "sqlite":
+            driver_connection.set_progress_handler(self._interrupted, SQLITE_PROGRESS_STEPS)
+        elif connection.dialect.name == "mssql":
+            driver_connection.timeout = math.ceil(self.timeout) if self.timeout else 0
+
+    def release(self, connection: Connection) -> None:
+        # the handler holds on to this control, the next statement on the connection brings its own
+        if connection.dialect.name == "sqlite":
+            connection.connection.driver_connection.set_progress_handler(None, SQLITE_PROGRESS_STEPS)
+
+    async def apply_async(self, connection: AsyncConnection) -> None:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        self._attach(connection.dialect, connection.engine, driver_connection)
+        for statement in self._session_statements():
+            await connection.execute(text(statement))
+        if connection.dialect.name == "sqlite":
+            await driver_connection.set_progress_handler(self._interrupted, SQLITE_PROGRESS_STEPS)
+
+    async def release_async(self, connection: AsyncConnection) -> None:
+        if connection.dialect.name == "sqlite":
+            await self._driver_connection.set_progress_handler(None, SQLITE_PROGRESS_STEPS)
+
+    def timed_out(self) -> bool:
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+    async def cancel(self) -> None:
+        """
+        Stop the statement, if one is running.
+        """
+        if self.cancelled.is_set():
+            return
+        self.cancelled.set()
+        if self._dialect is None:
+            # not connected yet, nothing to stop
+            return
+        try:
+            await asyncio.wait_for(self._cancel_running(), settings.CANCEL_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Couldn't cancel running statement on {self._dialect.name}: {e}")
+
+    async def _cancel_running(self) -> None:
+        driver_connection = self._driver_connection
+        if self._dialect.name == "postgresql" and self._dialect.driver == "psycopg2":
+            await asyncio.to_thread(driver_connection.cancel)
+        elif self._dialect.name == "mysql":
+            # the blocked connection can't take the command itself
+            kill = text(f"KILL QUERY {driver_connection.thread_id()}")
+            if isinstance(self._engine, AsyncEngine):
+                async with self._engine.connect() as connection:
+                    await connection.execute(kill)
+            else:
+                await asyncio.to_thread(self._kill_sync, kill)
+
+    def _kill_sync(self, kill) -> None:
+        with self._engine.connect() as connection:
+            connection.execute(kill)
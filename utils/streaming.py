@@ -0,0 +1,79 @@
+import json
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi.responses import StreamingResponse
+
+from config.engine_config import settings
+from utils.logger import logger
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def _collect(collected: list | None, rows: list[dict]) -> None:
+    # only the first page is kept, the rest of a large result just passes through
+    if collected is not None and len(collected) < settings.ROW_LIMIT:
+        collected.extend(rows[:settings.ROW_LIMIT - len(collected)])
+
+
+async def _ndjson_body(header: dict, chunks: AsyncIterator[list[dict]], collected: list | None, state: dict):
+    # first line carries the metadata, every following line is one row
+    yield json.dumps(header) + "\n"
+    try:
+        async for rows in chunks:
+            _collect(collected, rows)
+            yield "".join(json.dumps(row) + "\n" for row in rows)
+    except Exception as e:
+        logger.error(f"Error while streaming query result: {e}")
+        state["failed"] = True
+        yield json.dumps({"error": str(e)}) + "\n"
+
+
+async def _json_body(header: dict, chunks: AsyncIterator[list[dict]], collected: list | None, state: dict):
+    # {"generated_sql_query": ..., "query_result": [row, row, ...]} written incrementally
+    yield json.dumps(header)[:-1] + ', "query_result": ['
+    first = True
+    try:
+        async for rows in chunks:
+            _collect(collected, rows)
+            if not rows:
+                continue
+            body = ", ".join(json.dumps(row) for row in rows)
+            yield body if first else ", " + body
+            first = False
+    except Exception as e:
+        logger.error(f"Error while streaming query result: {e}")
+        state["failed"] = True
+        yield "], " + json.dumps({"error": str(e)})[1:]
+        return
+    yield "]}"
+
+
+def stream_response(
+    header: dict,
+    chunks: AsyncIterator[list[dict]],
+    stream_format: str = "ndjson",
+    on_complete: Callable[[list[dict]], Awaitable[None]] | None = None,
+) -> StreamingResponse:
+    """
+    Wrap chunks of rows in a StreamingResponse as NDJSON or incrementally written JSON.
+
+    When on_complete is given, the first ROW_LIMIT streamed rows are collected and
+    passed to it once the last chunk has been sent, like the first page of a
+    result that isn't streamed.
+    """
+    if stream_format not in STREAM_FORMATS:
+        stream_format = "ndjson"
+    collected = [] if on_complete else None
+    body_factory = _ndjson_body if stream_format == "ndjson" else _json_body
+
+    async def body():
+        state = {"failed": False}
+        async for part in body_factory(header, chunks, collected, state):
+            yield part
+        if on_complete and not state["failed"]:
+            await on_complete(collected)
+
+    return StreamingResponse(body(), media_type=STREAM_FORMATS[stream_format])
@@ -1,11 +1,23 @@
 from fastapi import HTTPException, status
-from datetime import datetime
 from schemas.databases import DbCredentials, UpdatedCredentials
 from langchain_core.output_parsers.string import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
 from langchain_core.messages import SystemMessage
-from decimal import Decimal
-import yaml
+from utils.serializers import RowSerializer
+from utils.sql_cache import sql_cache, schema_fingerprint
+from utils.chart_formatter import format_chart
+from utils.schema_index import schema_for_prompt, tables_for_prompt
+from utils.prompt_registry import prompt_registry
+from utils.sql_guard import Verdict, precheck_question, read_only_violation
+from utils.sql_fingerprint import table_sources, token_spans
+from utils.guardrail_cache import guardrail_cache
+from config.guard_config import settings as guard_settings
+from config.engine_config import settings as engine_settings
+from utils.logger import logger
+from utils.metrics import metrics
+import asyncio
+import json
+import time
 
 def get_connection_string(db_credentials: DbCredentials | UpdatedCredentials):
     connection_strings = {
@@ -33,6 +45,17 @@ def get_connection_string(db_credentials: DbCredentials | UpdatedCredentials):
             },
         )
 
+def provider_of(connection_string: str) -> str:
+    # the db_provider a connection string from get_connection_string was built for
+    prefixes = {"postgresql": "postgres", "mysql": "mysql", "sqlite": "sqlite", "mssql": "sqlserver"}
+    return prefixes.get(connection_string.split(":", 1)[0].split("+", 1)[0], "postgres")
+
+
+def rows_to_json(columns, rows):
+    # Convert rows to dictionaries, one converter per column
+    return RowSerializer(columns).to_records(rows)
+
+
 def result_to_json(result):
     # Get column names
     columns = result.keys()
@@ -40,60 +63,193 @@ def result_to_json(result):
     # Get all rows
     rows = result.all()
 
-    # Convert rows to dictionaries
-    json_result = []
-    for row in rows:
-        row_dict = {}
-        for column, value in zip(columns, row):
-            # Handle datetime objects
-            if isinstance(value, datetime):
-                row_dict[column] = value.isoformat()
-            # Handle Decimal objects
-            elif isinstance(value, Decimal):
-                row_dict[column] = float(value)  # Or str(value) if preferred
-            else:
-                row_dict[column] = value
-        json_result.append(row_dict)
-    return json_result
+    return rows_to_json(columns, rows)
+
+
+def result_to_columnar(result):
+    # compact shape: {"columns": [...], "data": [[...], ...]}
+    serializer = RowSerializer(result.keys())
+    return {"columns": serializer.columns, "data": serializer.to_columnar(result.all())}
 
 
 def load_prompts():
-    with open("prompts/prompts.yaml", "r") as f:
-        prompts = yaml.safe_load(f)
-    return prompts
+    # parsed once, reloaded only when the prompts file changes
+    return prompt_registry.load()
 
 
-def choose_prompt(output_type, schema, database_provider):
-    prompts = load_prompts()
+def render_prompt(prompts, output_type, schema, database_provider):
     if output_type == "tabular":
         prompt = (
             prompts["system_prompts"]["primary"]+
-            f'\nSchema: {schema}\n'+
+            f'\nSchema:\n{schema}\n'+
             f'Database provider: {database_provider}\n'
         )
     elif output_type=="descriptive":
         prompt = (
             prompts["system_prompts"]["primary"]+
-            f'\nSchema: {schema}\n'+
+            f'\nSchema:\n{schema}\n'+
             f'Database provider: {database_provider}\n'
         )
     else:
         prompt = (
             prompts["system_prompts"]["graphical"]+
-            f'\nSchema: {schema}\n'+
+            f'\nSchema:\n{schema}\n'+
             f'Graphical Representation of {output_type}\n'+
             f'Database provider: {database_provider}\n'
         )
     return prompt
 
 
-def limit_query(sql_query):
-    if sql_query.strip().lower().startswith("select") and 'LIMIT' not in sql_query:
-        return f'{sql_query.strip().rstrip(";")} LIMIT 100;'      # hard coded limit to 100 rows for now :p
+def choose_prompt(output_type, schema, database_provider, query_text=None, schema_index=None, db_id=None):
+    # only the tables relevant to the question, when the whole schema is too big
+    tables = tables_for_prompt(schema, schema_index, query_text)
+    key = (db_id, schema_fingerprint(schema), output_type, database_provider, tables)
+    return prompt_registry.rendered(
+        key,
+        lambda prompts: render_prompt(prompts, output_type, schema_for_prompt(schema, tables), database_provider),
+    )
+
+
+def _top_level_words(tokens):
+    # words outside of any parenthesis, those of subqueries and CTE bodies don't limit the statement
+    words, depth = [], 0
+    for kind, text, _ in tokens:
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif kind == "word" and depth == 0:
+            words.append(text.lower())
+    return words
+
+
+def output_row_limit(output_type):
+    # tabular results are paged, charts and descriptions only ever see the rows they're given
+    return engine_settings.ROW_LIMIT if output_type == "tabular" else engine_settings.CHART_ROW_LIMIT
+
+
+def limit_query(sql_query, provider="postgres", row_limit=None, offset=0):
+    """
+    The statement limited to `row_limit` rows (ROW_LIMIT by default) starting at `offset`,
+    in the syntax of the provider: LIMIT/OFFSET, or TOP and OFFSET/FETCH NEXT for sqlserver.
+
+    A statement that limits its rows itself is wrapped as a subquery, so the cap still
+    holds. Others get the limit appended, which keeps their own ORDER BY and column
+    names as they are. Anything but a SELECT is returned unchanged.
+    """
+    row_limit = engine_settings.ROW_LIMIT if row_limit is None else row_limit
+    tokens = token_spans(sql_query, provider)
+    while tokens and tokens[-1][1] == ";":
+        tokens.pop()
+    if not tokens or tokens[0][1].lower() not in ("select", "with"):
+        return sql_query
+
+    # up to the last token, without trailing semicolons and comments
+    kind, text, start = tokens[-1]
+    statement = sql_query[:start + len(text)].strip()
+    words = _top_level_words(tokens)
+    self_limited = any(word in ("limit", "top", "fetch", "offset") for word in words)
+
+    if provider != "sqlserver":
+        page = f"LIMIT {row_limit}" + (f" OFFSET {offset}" if offset else "")
+        if self_limited:
+            return f"SELECT * FROM ({statement}) AS limited_query {page}"
+        return f"{statement} {page}"
+
+    fetch = f"OFFSET {offset} ROWS FETCH NEXT {row_limit} ROWS ONLY"
+    if self_limited:
+        if words[0] == "with":
+            # sqlserver can't nest a WITH statement, its own limit has to do
+            return statement
+        if not offset:
+            return f"SELECT TOP ({row_limit}) * FROM ({statement}) AS limited_query"
+        return f"SELECT * FROM ({statement}) AS limited_query ORDER BY (SELECT NULL) {fetch}"
+    if "order" in words:
+        return f"{statement} {fetch}"
+    if not offset and words[0] == "select" and len(tokens) > 2 and not {"union", "intersect", "except"} & set(words):
+        # SELECT [DISTINCT] TOP (n) ...
+        position = 2 if len(tokens) > 2 and tokens[1][1].lower() in ("distinct", "all") else 1
+        head = tokens[position][2]
+        return f"{sql_query[:head]}TOP ({row_limit}) {sql_query[head:start + len(text)]}".strip()
+    # OFFSET/FETCH needs an ORDER BY, this one leaves the order as it was
+    return f"{statement} ORDER BY (SELECT NULL) {fetch}"
+
+
+def sample_query(sql_query, provider="postgres", rows=1000):
+    """
+    The statement reading at most `rows` rows of every table it references, a cheap
+    preview of a statement too expensive to run in full. Each table is replaced by a
+    limited subquery under the table's own name or alias, the rest is left as it is.
+    """
+    sampled = sql_query
+    # from the end, so the offsets of the earlier references still hold
+    for start, end, table, alias in reversed(table_sources(sql_query, provider)):
+        name = sql_query[start:end]
+        subquery = f"({limit_query(f'SELECT * FROM {name}', provider, rows)})"
+        if alias is None:
+            subquery += f" AS {token_spans(name, provider)[-1][1]}"
+        sampled = sampled[:start] + subquery + sampled[end:]
+    return sampled
+
+
+GUARDRAIL_BLOCKED_OUTPUT = "I'm sorry, I can't respond to that."
+
 
+def _blocked(output) -> bool:
+    return isinstance(output, dict) and output.get("output") == GUARDRAIL_BLOCKED_OUTPUT
 
-async def generate_sql_query(llm, guard_rail, query_text, output_type, schema, database_provider):
-    prompt = choose_prompt(output_type, schema, database_provider)
+
+async def _timed(awaitable, name):
+    started_at = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        metrics.observe(name, time.perf_counter() - started_at)
+
+
+async def guardrail_allows(guard_rail, query_text) -> bool:
+    # input rails only, without generating a bot response
+    response = await guard_rail.rails.generate_async(
+        messages=[{"role": "user", "content": query_text}],
+        options={"rails": ["input"], "log": {"activated_rails": True}},
+    )
+    return not any(rail.stop for rail in response.log.activated_rails)
+
+
+async def _speculative_generation(guard_rail, llm_chain, query_text):
+    """
+    Start the guardrail input check and sql generation together. The generated sql
+    is only returned once the guardrail has allowed the question, and discarded otherwise.
+    """
+    generation = asyncio.create_task(_timed(llm_chain.ainvoke({"input": query_text}), "sql_generation.llm"))
+    # a discarded generation may still fail, don't leave its exception unretrieved
+    generation.add_done_callback(lambda task: task.cancelled() or task.exception())
+    try:
+        allowed = await _timed(guardrail_allows(guard_rail, query_text), "sql_generation.guardrail")
+    except BaseException:
+        generation.cancel()
+        raise
+    if not allowed:
+        generation.cancel()
+        metrics.incr("sql_guard.speculative_discarded")
+        # same shape as a blocked guard_rail | llm_chain run
+        return {"output": GUARDRAIL_BLOCKED_OUTPUT}
+    return await generation
+
+
+async def generate_sql_query(llm, guard_rail, query_text, output_type, schema, database_provider, schema_index=None, db_id=None, verdict_key=None):
+    # identical question, output type, schema and provider -> reuse the sql generated earlier
+    cached_sql_query = await sql_cache.get(query_text, output_type, schema, database_provider)
+    if cached_sql_query is not None:
+        # entries cached before a stricter guard, or written to a shared redis, are checked again
+        violation = read_only_violation(cached_sql_query, database_provider)
+        if violation is None:
+            return cached_sql_query, None
+        logger.warning(f'Cached SQL rejected, {violation}: {cached_sql_query}')
+        metrics.incr("sql_guard.cached_sql_rejected")
+        await sql_cache.delete(query_text, output_type, schema, database_provider)
+
+    prompt = choose_prompt(output_type, schema, database_provider, query_text, schema_index, db_id)
     chat_template = ChatPromptTemplate.from_messages(
         [
             SystemMessage(content=prompt),
@@ -102,16 +258,80 @@ async def generate_sql_query(llm, guard_rail, query_text, output_type, schema, d
     )
     output_parser = StrOutputParser()
     llm_chain = chat_template | llm | output_parser
-    guard_rail_chain = guard_rail | llm_chain
 
-    sql_query = guard_rail_chain.invoke({"input": query_text})
+    # the guardrail llm call is only needed for questions that haven't been cleared already
+    started_at = time.perf_counter()
+    if guard_settings.GUARDRAIL_LOCAL_PRECHECK and precheck_question(query_text) is Verdict.SAFE:
+        metrics.incr("sql_guard.guardrail_calls_avoided")
+        allowed = True
+    elif verdict_key is not None and verdict_key == guardrail_cache.key(query_text):
+        # saved query whose text passed under the current guardrail config
+        metrics.incr("guardrail_cache.hits.saved_query")
+        allowed = True
+    else:
+        allowed = await guardrail_cache.get(query_text)
+
+    if allowed is True:
+        sql_query = await _timed(llm_chain.ainvoke({"input": query_text}), "sql_generation.llm")
+    elif allowed is False:
+        sql_query = {"output": GUARDRAIL_BLOCKED_OUTPUT}
+    else:
+        metrics.incr("sql_guard.guardrail_calls")
+        if guard_settings.GUARDRAIL_SPECULATIVE:
+            sql_query = await _speculative_generation(guard_rail, llm_chain, query_text)
+        else:
+            sql_query = await (guard_rail | llm_chain).ainvoke({"input": query_text})
+        await guardrail_cache.set(query_text, not _blocked(sql_query))
+    metrics.observe("sql_generation.total", time.perf_counter() - started_at)
     print(f'Generated SQL query: {sql_query}')
 
     # check if guardrails failed
-    if isinstance(sql_query, dict) and sql_query.get("output") == "I'm sorry, I can't respond to that.":
+    if _blocked(sql_query):
+        sql_query = "Query blocked by guardrails"
+        final_data = "Query blocked by guardrails"
+    elif violation := read_only_violation(sql_query, database_provider):
+        # whatever the question looked like, only a single read-only statement may run
+        logger.warning(f'Generated SQL rejected, {violation}: {sql_query}')
+        metrics.incr("sql_guard.sql_rejected")
         sql_query = "Query blocked by guardrails"
         final_data = "Query blocked by guardrails"
     else:
         final_data = None
+        await sql_cache.set(query_text, output_type, schema, database_provider, sql_query)
+
+    return sql_query, final_data
+
+
+async def format_query_output(llm, output_type, query_text, sql_query, query_result):
+    # turn the raw query result into the output the user asked for
+    if output_type == "tabular":
+        return query_result
 
-    return sql_query, final_data
\ No newline at end of file
+    prompts = load_prompts()
+    if output_type == "descriptive":
+        insights_prompt = (
+            prompts["system_prompts"]["descriptive_prompt"] +
+            f'User Query: {query_text}\n' +
+            f'Generated SQL Query: {sql_query}\n' +
+            f'Query Output from database: {query_result}'
+        )
+        insights_response = await llm.agenerate([insights_prompt])
+        return insights_response.generations[0][0].text.strip()
+
+    # charts are built locally when the result follows the labels/values contract
+    chart = format_chart(query_result, output_type, query_text)
+    if chart is not None:
+        metrics.incr("chart_formatter.local")
+        return chart
+
+    logger.info(f'Result for {output_type} does not follow the labels/values contract, formatting with LLM')
+    metrics.incr("chart_formatter.llm")
+    chart_prompt = (
+        prompts["system_prompts"]["chartjs_formatter"] +
+        f'User Query: {query_text}\n' +
+        f'Generated SQL Query: {sql_query}\n' +
+        f'Query Output From Database: {query_result}\n' +
+        f'Graphical Representation type: {output_type}'
+    )
+    chart_response = await llm.agenerate([chart_prompt])
+    return json.loads(chart_response.generations[0][0].text.strip())
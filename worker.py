@@ -0,0 +1,49 @@
+import asyncio
+import signal
+
+# registers the job handlers
+from services.jobs import refresh_scheduler
+from config.dashboard_config import settings as dashboard_settings
+from config.job_config import settings
+from config.llm_config import settings as llm_settings
+from database.database import engine
+from utils.engine_registry import engine_registry
+from utils.jobs import job_queue
+from utils.llm_runtime import llm_runtime
+from utils.prompt_registry import prompt_registry
+from utils.result_cache import result_cache
+
+
+def stop():
+    # running jobs and the current scheduler tick are finished, nothing new is picked up
+    job_queue.stop()
+    refresh_scheduler.stop()
+
+
+async def main():
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop)
+
+    prompt_registry.load()
+    result_cache.warn_if_unshared()
+    if llm_settings.warm_up:
+        await llm_runtime.warm_up()
+    # with the memory backend the jobs are worked in the api process, this one only runs the
+    # refresh scheduler. Its lock is per process then, so exactly one worker.py may run
+    work = []
+    if settings.JOBS_BACKEND != "memory":
+        work.append(job_queue.work(settings.JOB_WORKER_CONCURRENCY))
+    if dashboard_settings.SCHEDULER_ENABLED:
+        work.append(refresh_scheduler.run())
+    try:
+        await asyncio.gather(*work)
+    finally:
+        await job_queue.backend.close()
+        await llm_runtime.aclose()
+        await engine_registry.dispose_all()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())